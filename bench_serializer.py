@@ -0,0 +1,149 @@
+# bench_serializer.py
+# Vergleich der Serialisierungs-Varianten auf einer synthetischen Sammlung
+#
+# Aufruf: python bench_serializer.py [anzahl_karten] [wiederholungen]
+# Standard: 10000 Karten, 5 Wiederholungen. Gemessen wird jeweils die beste Zeit.
+import sys
+import json
+import time
+import random
+import serializer
+
+
+def synthetic_card(i):
+    # Grob wie ein Scryfall-Kartenobjekt inkl. der Besitzfelder der App
+    set_code = random.choice(["fin", "dsk", "blb", "mh3", "otj", "mkm", "lci", "woe"])
+    card = {
+        "object": "card",
+        "id": f"{i:08x}-0000-4000-8000-{i:012x}",
+        "oracle_id": f"{i % 4000:08x}-1111-4000-8000-{i:012x}",
+        "multiverse_ids": [600000 + i],
+        "mtgo_id": 120000 + i,
+        "arena_id": 90000 + i,
+        "tcgplayer_id": 500000 + i,
+        "cardmarket_id": 700000 + i,
+        "name": f"Testkarte Nummer {i}",
+        "lang": random.choice(["en", "de"]),
+        "released_at": "2025-06-13",
+        "uri": f"https://api.scryfall.com/cards/{i}",
+        "scryfall_uri": f"https://scryfall.com/card/{set_code}/{i}/testkarte-{i}",
+        "layout": "normal",
+        "highres_image": True,
+        "image_status": "highres_scan",
+        "image_uris": {
+            size: f"https://cards.scryfall.io/{size}/front/{i % 16:x}/{i % 7:x}/{i}.jpg?1748706{i % 1000}"
+            for size in ("small", "normal", "large", "png", "art_crop", "border_crop")
+        },
+        "mana_cost": "{2}{G}{G}",
+        "cmc": 4.0,
+        "type_line": "Kreatur — Elf Druide",
+        "oracle_text": "Wenn diese Kreatur ins Spiel kommt, ziehe eine Karte. " * 3,
+        "power": "3",
+        "toughness": "3",
+        "colors": ["G"],
+        "color_identity": ["G"],
+        "keywords": ["Reach"],
+        "legalities": {fmt: random.choice(["legal", "not_legal"]) for fmt in (
+            "standard", "future", "historic", "timeless", "gladiator", "pioneer", "explorer", "modern",
+            "legacy", "pauper", "vintage", "penny", "commander", "oathbreaker", "standardbrawl", "brawl",
+            "alchemy", "paupercommander", "duel", "oldschool", "premodern", "predh")},
+        "games": ["paper", "mtgo", "arena"],
+        "reserved": False,
+        "foil": True,
+        "nonfoil": True,
+        "finishes": ["nonfoil", "foil"],
+        "oversized": False,
+        "promo": False,
+        "reprint": bool(i % 2),
+        "variation": False,
+        "set_id": f"{hash(set_code) & 0xffffffff:08x}-2222-4000-8000-000000000000",
+        "set": set_code,
+        "set_name": f"Set {set_code.upper()}",
+        "set_type": "expansion",
+        "set_uri": f"https://api.scryfall.com/sets/{set_code}",
+        "set_search_uri": f"https://api.scryfall.com/cards/search?order=set&q=e%3A{set_code}",
+        "scryfall_set_uri": f"https://scryfall.com/sets/{set_code}",
+        "rulings_uri": f"https://api.scryfall.com/cards/{i}/rulings",
+        "prints_search_uri": f"https://api.scryfall.com/cards/search?order=released&q=oracleid%3A{i}",
+        "collector_number": str(i % 300),
+        "digital": False,
+        "rarity": random.choice(["common", "uncommon", "rare", "mythic"]),
+        "flavor_text": "Im Wald hört man sie nie kommen.",
+        "card_back_id": "0aeebaf5-8c7d-4636-9e82-8c27447861f7",
+        "artist": "Jane Doe",
+        "artist_ids": ["a1b2c3d4-0000-4000-8000-000000000000"],
+        "illustration_id": f"{i:08x}-3333-4000-8000-000000000000",
+        "border_color": "black",
+        "frame": "2015",
+        "full_art": False,
+        "textless": False,
+        "booster": True,
+        "story_spotlight": False,
+        "edhrec_rank": 1000 + i,
+        "prices": {
+            "usd": f"{random.random() * 20:.2f}", "usd_foil": f"{random.random() * 40:.2f}", "usd_etched": None,
+            "eur": f"{random.random() * 20:.2f}", "eur_foil": f"{random.random() * 40:.2f}", "tix": "0.03",
+        },
+        "related_uris": {
+            "gatherer": f"https://gatherer.wizards.com/Pages/Card/Details.aspx?multiverseid={600000 + i}",
+            "edhrec": f"https://edhrec.com/route/?cc=Testkarte+{i}",
+        },
+        "purchase_uris": {
+            "tcgplayer": f"https://partner.tcgplayer.com/c/4931599/1830156/21018?u=https%3A%2F%2Fwww.tcgplayer.com%2Fproduct%2F{i}",
+            "cardmarket": f"https://www.cardmarket.com/en/Magic/Products/Search?searchString=Testkarte+{i}",
+            "cardhoarder": f"https://www.cardhoarder.com/cards/{i}",
+        },
+        # Besitzfelder der App
+        "count": random.randint(1, 4),
+        "variant": random.choice(["nonfoil", "foil"]),
+        "is_proxy": False,
+        "purchase_price": f"{random.random() * 10:.2f}",
+        "eur": f"{random.random() * 20:.2f}",
+        "set_size": 300,
+    }
+    return card
+
+
+def best_of(repeat, fn):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    random.seed(42)
+    collections = [{"name": "Benchmark", "color": "#888888", "last_price_update": 0,
+                    "cards": [synthetic_card(i) for i in range(count)]}]
+
+    variants = [
+        ("stdlib json, indent=2 (alt)",
+         lambda: json.dumps(collections, indent=2, ensure_ascii=False).encode("utf-8"),
+         lambda data: json.loads(data)),
+    ]
+    for encoding in serializer.available_encodings():
+        label = encoding
+        if encoding == serializer.ENCODING_JSON:
+            label = f"json ({serializer.JSON_BACKEND}, kompakt)"
+        variants.append((label,
+                         lambda encoding=encoding: serializer.dumps(collections, encoding),
+                         serializer.loads))
+
+    print(f"{count} Karten, beste von {repeat} Läufen")
+    print(f"{'Format':34} {'dump ms':>9} {'load ms':>9} {'Größe KB':>10}")
+    for label, dump, load in variants:
+        data = dump()
+        assert load(data) == collections
+        dump_time = best_of(repeat, dump)
+        load_time = best_of(repeat, lambda: load(data))
+        size = len(data.encode("utf-8") if isinstance(data, str) else data)
+        print(f"{label:34} {dump_time * 1000:9.1f} {load_time * 1000:9.1f} {size / 1024:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
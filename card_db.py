@@ -0,0 +1,340 @@
+# card_db.py
+# Lokale Scryfall-Kartendatenbank (Offline-Spiegel der Bulk-Daten)
+#
+# Die Bulk-Dateien von Scryfall (default_cards / all_cards, mehrere GB) werden
+# per json_stream gestreamt und in eine indizierte SQLite-Datenbank (cards.db)
+# geschrieben, ohne die Datei in den Speicher zu laden. Gespeichert wird das
+# projizierte Kartenobjekt (card_projection) plus indizierte Suchspalten.
+# Suche, Sprachwechsel, Varianten, Deck-Import und Bild-Fallback fragen zuerst
+# hier nach und gehen nur ohne Treffer ins Netz.
+#
+# Import (funktioniert komplett offline mit einer lokalen Datei):
+#   python card_db.py import default-cards-20250101.json
+#   python card_db.py lookup "Lightning Bolt"
+#
+# Der Import baut eine neue Datei (cards.db.tmp) und ersetzt die alte erst am
+# Ende atomar; ein abgebrochener Import lässt die bisherige Datenbank stehen.
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+import serializer
+from json_stream import MappedJson
+from card_projection import project_card
+
+CARD_DB_FILE = "cards.db"
+
+# Karten pro Transaktion beim Import
+IMPORT_BATCH_SIZE = 5000
+
+_SCHEMA = (
+    "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)",
+    "CREATE TABLE cards ("
+    " id TEXT PRIMARY KEY,"
+    " oracle_id TEXT,"
+    " name TEXT NOT NULL,"
+    " face_name TEXT,"
+    " printed_name TEXT,"
+    " lang TEXT,"
+    " set_code TEXT,"
+    " collector_number TEXT,"
+    " released_at TEXT,"
+    " data BLOB NOT NULL)",
+)
+
+# Indizes werden erst nach dem Einfügen angelegt (deutlich schneller als während des Imports)
+_INDEXES = (
+    "CREATE INDEX idx_cards_name ON cards(name COLLATE NOCASE)",
+    "CREATE INDEX idx_cards_face_name ON cards(face_name COLLATE NOCASE)",
+    "CREATE INDEX idx_cards_printed_name ON cards(printed_name COLLATE NOCASE)",
+    "CREATE INDEX idx_cards_oracle ON cards(oracle_id, lang)",
+    "CREATE INDEX idx_cards_set_number ON cards(set_code, collector_number)",
+)
+
+# Scryfall liefert bei mehreren Treffern die englische, neueste Ausgabe
+_PREFERRED_ORDER = " ORDER BY (lang = 'en') DESC, released_at DESC"
+
+
+def oracle_id_from_search_uri(search_uri):
+    """oracle_id aus einer Such-URI der Form ...?q=oracleid:X, sonst None."""
+    query = parse_qs(urlparse(search_uri).query).get("q", [""])[0]
+    if not query.startswith("oracleid:"):
+        return None
+    terms = query.split(":", 1)[1].split()
+    return terms[0] if terms else None
+
+
+def _card_row(card):
+    name = card.get("name") or ""
+    printed_name = card.get("printed_name")
+    if not printed_name and isinstance(card.get("card_faces"), list):
+        faces = [face.get("printed_name") for face in card["card_faces"] if isinstance(face, dict)]
+        if any(faces):
+            printed_name = " // ".join(face or "" for face in faces)
+    return (
+        card["id"],
+        card.get("oracle_id"),
+        name,
+        name.split(" // ")[0],
+        printed_name,
+        card.get("lang"),
+        card.get("set"),
+        card.get("collector_number"),
+        card.get("released_at"),
+        serializer.dumps(project_card(card)),
+    )
+
+
+def import_bulk(bulk_path, db_path=CARD_DB_FILE, progress=None):
+    """Streamt eine Scryfall-Bulk-Datei in eine neue Kartendatenbank und gibt die Anzahl Karten zurück."""
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    # Temporäre Datei: kein Journal, kein fsync; gesichert wird durch das Ersetzen am Ende
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    count = 0
+    started = time.time()
+    try:
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        with MappedJson(bulk_path) as bulk:
+            total_bytes = bulk.size()
+            batch = []
+            for card, pos in bulk.iter_array():
+                if not isinstance(card, dict) or not card.get("id"):
+                    continue
+                batch.append(_card_row(card))
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    conn.executemany("INSERT OR REPLACE INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+                    conn.commit()
+                    count += len(batch)
+                    batch = []
+                    if progress:
+                        progress(count, pos, total_bytes)
+            if batch:
+                conn.executemany("INSERT OR REPLACE INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+                count += len(batch)
+        for statement in _INDEXES:
+            conn.execute(statement)
+        # default_cards enthält pro Karte meist nur eine Sprache, all_cards alle Übersetzungen.
+        # Nur im zweiten Fall ist "keine deutsche Ausgabe gefunden" eine verlässliche Antwort.
+        multilingual = conn.execute(
+            "SELECT 1 FROM cards WHERE lang != 'en' AND oracle_id IN"
+            " (SELECT oracle_id FROM cards WHERE lang = 'en') LIMIT 1"
+        ).fetchone() is not None
+        meta = {
+            "source": os.path.basename(bulk_path),
+            "imported_at": str(time.time()),
+            "card_count": str(count),
+            "multilingual": "1" if multilingual else "0",
+        }
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", meta.items())
+        conn.commit()
+        conn.execute("ANALYZE")
+    except BaseException:
+        conn.close()
+        os.remove(tmp_path)
+        raise
+    conn.close()
+    os.replace(tmp_path, db_path)
+    print(f"[DEBUG] Kartendatenbank: {count} Karten in {time.time() - started:.1f}s importiert ({db_path})")
+    return count
+
+
+class CardDatabase:
+    """Lesezugriff auf die lokale Kartendatenbank. Ohne importierte Datei ist sie leer (available() == False)."""
+
+    def __init__(self, db_path=CARD_DB_FILE):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = None
+        self._meta = {}
+        self.reload()
+
+    def reload(self):
+        """Öffnet die Datenbankdatei (neu), z. B. nach einem Import."""
+        with self._lock:
+            self.close()
+            if not os.path.exists(self.db_path):
+                return
+            try:
+                conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+                conn.row_factory = sqlite3.Row
+                self._meta = {row["key"]: row["value"] for row in conn.execute("SELECT key, value FROM meta")}
+                self._conn = conn
+            except sqlite3.Error as e:
+                print(f"[ERROR] Kartendatenbank {self.db_path} konnte nicht geöffnet werden: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
+            self._meta = {}
+
+    def import_bulk(self, bulk_path, progress=None):
+        # Verbindung vorher schließen, sonst lässt sich die Datei (Windows) nicht ersetzen
+        with self._lock:
+            self.close()
+            try:
+                return import_bulk(bulk_path, self.db_path, progress)
+            finally:
+                self.reload()
+
+    def available(self):
+        return self._conn is not None
+
+    def is_multilingual(self):
+        """True, wenn der Spiegel alle Sprachen enthält (all_cards) und Sprachabfragen verlässlich sind."""
+        return self._meta.get("multilingual") == "1"
+
+    def card_count(self):
+        return int(self._meta.get("card_count", 0))
+
+    def imported_at(self):
+        return self._meta.get("imported_at")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            if self._conn is None:
+                return []
+            return [serializer.loads(row["data"]) for row in self._conn.execute(sql, params)]
+
+    def _first(self, sql, params=()):
+        rows = self._query(sql + " LIMIT 1", params)
+        return rows[0] if rows else None
+
+    # --- Lookups ---
+    def get(self, card_id):
+        return self._first("SELECT data FROM cards WHERE id = ?", (card_id,))
+
+    def get_many(self, card_ids):
+        """Kartenobjekte zu mehreren IDs, in der Reihenfolge von card_ids (fehlende fallen weg)."""
+        found = {}
+        card_ids = list(card_ids)
+        for start in range(0, len(card_ids), 500):
+            chunk = card_ids[start:start + 500]
+            sql = f"SELECT data FROM cards WHERE id IN ({', '.join('?' * len(chunk))})"
+            for card in self._query(sql, chunk):
+                found[card["id"]] = card
+        return [found[card_id] for card_id in card_ids if card_id in found]
+
+    def iter_cards(self, batch_size=IMPORT_BATCH_SIZE):
+        """Alle Kartenobjekte blockweise; die Sperre wird zwischen den Blöcken freigegeben."""
+        last_rowid = 0
+        while True:
+            with self._lock:
+                if self._conn is None:
+                    return
+                rows = self._conn.execute(
+                    "SELECT rowid, data FROM cards WHERE rowid > ? ORDER BY rowid LIMIT ?", (last_rowid, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1]["rowid"]
+            for row in rows:
+                yield serializer.loads(row["data"])
+
+    def named(self, name, set_code=None):
+        """Wie /cards/named?exact: exakter Name (ohne Groß/Klein, auch nur Vorderseite)."""
+        name = name.strip()
+        sql = "SELECT data FROM cards WHERE (name = ? COLLATE NOCASE OR face_name = ? COLLATE NOCASE)"
+        params = [name, name]
+        if set_code:
+            sql += " AND set_code = ?"
+            params.append(set_code.lower())
+        return self._first(sql + _PREFERRED_ORDER, params)
+
+    def printed(self, printed_name, lang=None):
+        """Karte über ihren gedruckten (übersetzten) Namen."""
+        sql = "SELECT data FROM cards WHERE printed_name = ? COLLATE NOCASE"
+        params = [printed_name.strip()]
+        if lang:
+            sql += " AND lang = ?"
+            params.append(lang)
+        return self._first(sql + " ORDER BY released_at DESC", params)
+
+    def name_entries(self):
+        """(angezeigter Name, Kartenname, Sprache) aller Namen für den Namensindex."""
+        with self._lock:
+            if self._conn is None:
+                return []
+            names = self._conn.execute("SELECT DISTINCT name FROM cards").fetchall()
+            printed = self._conn.execute(
+                "SELECT DISTINCT printed_name, name, lang FROM cards"
+                " WHERE printed_name IS NOT NULL AND printed_name != name"
+            ).fetchall()
+        return [(row[0], row[0], None) for row in names] + [(row[0], row[1], row[2]) for row in printed]
+
+    def by_set_number(self, set_code, collector_number, lang=None):
+        """Wie /cards/{set}/{nummer}[/{lang}]."""
+        sql = "SELECT data FROM cards WHERE set_code = ? AND collector_number = ?"
+        params = [set_code.lower(), str(collector_number)]
+        if lang:
+            sql += " AND lang = ?"
+            params.append(lang)
+        return self._first(sql + _PREFERRED_ORDER, params)
+
+    def prints(self, oracle_id, lang=None):
+        """Alle Drucke einer Karte (neueste zuerst), optional nur in einer Sprache."""
+        sql = "SELECT data FROM cards WHERE oracle_id = ?"
+        params = [oracle_id]
+        if lang:
+            sql += " AND lang = ?"
+            params.append(lang)
+        return self._query(sql + " ORDER BY released_at DESC", params)
+
+    def oracle_rows(self):
+        """(oracle_id, Scryfall-ID, Sprache) aller Drucke, neueste zuerst, ohne Kartenobjekte zu dekodieren."""
+        with self._lock:
+            if self._conn is None:
+                return []
+            return self._conn.execute(
+                "SELECT oracle_id, id, lang FROM cards WHERE oracle_id IS NOT NULL ORDER BY released_at DESC"
+            ).fetchall()
+
+
+_card_db = None
+_card_db_lock = threading.Lock()
+
+
+def get_card_db():
+    """Gemeinsame Instanz der lokalen Kartendatenbank."""
+    global _card_db
+    with _card_db_lock:
+        if _card_db is None:
+            _card_db = CardDatabase()
+        return _card_db
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lokale Scryfall-Kartendatenbank")
+    parser.add_argument("--db", default=CARD_DB_FILE, help="Pfad der Kartendatenbank (Standard: cards.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_cmd = commands.add_parser("import", help="Scryfall-Bulk-Datei (JSON) importieren")
+    import_cmd.add_argument("bulk_file")
+    lookup_cmd = commands.add_parser("lookup", help="Karte nach exaktem Namen suchen")
+    lookup_cmd.add_argument("name")
+    lookup_cmd.add_argument("--set")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        def progress(count, pos, total):
+            print(f"  {count} Karten ({pos * 100 // max(total, 1)} %)", flush=True)
+        import_bulk(args.bulk_file, args.db, progress)
+    elif args.command == "lookup":
+        card = CardDatabase(args.db).named(args.name, args.set)
+        if card is None:
+            print("Nicht gefunden.")
+            return 1
+        print(f"{card.get('name')} | {card.get('set', '').upper()} {card.get('collector_number')} | {card.get('lang')} | {card.get('id')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
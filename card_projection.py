@@ -0,0 +1,87 @@
+# card_projection.py
+# Deklarierte Projektion der Scryfall-Kartenobjekte
+#
+# Gespeichert werden nur die Felder, die die App tatsächlich liest (Anzeige,
+# Varianten, Preise, Importe, Suche). Alles andere (purchase_uris, related_uris,
+# rulings_uri, artist_ids, multiverse_ids, ...) landet nur im lokalen
+# Karten-Cache des Stores und kann dort bei Bedarf wieder ergänzt werden.
+
+CARD_FIELDS = (
+    "id",
+    "oracle_id",
+    "cardmarket_id",
+    "name",
+    "printed_name",
+    "lang",
+    "layout",
+    "mana_cost",
+    "cmc",
+    "type_line",
+    "printed_type_line",
+    "oracle_text",
+    "printed_text",
+    "power",
+    "toughness",
+    "loyalty",
+    "colors",
+    "color_identity",
+    "keywords",
+    "legalities",
+    "set",
+    "set_name",
+    "set_type",
+    "collector_number",
+    "rarity",
+    "released_at",
+    "image_uris",
+    "card_faces",
+    "prices",
+    "finishes",
+    "foil",
+    "nonfoil",
+    "prints_search_uri",
+)
+
+# Felder innerhalb von card_faces (doppelseitige Karten)
+FACE_FIELDS = (
+    "name",
+    "printed_name",
+    "mana_cost",
+    "type_line",
+    "printed_type_line",
+    "oracle_text",
+    "printed_text",
+    "power",
+    "toughness",
+    "loyalty",
+    "colors",
+    "image_uris",
+)
+
+# Bildgrößen, die angezeigt bzw. gecacht werden
+IMAGE_SIZES = ("small", "normal", "large")
+
+
+def _project_images(image_uris):
+    if not isinstance(image_uris, dict):
+        return image_uris
+    return {size: image_uris[size] for size in IMAGE_SIZES if size in image_uris}
+
+
+def _project_face(face):
+    if not isinstance(face, dict):
+        return face
+    projected = {key: face[key] for key in FACE_FIELDS if key in face}
+    if "image_uris" in projected:
+        projected["image_uris"] = _project_images(projected["image_uris"])
+    return projected
+
+
+def project_card(card):
+    """Gibt eine Kopie von card mit nur den deklarierten Feldern zurück."""
+    projected = {key: card[key] for key in CARD_FIELDS if key in card}
+    if "image_uris" in projected:
+        projected["image_uris"] = _project_images(projected["image_uris"])
+    if isinstance(projected.get("card_faces"), list):
+        projected["card_faces"] = [_project_face(face) for face in projected["card_faces"]]
+    return projected
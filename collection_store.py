@@ -0,0 +1,824 @@
+# collection_store.py
+# SQLite-Speicher für Sammlungen und Karteneinträge
+#
+# Ersetzt das komplette Neuschreiben von collections.json bei jeder Änderung.
+# Sammlungen und Karten liegen in indizierten Tabellen, jede Einzeländerung
+# (Karte hinzufügen, bearbeiten, löschen, Preis setzen) ist ein einzelnes
+# Row-Update in einer Transaktion. Beim ersten Start wird eine vorhandene
+# collections.json einmalig übernommen.
+#
+# Änderungen landen im Write-Ahead-Log (collections.db-wal), einem reinen
+# Append-Log neben dem Snapshot. Beim Öffnen spielt SQLite das Log automatisch
+# ein; ein Hintergrund-Thread verdichtet es per Checkpoint in die Hauptdatei,
+# sobald es größer als WAL_CHECKPOINT_BYTES ist.
+#
+# Schema (normalisiert):
+#   collections - Manifest: Name, Farbe, letztes Preisupdate und Summen
+#                 (Marktwert, Kaufwert, Kartenzahl, verschiedene Drucke, letzte
+#                 Änderung) pro Sammlung. Die Summen werden bei jeder Änderung
+#                 um die Differenz des betroffenen Eintrags fortgeschrieben.
+#   prints      - Scryfall-Kartenobjekt, genau einmal pro Scryfall-ID, reduziert
+#                 auf die Felder aus card_projection.CARD_FIELDS
+#   card_cache  - vollständige Scryfall-Objekte (komprimiert), aus denen die
+#                 weggelassenen Felder bei Bedarf ergänzt werden
+#   entries     - schlanke Besitz-Einträge (Stückzahl, Sprache, Variante, Proxy,
+#                 Kaufpreis, Marktwert) mit Verweis auf prints, nach Sammlung
+#                 partitioniert (idx_entries_collection_print)
+#   price_runs  - laufende (auch unterbrochene) Preisupdates pro Sammlung
+#   price_queue - Scryfall-IDs, deren Preis in diesen Durchläufen noch fehlt
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+import serializer
+from card_projection import project_card
+from utils import safe_float
+from json_stream import LazyCollectionsFile
+
+DB_FILE = "collections.db"
+LEGACY_JSON_FILE = "collections.json"
+
+SCHEMA_VERSION = 1
+
+# Der Karten-Cache wird selten gelesen und deshalb komprimiert gespeichert
+CARD_CACHE_ENCODING = serializer.ENCODING_JSON_ZLIB
+
+# Ab dieser WAL-Größe wird im Hintergrund verdichtet
+WAL_CHECKPOINT_BYTES = 4 * 1024 * 1024
+
+# Felder, die dem Nutzer gehören und als eigene Spalten in entries liegen
+OWNED_FIELDS = ("count", "lang", "variant", "is_proxy", "purchase_price", "eur")
+# Lokale Zusatzfelder pro Eintrag (nicht Teil des Scryfall-Objekts)
+LOCAL_FIELDS = ("image_url", "set_size", "set_code")
+
+
+class CollectionStore:
+    """Repository für alle Sammlungen. Alle Zugriffe laufen über diese Klasse."""
+
+    def __init__(self, db_path=DB_FILE, legacy_json_path=LEGACY_JSON_FILE):
+        self.db_path = db_path
+        # Eine Verbindung für alle Threads, Zugriffe werden über das Lock serialisiert
+        self._lock = threading.RLock()
+        self._tx_depth = 0
+        self._print_cache = {}  # scryfall_id -> dekodiertes Kartenobjekt
+        # --- In-Process-Cache der geladenen Sammlungen ---
+        # Alle Views bekommen dieselben Objekte. Neu geladen wird nur, wenn sich der
+        # interne Versionszähler (eigene Schreibvorgänge) oder die Datenbank
+        # (andere Verbindungen/Prozesse, ersetzte Datei) geändert hat.
+        self._version = 0
+        self._headers = None            # Liste der collections-Zeilen
+        self._manifest = None           # list_manifest() als Dicts
+        self._collection_cache = {}     # (collection_id, full) -> (Sammlungs-Dict, enthaltene Scryfall-IDs)
+        self._cache_signature = None
+        self._dirty_all = False
+        self._dirty_collections = set()
+        self._dirty_prints = set()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        # Append-only Log statt Neuschreiben der Seiten; Checkpoints macht der Compactor
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("PRAGMA wal_autocheckpoint = 0")
+        self._create_schema()
+        self._migrate_legacy_json(legacy_json_path)
+        self._compactor = WalCompactor(db_path)
+
+    def close(self):
+        self._compactor.stop()
+        with self._lock:
+            # Letzter Checkpoint, damit beim nächsten Start kein Log eingespielt werden muss
+            try:
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error as e:
+                print(f"[ERROR] Checkpoint beim Schließen fehlgeschlagen: {e}")
+            self._conn.close()
+
+    # --- Schema & Migration ---
+    def _create_schema(self):
+        # purchase_price/eur in entries ohne Typ-Affinität, damit Strings und Zahlen erhalten bleiben
+        with self.transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS collections ("
+                " id INTEGER PRIMARY KEY,"
+                " name TEXT NOT NULL UNIQUE,"
+                " color TEXT NOT NULL DEFAULT '#888888',"
+                " last_price_update REAL NOT NULL DEFAULT 0,"
+                " market_value REAL NOT NULL DEFAULT 0,"
+                " purchase_value REAL NOT NULL DEFAULT 0,"
+                " card_count INTEGER NOT NULL DEFAULT 0,"
+                " entry_count INTEGER NOT NULL DEFAULT 0,"
+                " unique_prints INTEGER NOT NULL DEFAULT 0,"
+                " updated_at REAL NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS prints (id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS card_cache (id TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " id INTEGER PRIMARY KEY,"
+                " collection_id INTEGER NOT NULL REFERENCES collections(id) ON DELETE CASCADE,"
+                " print_id TEXT REFERENCES prints(id),"
+                " count INTEGER NOT NULL DEFAULT 1,"
+                " lang TEXT,"
+                " variant TEXT,"
+                " is_proxy INTEGER NOT NULL DEFAULT 0,"
+                " purchase_price,"
+                " eur,"
+                " extra TEXT)"
+            )
+            # Beantwortet auch "liegt dieser Druck noch in der Sammlung?" ohne die Partition zu durchsuchen
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_collection_print ON entries(collection_id, print_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_print ON entries(print_id)")
+            # Fortsetzbare Preisupdates: laufende Durchläufe pro Sammlung und die noch
+            # offenen Scryfall-IDs. Bereits geholte Preise stehen sofort in entries.
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS price_runs ("
+                " collection_id INTEGER PRIMARY KEY REFERENCES collections(id) ON DELETE CASCADE,"
+                " started_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS price_queue (print_id TEXT PRIMARY KEY)")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _migrate_legacy_json(self, legacy_json_path):
+        # Einmalige Übernahme der alten collections.json (die Datei selbst bleibt als Backup liegen).
+        # Die Datei wird gestreamt: Karten werden einzeln dekodiert und sofort eingefügt.
+        if self._get_meta("legacy_json_imported"):
+            return
+        imported = 0
+        try:
+            with self.transaction() as conn:
+                if legacy_json_path and os.path.exists(legacy_json_path):
+                    with LazyCollectionsFile(legacy_json_path) as legacy:
+                        for col, cards in legacy:
+                            if not col.get("name"):
+                                continue
+                            cur = conn.execute(
+                                "INSERT OR IGNORE INTO collections (name, color, last_price_update) VALUES (?, ?, ?)",
+                                (col["name"], col.get("color", "#888888"), col.get("last_price_update", 0) or 0),
+                            )
+                            if not cur.rowcount:
+                                continue
+                            collection_id = cur.lastrowid
+                            for card in cards:
+                                if isinstance(card, dict):
+                                    self._insert_entry(conn, collection_id, card)
+                            self._refresh_totals(conn, collection_id)
+                            self._mark_dirty(collection_id)
+                            imported += 1
+                self._set_meta("legacy_json_imported", "1")
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] collections.json konnte nicht migriert werden: {e}")
+            return
+        if imported:
+            print(f"[DEBUG] {imported} Sammlungen aus {legacy_json_path} übernommen.")
+
+    def _get_meta(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def _set_meta(self, key, value):
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @contextmanager
+    def transaction(self):
+        """Schreib-Transaktion. Verschachtelte Aufrufe landen in derselben Transaktion."""
+        with self._lock:
+            if self._tx_depth == 0:
+                self._conn.execute("BEGIN IMMEDIATE")
+            self._tx_depth += 1
+            try:
+                yield self._conn
+            except BaseException:
+                self._tx_depth -= 1
+                if self._tx_depth == 0:
+                    self._conn.execute("ROLLBACK")
+                    self._dirty_all = False
+                    self._dirty_collections.clear()
+                    self._dirty_prints.clear()
+                raise
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                # Änderungszähler in der Datei, damit andere Prozesse/Instanzen den Cache verwerfen
+                self._conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('change_counter', 1)"
+                    " ON CONFLICT(key) DO UPDATE SET value = value + 1"
+                )
+                self._conn.execute("COMMIT")
+                self._after_commit()
+                if hasattr(self, "_compactor"):
+                    self._compactor.notify()
+
+    # --- Cache-Verwaltung ---
+    def _file_signature(self):
+        # mtime/Größe und PRAGMA data_version taugen im WAL-Modus nicht, da sie sich auch
+        # durch reine Checkpoints des Compactors ändern. Stattdessen zählt jede Transaktion
+        # einen Zähler in meta hoch; die Inode erkennt eine komplett ersetzte Datenbankdatei.
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'change_counter'").fetchone()
+        try:
+            st = os.stat(self.db_path)
+            file_id = (st.st_dev, st.st_ino)
+        except OSError:
+            file_id = None
+        return (row["value"] if row else None, file_id)
+
+    def _mark_dirty(self, collection_id=None, print_id=None):
+        # Merkt sich, welche gecachten Sammlungen nach dem Commit verworfen werden müssen
+        if collection_id is not None:
+            self._dirty_collections.add(collection_id)
+        if print_id:
+            self._dirty_prints.add(print_id)
+
+    def _after_commit(self):
+        self._version += 1
+        self._headers = None
+        self._manifest = None
+        if self._dirty_all:
+            self._collection_cache.clear()
+        else:
+            for key, (_, print_ids) in list(self._collection_cache.items()):
+                if key[0] in self._dirty_collections or not self._dirty_prints.isdisjoint(print_ids):
+                    del self._collection_cache[key]
+        self._dirty_all = False
+        self._dirty_collections.clear()
+        self._dirty_prints.clear()
+        # Eigene Änderungen sind bekannt, die neue Dateisignatur ist damit gültig
+        self._cache_signature = (self._version, self._file_signature())
+
+    def _check_cache(self):
+        signature = (self._version, self._file_signature())
+        if signature != self._cache_signature:
+            self._headers = None
+            self._manifest = None
+            self._collection_cache.clear()
+            self._print_cache.clear()
+            self._cache_signature = signature
+
+    def _header_rows(self):
+        self._check_cache()
+        if self._headers is None:
+            self._headers = self._conn.execute("SELECT * FROM collections ORDER BY id").fetchall()
+        return self._headers
+
+    def _cached_collection(self, row, full):
+        key = (row["id"], full)
+        if key not in self._collection_cache:
+            collection = self._load_collection_row(row, full)
+            print_ids = {card["id"] for card in collection["cards"] if card.get("id")}
+            self._collection_cache[key] = (collection, print_ids)
+        return self._collection_cache[key][0]
+
+    # --- Aufteilen/Zusammensetzen der Karteneinträge ---
+    @staticmethod
+    def _split_card(card):
+        """Teilt ein Karten-Dict in (Scryfall-Objekt, Besitzfelder, lokale Zusatzfelder)."""
+        print_data = {}
+        extra = {}
+        for key, value in card.items():
+            if key == "entry_id" or key in OWNED_FIELDS:
+                continue
+            if key in LOCAL_FIELDS or not card.get("id"):
+                # Karten ohne Scryfall-ID komplett am Eintrag speichern
+                extra[key] = value
+            else:
+                print_data[key] = value
+        count = card.get("count", 1)
+        try:
+            count = int(count)
+        except Exception:
+            count = 1
+        owned = (
+            count,
+            card.get("lang"),
+            card.get("variant"),
+            1 if card.get("is_proxy") else 0,
+            card.get("purchase_price"),
+            card.get("eur"),
+        )
+        return print_data, owned, extra
+
+    def _upsert_print(self, conn, print_data):
+        if not print_data.get("id"):
+            return None
+        projected = project_card(print_data)
+        if projected != print_data:
+            # Vollständiges Objekt (z. B. frisch von Scryfall) für rehydrate_card() aufheben
+            conn.execute(
+                "INSERT OR REPLACE INTO card_cache (id, data, updated_at) VALUES (?, ?, ?)",
+                (print_data["id"], serializer.dumps(print_data, CARD_CACHE_ENCODING), time.time()),
+            )
+        conn.execute(
+            "INSERT INTO prints (id, data) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET data = excluded.data",
+            (print_data["id"], serializer.dumps(projected)),
+        )
+        self._print_cache.pop(print_data["id"], None)
+        self._mark_dirty(print_id=print_data["id"])
+        return print_data["id"]
+
+    def _insert_entry(self, conn, collection_id, card, entry_id=None):
+        print_data, owned, extra = self._split_card(card)
+        print_id = self._upsert_print(conn, print_data)
+        cur = conn.execute(
+            "INSERT INTO entries (id, collection_id, print_id, count, lang, variant, is_proxy, purchase_price, eur, extra)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (entry_id, collection_id, print_id) + owned + (serializer.dumps(extra) if extra else None,),
+        )
+        return cur.lastrowid
+
+    def _get_print(self, print_id):
+        # Jedes Kartenobjekt wird nur einmal dekodiert, auch wenn es in mehreren Sammlungen liegt
+        if print_id not in self._print_cache:
+            row = self._conn.execute("SELECT data FROM prints WHERE id = ?", (print_id,)).fetchone()
+            self._print_cache[print_id] = serializer.loads(row["data"]) if row else {}
+        return self._print_cache[print_id]
+
+    def _entry_to_card(self, row, full=True):
+        card = {}
+        if full and row["print_id"]:
+            card.update(self._get_print(row["print_id"]))
+        if row["extra"]:
+            card.update(serializer.loads(row["extra"]))
+        card["count"] = row["count"]
+        card["is_proxy"] = bool(row["is_proxy"])
+        # Leere Felder weglassen, damit card.get(key, default) wie bisher greift
+        for key in ("lang", "variant", "purchase_price", "eur"):
+            if row[key] is not None:
+                card[key] = row[key]
+        card["entry_id"] = row["id"]
+        if not full:
+            card["id"] = row["print_id"]
+        return card
+
+    def _collection_id(self, name):
+        row = self._conn.execute("SELECT id FROM collections WHERE name = ?", (name,)).fetchone()
+        return row["id"] if row else None
+
+    def _entry_row(self, entry_id):
+        return self._conn.execute(
+            "SELECT collection_id, print_id, count, purchase_price, eur FROM entries WHERE id = ?", (entry_id,)
+        ).fetchone()
+
+    def _refresh_totals(self, conn, collection_id):
+        # Komplette Neuberechnung aus der Partition der Sammlung; nur für Migrationen,
+        # Importe und recompute_totals(). Einzeländerungen laufen über _apply_delta.
+        market_value = purchase_value = 0.0
+        card_count = entry_count = 0
+        prints = set()
+        for row in conn.execute(
+            "SELECT print_id, count, purchase_price, eur FROM entries WHERE collection_id = ?", (collection_id,)
+        ):
+            count = row["count"] or 1
+            market_value += safe_float(row["eur"]) * count
+            purchase_value += safe_float(row["purchase_price"]) * count
+            card_count += count
+            entry_count += 1
+            if row["print_id"]:
+                prints.add(row["print_id"])
+        conn.execute(
+            "UPDATE collections SET market_value = ?, purchase_value = ?, card_count = ?, entry_count = ?,"
+            " unique_prints = ? WHERE id = ?",
+            (market_value, purchase_value, card_count, entry_count, len(prints), collection_id),
+        )
+
+    @staticmethod
+    def _contribution(count, purchase_price, eur):
+        """Anteil eines Eintrags an den Summen: (Marktwert, Kaufwert, Kartenzahl)."""
+        count = count or 1
+        return safe_float(eur) * count, safe_float(purchase_price) * count, count
+
+    def _has_print(self, conn, collection_id, print_id, exclude_entry_id):
+        # Punktabfrage über idx_entries_collection_print
+        return conn.execute(
+            "SELECT 1 FROM entries WHERE collection_id = ? AND print_id = ? AND id != ? LIMIT 1",
+            (collection_id, print_id, exclude_entry_id),
+        ).fetchone() is not None
+
+    def _apply_delta(self, conn, collection_id, old=None, new=None, entries=0, prints=0):
+        """Schreibt die Summen einer Sammlung um die Differenz alt -> neu fort.
+
+        old/new sind (count, purchase_price, eur) eines Eintrags oder None.
+        """
+        market = purchase = 0.0
+        cards = 0
+        if old is not None:
+            m, p, c = self._contribution(*old)
+            market, purchase, cards = market - m, purchase - p, cards - c
+        if new is not None:
+            m, p, c = self._contribution(*new)
+            market, purchase, cards = market + m, purchase + p, cards + c
+        conn.execute(
+            "UPDATE collections SET market_value = market_value + ?, purchase_value = purchase_value + ?,"
+            " card_count = card_count + ?, entry_count = entry_count + ?, unique_prints = unique_prints + ?,"
+            " updated_at = ? WHERE id = ?",
+            (market, purchase, cards, entries, prints, time.time(), collection_id),
+        )
+
+    # --- Sammlungen lesen ---
+    def list_manifest(self):
+        """Nur die Kopfdaten aller Sammlungen (ohne Karten), inkl. gespeicherter Summen."""
+        with self._lock:
+            self._header_rows()
+            if self._manifest is None:
+                self._manifest = [
+                    {
+                        "name": row["name"],
+                        "color": row["color"],
+                        "last_price_update": row["last_price_update"],
+                        "market_value": row["market_value"],
+                        "purchase_value": row["purchase_value"],
+                        "card_count": row["card_count"],
+                        "entry_count": row["entry_count"],
+                        "unique_prints": row["unique_prints"],
+                        "updated_at": row["updated_at"],
+                    }
+                    for row in self._headers
+                ]
+            return self._manifest
+
+    def collection_names(self):
+        with self._lock:
+            return [row["name"] for row in self._header_rows()]
+
+    def load_collections(self, full=True):
+        """Alle Sammlungen inkl. Karten, im Format der alten collections.json.
+
+        Mit full=False enthalten die Karten nur die Besitzfelder (count, eur, ...)
+        und die Scryfall-ID; das vollständige Kartenobjekt wird nicht geladen.
+        """
+        with self._lock:
+            return [self._cached_collection(row, full) for row in self._header_rows()]
+
+    def get_collection(self, name, full=True):
+        with self._lock:
+            for row in self._header_rows():
+                if row["name"] == name:
+                    return self._cached_collection(row, full)
+        return None
+
+    def data_version(self):
+        """Ändert sich mit jeder Änderung an der Datenbank (auch durch andere Prozesse)."""
+        with self._lock:
+            self._check_cache()
+            return self._cache_signature
+
+    def print_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM prints").fetchone()[0]
+
+    def card_name_entries(self):
+        """(angezeigter Name, Kartenname, Sprache) aller gespeicherten Karten für den Namensindex."""
+        entries = []
+        with self._lock:
+            for row in self._conn.execute("SELECT id FROM prints").fetchall():
+                card = self._get_print(row["id"])
+                if not card.get("name"):
+                    continue
+                entries.append((card["name"], card["name"], None))
+                if card.get("printed_name") and card["printed_name"] != card["name"]:
+                    entries.append((card["printed_name"], card["name"], card.get("lang")))
+        return entries
+
+    def find_print_by_name(self, name):
+        """Gespeichertes Kartenobjekt mit diesem (englischen oder gedruckten) Namen."""
+        with self._lock:
+            for row in self._conn.execute("SELECT id FROM prints").fetchall():
+                card = self._get_print(row["id"])
+                if name in (card.get("name"), card.get("printed_name")):
+                    return dict(card)
+        return None
+
+    def get_full_card(self, card):
+        """Ergänzt einen schlanken Eintrag (full=False) um das vollständige Kartenobjekt."""
+        with self._lock:
+            full_card = dict(self._get_print(card["id"])) if card.get("id") else {}
+        full_card.update(card)
+        return full_card
+
+    def rehydrate_card(self, card):
+        """Ergänzt einen Eintrag um alle Scryfall-Felder, auch die durch die Projektion weggelassenen."""
+        with self._lock:
+            row = None
+            if card.get("id"):
+                row = self._conn.execute("SELECT data FROM card_cache WHERE id = ?", (card["id"],)).fetchone()
+            full_card = serializer.loads(row["data"]) if row else {}
+        full_card.update(self.get_full_card(card))
+        return full_card
+
+    def _load_collection_row(self, row, full=True):
+        cards = [
+            self._entry_to_card(entry_row, full)
+            for entry_row in self._conn.execute(
+                "SELECT * FROM entries WHERE collection_id = ? ORDER BY id", (row["id"],)
+            )
+        ]
+        return {
+            "name": row["name"],
+            "color": row["color"],
+            "last_price_update": row["last_price_update"],
+            "cards": cards,
+        }
+
+    # --- Sammlungen schreiben ---
+    def create_collection(self, name, color="#888888"):
+        with self.transaction() as conn:
+            conn.execute("INSERT INTO collections (name, color) VALUES (?, ?)", (name, color))
+
+    def delete_collection(self, name):
+        with self.transaction() as conn:
+            self._mark_dirty(self._collection_id(name))
+            conn.execute("DELETE FROM collections WHERE name = ?", (name,))
+
+    def set_last_price_update(self, name, timestamp):
+        with self.transaction() as conn:
+            self._mark_dirty(self._collection_id(name))
+            conn.execute("UPDATE collections SET last_price_update = ? WHERE name = ?", (timestamp, name))
+
+    def recompute_totals(self):
+        """Berechnet die Summen aller Sammlungen neu (z. B. gegen Rundungsdrift)."""
+        with self.transaction() as conn:
+            self._dirty_all = True
+            for row in conn.execute("SELECT id FROM collections").fetchall():
+                self._refresh_totals(conn, row["id"])
+
+    def reset_price_updates(self):
+        """Setzt last_price_update aller Sammlungen auf 0 (erzwingt ein Preisupdate von vorn)."""
+        with self.transaction() as conn:
+            self._dirty_all = True
+            conn.execute("UPDATE collections SET last_price_update = 0")
+            conn.execute("DELETE FROM price_runs")
+            conn.execute("DELETE FROM price_queue")
+
+    # --- Fortsetzbare Preisupdates ---
+    def start_price_run(self, collection_names):
+        """Beginnt Preisupdates für die Sammlungen bzw. setzt unterbrochene fort.
+
+        Neue Durchläufe stellen alle Scryfall-IDs der Sammlung in die Warteschlange,
+        fortgesetzte behalten die noch offenen. Gibt die Namen der fortgesetzten zurück.
+        """
+        resumed = []
+        with self.transaction() as conn:
+            if conn.execute("SELECT 1 FROM price_runs LIMIT 1").fetchone() is None:
+                # Reste ohne laufenden Durchlauf (z. B. gelöschte Sammlungen) verwerfen
+                conn.execute("DELETE FROM price_queue")
+            for name in collection_names:
+                collection_id = self._collection_id(name)
+                if collection_id is None:
+                    continue
+                if conn.execute("SELECT 1 FROM price_runs WHERE collection_id = ?", (collection_id,)).fetchone():
+                    resumed.append(name)
+                    continue
+                conn.execute("INSERT INTO price_runs (collection_id, started_at) VALUES (?, ?)", (collection_id, time.time()))
+                conn.execute(
+                    "INSERT OR IGNORE INTO price_queue (print_id) SELECT DISTINCT print_id FROM entries"
+                    " WHERE collection_id = ? AND print_id IS NOT NULL",
+                    (collection_id,),
+                )
+        return resumed
+
+    def price_run_ids(self, collection_name):
+        """(alle Scryfall-IDs der Sammlung, davon noch offen) für den laufenden Durchlauf."""
+        with self._lock:
+            collection_id = self._collection_id(collection_name)
+            rows = self._conn.execute(
+                "SELECT DISTINCT entries.print_id, price_queue.print_id IS NOT NULL AS pending FROM entries"
+                " LEFT JOIN price_queue ON price_queue.print_id = entries.print_id"
+                " WHERE entries.collection_id = ? AND entries.print_id IS NOT NULL",
+                (collection_id,),
+            ).fetchall()
+        return {row["print_id"] for row in rows}, {row["print_id"] for row in rows if row["pending"]}
+
+    def checkpoint_prices(self, variant_prices):
+        """Schreibt geholte Preise sofort in alle Einträge und streicht die IDs aus der Warteschlange.
+
+        variant_prices: {scryfall_id: {variante: preis}}; "nonfoil" gilt für unbekannte Varianten.
+        Gibt (scryfall_id, variante, preis) je betroffener Karte und Variante zurück (für den Preisverlauf).
+        """
+        with self.transaction() as conn:
+            market_deltas = {}
+            changes = []
+            applied = {}
+            for print_id, prices in variant_prices.items():
+                for row in conn.execute(
+                    "SELECT id, collection_id, count, variant, eur FROM entries WHERE print_id = ?", (print_id,)
+                ).fetchall():
+                    eur = prices.get(row["variant"] or "nonfoil", prices.get("nonfoil", ""))
+                    applied[(print_id, row["variant"] or "nonfoil")] = eur
+                    if eur == row["eur"]:
+                        continue
+                    delta = (safe_float(eur) - safe_float(row["eur"])) * (row["count"] or 1)
+                    market_deltas[row["collection_id"]] = market_deltas.get(row["collection_id"], 0.0) + delta
+                    changes.append((eur, row["id"]))
+            if changes:
+                conn.executemany("UPDATE entries SET eur = ? WHERE id = ?", changes)
+            for collection_id, delta in market_deltas.items():
+                self._mark_dirty(collection_id)
+                conn.execute(
+                    "UPDATE collections SET market_value = market_value + ?, updated_at = ? WHERE id = ?",
+                    (delta, time.time(), collection_id),
+                )
+            conn.executemany("DELETE FROM price_queue WHERE print_id = ?", [(print_id,) for print_id in variant_prices])
+        return [(print_id, variant, eur) for (print_id, variant), eur in applied.items()]
+
+    def finish_price_run(self, collection_name, timestamp=None):
+        """Beendet den Durchlauf einer Sammlung und setzt last_price_update."""
+        with self.transaction() as conn:
+            collection_id = self._collection_id(collection_name)
+            conn.execute("DELETE FROM price_runs WHERE collection_id = ?", (collection_id,))
+            self.set_last_price_update(collection_name, timestamp or time.time())
+
+    # --- Karteneinträge schreiben ---
+    def add_card(self, collection_name, card):
+        """Fügt einen Karteneintrag hinzu und gibt dessen entry_id zurück."""
+        with self.transaction() as conn:
+            collection_id = self._collection_id(collection_name)
+            if collection_id is None:
+                raise KeyError(f"Sammlung '{collection_name}' existiert nicht.")
+            entry_id = self._insert_entry(conn, collection_id, card)
+            print_id = card.get("id")
+            new_print = 1 if print_id and not self._has_print(conn, collection_id, print_id, entry_id) else 0
+            count, _, _, _, purchase_price, eur = self._split_card(card)[1]
+            self._apply_delta(conn, collection_id, new=(count, purchase_price, eur), entries=1, prints=new_print)
+            self._mark_dirty(collection_id)
+            card["entry_id"] = entry_id
+            return entry_id
+
+    def update_card(self, entry_id, card):
+        print_data, owned, extra = self._split_card(card)
+        with self.transaction() as conn:
+            old = self._entry_row(entry_id)
+            if old is None:
+                return
+            collection_id = old["collection_id"]
+            self._mark_dirty(collection_id)
+            print_id = self._upsert_print(conn, print_data)
+            conn.execute(
+                "UPDATE entries SET print_id = ?, count = ?, lang = ?, variant = ?, is_proxy = ?,"
+                " purchase_price = ?, eur = ?, extra = ? WHERE id = ?",
+                (print_id,) + owned + (serializer.dumps(extra) if extra else None, entry_id),
+            )
+            prints = 0
+            if print_id != old["print_id"]:
+                if old["print_id"] and not self._has_print(conn, collection_id, old["print_id"], entry_id):
+                    prints -= 1
+                if print_id and not self._has_print(conn, collection_id, print_id, entry_id):
+                    prints += 1
+            self._apply_delta(
+                conn, collection_id,
+                old=(old["count"], old["purchase_price"], old["eur"]),
+                new=(owned[0], owned[4], owned[5]),
+                prints=prints,
+            )
+        card["entry_id"] = entry_id
+
+    def delete_card(self, entry_id):
+        with self.transaction() as conn:
+            old = self._entry_row(entry_id)
+            if old is None:
+                return
+            collection_id = old["collection_id"]
+            self._mark_dirty(collection_id)
+            prints = -1 if old["print_id"] and not self._has_print(conn, collection_id, old["print_id"], entry_id) else 0
+            conn.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+            self._apply_delta(
+                conn, collection_id, old=(old["count"], old["purchase_price"], old["eur"]), entries=-1, prints=prints
+            )
+
+    def update_prices(self, collection_name, cards, timestamp=None):
+        """Schreibt die Preise (eur) der übergebenen Karteneinträge und optional den Update-Zeitstempel."""
+        with self.transaction() as conn:
+            collection_id = self._collection_id(collection_name)
+            self._mark_dirty(collection_id)
+            # Nur die Marktwert-Differenz der geänderten Einträge fortschreiben
+            market_delta = 0.0
+            changes = []
+            for card in cards:
+                entry_id = card.get("entry_id")
+                if entry_id is None:
+                    continue
+                old = self._entry_row(entry_id)
+                if old is None or old["collection_id"] != collection_id or old["eur"] == card.get("eur"):
+                    continue
+                count = old["count"] or 1
+                market_delta += (safe_float(card.get("eur")) - safe_float(old["eur"])) * count
+                changes.append((card.get("eur"), entry_id))
+            if changes:
+                conn.executemany("UPDATE entries SET eur = ? WHERE id = ?", changes)
+                conn.execute(
+                    "UPDATE collections SET market_value = market_value + ?, updated_at = ? WHERE id = ?",
+                    (market_delta, time.time(), collection_id),
+                )
+            if timestamp is not None:
+                self.set_last_price_update(collection_name, timestamp)
+
+    def cardmarket_ids(self):
+        """cardmarket_id -> [Scryfall-IDs] aller gespeicherten Drucke (für Preisimporte)."""
+        ids = {}
+        with self._lock:
+            for row in self._conn.execute("SELECT id FROM prints").fetchall():
+                cardmarket_id = self._get_print(row["id"]).get("cardmarket_id")
+                if cardmarket_id:
+                    ids.setdefault(int(cardmarket_id), []).append(row["id"])
+        return ids
+
+    def apply_price_table(self, price_db_path, timestamp=None):
+        """Setzt eur aller Einträge aus einer Preistabelle (price_ingest) in einem Join.
+
+        Die Spalte wird nach Variante gewählt (eur, eur_foil, eur_etched, eur_gilded).
+        Einträge ohne Zeile in der Tabelle bleiben unverändert. Danach werden die
+        Summen neu berechnet und last_price_update aller Sammlungen gesetzt.
+        Gibt die Anzahl geänderter Einträge zurück.
+        """
+        timestamp = timestamp or time.time()
+        with self._lock:
+            # ATTACH/DETACH sind innerhalb einer Transaktion nicht erlaubt
+            self._conn.execute("ATTACH DATABASE ? AS price_source", (price_db_path,))
+            try:
+                with self.transaction() as conn:
+                    changed = conn.execute(
+                        "UPDATE entries SET eur = new.price FROM ("
+                        " SELECT entries.id AS entry_id, CASE entries.variant"
+                        "  WHEN 'foil' THEN p.eur_foil WHEN 'etched' THEN p.eur_etched"
+                        "  WHEN 'gilded' THEN p.eur_gilded ELSE p.eur END AS price"
+                        " FROM entries JOIN price_source.prices p ON p.id = entries.print_id"
+                        ") AS new WHERE entries.id = new.entry_id AND entries.eur IS NOT new.price"
+                    ).rowcount
+                    self._dirty_all = True
+                    for row in conn.execute("SELECT id FROM collections").fetchall():
+                        self._refresh_totals(conn, row["id"])
+                    conn.execute("UPDATE collections SET last_price_update = ?", (timestamp,))
+            finally:
+                self._conn.execute("DETACH DATABASE price_source")
+        return changed
+
+
+class WalCompactor:
+    """Hintergrund-Thread, der das Write-Ahead-Log in die Hauptdatei verdichtet."""
+
+    def __init__(self, db_path, threshold=WAL_CHECKPOINT_BYTES):
+        self.wal_path = db_path + "-wal"
+        self.threshold = threshold
+        self.checkpoints = 0
+        self._db_path = db_path
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="wal-compactor", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        # Wird nach jedem Commit aufgerufen; kostet nur ein stat()
+        try:
+            if os.path.getsize(self.wal_path) >= self.threshold:
+                self._wakeup.set()
+        except OSError:
+            pass
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        # Eigene Verbindung, damit der Checkpoint die GUI-Verbindung nicht blockiert
+        conn = sqlite3.connect(self._db_path, check_same_thread=False)
+        conn.execute("PRAGMA busy_timeout = 2000")
+        try:
+            while True:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                if self._stopped:
+                    return
+                try:
+                    busy, _, _ = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+                    if not busy:
+                        self.checkpoints += 1
+                except sqlite3.Error as e:
+                    print(f"[ERROR] WAL-Checkpoint fehlgeschlagen: {e}")
+        finally:
+            conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Gemeinsame Store-Instanz für die gesamte Anwendung."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CollectionStore()
+        return _store
+
+
+def close_store():
+    """Beim Beenden aufrufen: stoppt den Compactor und verdichtet das Log ein letztes Mal."""
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
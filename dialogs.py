@@ -1,11 +1,14 @@
 # dialogs.py
 # Dialogklassen für das Projekt
 import os
-import requests
+import http_client
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QScrollArea, QWidget
 from PyQt6.QtGui import QPixmap
 from PyQt6.QtCore import Qt
 from utils import get_cached_image
+from card_db import oracle_id_from_search_uri
+from oracle_index import get_oracle_index
+from set_catalog import set_size as set_size_for
 
 class CardSelectorDialog(QDialog):
     def __init__(self, search_results, on_select):
@@ -42,7 +45,7 @@ class CardSelectorDialog(QDialog):
                 api_set = quote(set_name)
                 scryfall_url = f"https://api.scryfall.com/cards/named?exact={api_name}&set={api_set}"
                 try:
-                    resp = requests.get(scryfall_url, timeout=3)
+                    resp = http_client.get(scryfall_url, timeout=3)
                     if resp.status_code == 200:
                         data = resp.json()
                         image_url = data.get("image_uris", {}).get("small")
@@ -71,19 +74,7 @@ class CardSelectorDialog(QDialog):
             set_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
             info_layout.addWidget(name_label)
             info_layout.addWidget(set_label)
-            set_size = card.get("set_size")
-            if not set_size:
-                set_code = card.get("set") or card.get("set_code")
-                if set_code:
-                    try:
-                        set_api_url = f"https://api.scryfall.com/sets/{set_code}"
-                        resp = requests.get(set_api_url, timeout=3)
-                        if resp.status_code == 200:
-                            set_data = resp.json()
-                            set_size = set_data.get("card_count", "?")
-                    except Exception as e:
-                        print(f"Fehler beim Laden von set_size: {e}")
-                        set_size = "?"
+            set_size = card.get("set_size") or set_size_for(card.get("set") or card.get("set_code"), "?")
             collector_number = card.get("collector_number", "?")
             fin_info = f"FIN {collector_number}/{set_size}"
             fin_label = QLabel(fin_info)
@@ -130,7 +121,7 @@ class CardSelectorDialog(QDialog):
                 api_set = quote(set_name)
                 scryfall_url = f"https://api.scryfall.com/cards/named?exact={api_name}&set={api_set}"
                 try:
-                    resp = requests.get(scryfall_url, timeout=3)
+                    resp = http_client.get(scryfall_url, timeout=3)
                     if resp.status_code == 200:
                         data = resp.json()
                         image_url = data.get("image_uris", {}).get("small")
@@ -162,19 +153,7 @@ class CardSelectorDialog(QDialog):
             info_layout.addWidget(name_label)
             info_layout.addWidget(set_label)
 
-            set_size = card.get("set_size")
-            if not set_size:
-                set_code = card.get("set") or card.get("set_code")
-                if set_code:
-                    try:
-                        set_api_url = f"https://api.scryfall.com/sets/{set_code}"
-                        resp = requests.get(set_api_url, timeout=3)
-                        if resp.status_code == 200:
-                            set_data = resp.json()
-                            set_size = set_data.get("card_count", "?")
-                    except Exception as e:
-                        print(f"Fehler beim Laden von set_size: {e}")
-                        set_size = "?"
+            set_size = card.get("set_size") or set_size_for(card.get("set") or card.get("set_code"), "?")
 
             collector_number = card.get("collector_number", "?")
             fin_info = f"FIN {collector_number}/{set_size}"
@@ -233,10 +212,21 @@ class VariantSelector(QDialog):
 
     def load_variants(self, url):
         from urllib.parse import quote
-        response = requests.get(url)
-        if response.status_code != 200:
-            return
-        data = response.json()
+        # Drucke aus dem lokalen Oracle-Index, wenn die Liste dort vollständig ist (Spiegel oder
+        # gemerkte Scryfall-Antwort), sonst von Scryfall (Antwort wird gemerkt).
+        # Wie Scryfall ohne lang-Filter: die englischen Drucke
+        oracle_id = oracle_id_from_search_uri(url)
+        oracle_index = get_oracle_index()
+        local_prints = oracle_index.complete_prints(oracle_id, 'en')
+        if local_prints:
+            data = {'data': local_prints}
+        else:
+            response = http_client.get(url)
+            if response.status_code != 200:
+                return
+            data = response.json()
+            if oracle_id:
+                oracle_index.record_search_response(oracle_id, 'en', data)
         buttons = []
         for card in data.get('data', []):
             hbox = QHBoxLayout()
@@ -249,7 +239,7 @@ class VariantSelector(QDialog):
                 api_set = quote(card.get('set_name', ''))
                 scryfall_url = f"https://api.scryfall.com/cards/named?exact={api_name}&set={api_set}"
                 try:
-                    resp = requests.get(scryfall_url, timeout=3)
+                    resp = http_client.get(scryfall_url, timeout=3)
                     if resp.status_code == 200:
                         data2 = resp.json()
                         image_url = data2.get("image_uris", {}).get("small")
@@ -287,15 +277,7 @@ class VariantSelector(QDialog):
 
             set_size = card.get("set_size")
             if not set_size and set_code != "?":
-                try:
-                    set_api_url = f"https://api.scryfall.com/sets/{set_code}"
-                    resp = requests.get(set_api_url, timeout=3)
-                    if resp.status_code == 200:
-                        set_data = resp.json()
-                        set_size = set_data.get("card_count", "?")
-                except Exception as e:
-                    print(f"Fehler beim Laden von set_size: {e}")
-                    set_size = "?"
+                set_size = set_size_for(set_code, "?")
 
             collector_number = card.get("collector_number", "?")
            # --- Erweiterung: Zeige Foil-Typ, Preise, Legalities ---
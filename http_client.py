@@ -0,0 +1,368 @@
+# http_client.py
+# Gemeinsamer HTTP-Client mit persistentem Antwort-Cache
+#
+# Alle Scryfall-Aufrufe laufen über get(). Antworten werden nach URL in einer
+# SQLite-Datei (http_cache.db) gespeichert und innerhalb ihrer Lebensdauer
+# ohne Netz beantwortet:
+#   /sets...          SET_TTL   (Set-Daten ändern sich kaum)
+#   /cards/...        CARD_TTL  (Kartendaten)
+#   Preisabfragen     PRICE_TTL (Aufrufer übergeben ttl=PRICE_TTL)
+# Abgelaufene Einträge mit ETag/Last-Modified werden bedingt neu angefragt;
+# bei 304 gilt der gespeicherte Inhalt wieder als frisch. Ist das Netz weg,
+# wird ein abgelaufener Eintrag trotzdem geliefert. Der Cache ist auf
+# HTTP_CACHE_MAX_BYTES begrenzt, verdrängt wird der am längsten nicht
+# genutzte Eintrag (LRU). stats() liefert Treffer-/Fehlzähler.
+#
+# Bilder werden nicht hier gecacht (cache=False), dafür gibt es den Bild-Cache
+# in utils.get_cached_image.
+#
+# Netzwerkzugriffe laufen über eine gemeinsame requests.Session (Keep-Alive,
+# Verbindungspool). Aufrufe an api.scryfall.com teilen sich prozessweit einen
+# Token-Bucket (SCRYFALL_RATE Anfragen/s), auch wenn mehrere Preisupdate-
+# Threads parallel laufen. 429 und 5xx werden mit exponentiellem Backoff
+# (Retry-After wird beachtet) wiederholt, aber nur außerhalb des GUI-Threads;
+# dort geht die Antwort sofort an den Aufrufer. Verbindungsfehler und
+# Timeouts werden nie wiederholt, offline schlägt ein Aufruf also sofort fehl
+# (bzw. get() liefert den veralteten Eintrag).
+#
+# post_json() (z. B. /cards/collection) läuft ungecacht über dieselbe Session
+# und Drosselung.
+#
+# Gleichzeitige Aufrufe für dieselbe URL (z. B. zwei Preisupdate-Threads mit
+# derselben Karte) teilen sich eine laufende Anfrage (single_flight).
+import os
+import json
+import time
+import sqlite3
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from single_flight import get_group
+
+HTTP_CACHE_FILE = "http_cache.db"
+HTTP_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+CARD_TTL = 3 * 24 * 3600
+PRICE_TTL = 6 * 3600
+SET_TTL = 7 * 24 * 3600
+# 404 (z. B. "keine Karte gefunden") nur kurz merken
+NEGATIVE_TTL = 3600
+
+# Erste passende URL-Präfix-Regel bestimmt die Lebensdauer; ohne Treffer wird nicht gecacht
+TTL_RULES = (
+    ("https://api.scryfall.com/sets", SET_TTL),
+    ("https://api.scryfall.com/cards/", CARD_TTL),
+)
+
+CACHEABLE_STATUS = (200, 404)
+
+# API-Basis; für Tests gegen einen lokalen Stub-Server per MTG_SCRYFALL_API überschreibbar
+SCRYFALL_API_BASE = os.environ.get("MTG_SCRYFALL_API", "https://api.scryfall.com").rstrip("/")
+
+# Scryfall bittet um 50-100 ms Abstand zwischen API-Anfragen (ca. 10/s);
+# die Bilder-Hosts (*.scryfall.io) sind nicht begrenzt
+SCRYFALL_API_HOST = "api.scryfall.com"
+SCRYFALL_RATE = 10.0
+SCRYFALL_BURST = 2
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+USER_AGENT = "MTGDesktopManager/1.0"
+
+
+class CachedResponse:
+    """Antwort mit der Schnittstelle, die der Code von requests.Response nutzt."""
+
+    def __init__(self, url, status_code, content, headers=None, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.from_cache = from_cache
+
+    @property
+    def ok(self):
+        return 200 <= self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def ttl_for(url):
+    for prefix, ttl in TTL_RULES:
+        if url.startswith(prefix):
+            return ttl
+    return 0
+
+
+class ResponseCache:
+    """Persistenter URL -> Antwort-Speicher mit LRU-Verdrängung."""
+
+    def __init__(self, db_path=HTTP_CACHE_FILE, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY,"
+            " status INTEGER NOT NULL,"
+            " headers TEXT,"
+            " body BLOB NOT NULL,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " fetched_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " size INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, url):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            return row
+
+    def put(self, url, status, headers, body):
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        now = time.time()
+        size = len(body) + len(url)
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, status, json.dumps(dict(headers)), body, etag, last_modified, now, now, size),
+            )
+            self._total_bytes += size - (old["size"] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def touch(self, url):
+        """Nach 304: gespeicherter Inhalt gilt wieder als frisch."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+
+    def _evict(self):
+        # Auf 90 % der Grenze verkleinern, damit nicht jede Einfügung wieder verdrängt
+        target = self.max_bytes * 0.9
+        evicted = 0
+        self._conn.execute("BEGIN")
+        for row in self._conn.execute("SELECT url, size FROM responses ORDER BY accessed_at").fetchall():
+            if self._total_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM responses WHERE url = ?", (row["url"],))
+            self._total_bytes -= row["size"]
+            evicted += 1
+        self._conn.execute("COMMIT")
+        _count("evicted", evicted)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._total_bytes = 0
+
+    def size(self):
+        with self._lock:
+            return self._total_bytes
+
+
+_stats = {
+    "hits": 0, "misses": 0, "revalidated": 0, "stale_served": 0, "errors": 0, "evicted": 0,
+    "sent": 0, "retries": 0, "throttled": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0,
+}
+_stats_lock = threading.Lock()
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def _count_wait(seconds):
+    with _stats_lock:
+        _stats["throttled"] += 1
+        _stats["wait_seconds"] += seconds
+        _stats["max_wait_seconds"] = max(_stats["max_wait_seconds"], seconds)
+
+
+def stats():
+    """Zähler seit Programmstart: Cache (Treffer, Fehlzugriffe, 304, veraltet geliefert, Fehler,
+    verdrängt) und Netz (gesendet, Wiederholungen, gedrosselt, Wartezeit gesamt/maximal)."""
+    with _stats_lock:
+        result = dict(_stats)
+    requests_total = result["hits"] + result["misses"] + result["revalidated"]
+    result["hit_rate"] = (result["hits"] + result["revalidated"]) / requests_total if requests_total else 0.0
+    return result
+
+
+class TokenBucket:
+    """Prozessweiter Ratenbegrenzer: rate Anfragen pro Sekunde, höchstens burst auf einmal."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Wartet, bis ein Token frei ist; gibt die Wartezeit in Sekunden zurück."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            # Außerhalb der Sperre schlafen, andere Threads reihen sich so lange ein
+            time.sleep(delay)
+            waited += delay
+
+
+_scryfall_bucket = TokenBucket(SCRYFALL_RATE, SCRYFALL_BURST)
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Gemeinsame Session mit Verbindungspool (Keep-Alive über alle Threads)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"User-Agent": USER_AGENT, "Accept": "application/json;q=0.9,*/*;q=0.8"})
+            _session = session
+        return _session
+
+
+def _retry_delay(attempt, resp=None):
+    retry_after = resp.headers.get("Retry-After") if resp is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    return min(BACKOFF_BASE * (2 ** attempt), BACKOFF_MAX)
+
+
+def _send(url, timeout, headers=None, method="GET", json_body=None):
+    """Eine Anfrage über die Session, gedrosselt und mit Wiederholungen bei 429/5xx."""
+    limited = urlparse(url).hostname == SCRYFALL_API_HOST
+    session = get_session()
+    # Der GUI-Thread (Qt läuft im Haupt-Thread) darf nicht im Backoff schlafen
+    retries = 0 if threading.current_thread() is threading.main_thread() else MAX_RETRIES
+    for attempt in range(retries + 1):
+        if limited:
+            waited = _scryfall_bucket.acquire()
+            if waited:
+                _count_wait(waited)
+        _count("sent")
+        resp = session.request(method, url, timeout=timeout, headers=headers, json=json_body)
+        if resp.status_code not in RETRY_STATUS or attempt == retries:
+            return resp
+        delay = _retry_delay(attempt, resp)
+        print(f"[DEBUG] HTTP {resp.status_code} bei {url}, neuer Versuch in {delay:.1f}s")
+        _count("retries")
+        time.sleep(delay)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+def _from_row(row):
+    return CachedResponse(row["url"], row["status"], row["body"], json.loads(row["headers"] or "{}"), True)
+
+
+_flight = get_group("http")
+
+
+def get(url, timeout=10, ttl=None, cache=True, headers=None):
+    """GET über den Cache. ttl in Sekunden (Standard nach TTL_RULES); cache=False umgeht ihn ganz.
+
+    Wirft wie requests bei Netzwerkfehlern, außer es liegt ein (auch veralteter) Eintrag vor.
+    Läuft für dieselbe URL schon ein Aufruf, wird auf dessen Antwort gewartet.
+    """
+    if headers:
+        return _get(url, timeout, ttl, cache, headers)
+    return _flight.do((url, ttl, cache), _get, url, timeout, ttl, cache, None)
+
+
+def _get(url, timeout, ttl, cache, headers):
+    if ttl is None:
+        ttl = ttl_for(url)
+    if not cache or ttl <= 0:
+        _count("misses")
+        resp = _send(url, timeout, headers)
+        return CachedResponse(url, resp.status_code, resp.content, dict(resp.headers))
+
+    store = get_cache()
+    row = store.get(url)
+    if row is not None:
+        max_age = ttl if row["status"] == 200 else min(ttl, NEGATIVE_TTL)
+        if time.time() - row["fetched_at"] < max_age:
+            _count("hits")
+            return _from_row(row)
+
+    request_headers = dict(headers or {})
+    if row is not None and row["status"] == 200:
+        if row["etag"]:
+            request_headers["If-None-Match"] = row["etag"]
+        if row["last_modified"]:
+            request_headers["If-Modified-Since"] = row["last_modified"]
+    try:
+        resp = _send(url, timeout, request_headers or None)
+    except Exception as e:
+        if row is None:
+            _count("errors")
+            raise
+        print(f"[DEBUG] HTTP-Cache: Netzwerkfehler ({e}), liefere veralteten Eintrag für {url}")
+        _count("stale_served")
+        return _from_row(row)
+
+    if resp.status_code == 304 and row is not None:
+        store.touch(url)
+        _count("revalidated")
+        return _from_row(row)
+    _count("misses")
+    if resp.status_code in CACHEABLE_STATUS:
+        store.put(url, resp.status_code, resp.headers, resp.content)
+    return CachedResponse(url, resp.status_code, resp.content, dict(resp.headers))
+
+
+def post_json(url, payload, timeout=10):
+    """POST mit JSON-Body (z. B. /cards/collection). Nicht gecacht, aber gedrosselt und wiederholt."""
+    _count("misses")
+    resp = _send(url, timeout, method="POST", json_body=payload)
+    return CachedResponse(url, resp.status_code, resp.content, dict(resp.headers))
@@ -0,0 +1,240 @@
+# json_stream.py
+# Inkrementeller Leser für collections.json
+#
+# Die Datei wird per mmap eingeblendet statt komplett mit json.load geparst.
+# Beim Öffnen werden nur die Kopfdaten der Sammlungen (Name, Farbe, letztes
+# Preisupdate, Anzahl Einträge) gelesen; die Karten-Arrays werden dabei nur
+# übersprungen und ihre Position gemerkt. Karten werden erst in iter_cards()
+# einzeln dekodiert, so dass nie alle Karten-Dicts gleichzeitig im Speicher liegen.
+#
+# iter_json_array() nutzt denselben Scanner für beliebig große JSON-Arrays
+# (z. B. die Scryfall-Bulk-Dateien mit mehreren GB). MappedJson.iter_array(key)
+# liest auch ein Array, das in einem Objekt steckt (Cardmarket: "priceGuides").
+#
+# Alle JSON-Strukturzeichen sind ASCII, in UTF-8 kommen diese Bytes nie innerhalb
+# eines Mehrbyte-Zeichens vor. Deshalb kann direkt auf den Bytes gesucht werden.
+import mmap
+import re
+import serializer
+
+_WHITESPACE = re.compile(rb"[ \t\r\n]*")
+_STRING = re.compile(rb'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_SCALAR = re.compile(rb"[^,\]}\s]+")
+_STRUCTURE = re.compile(rb'["\[\]{}]')
+
+# Zeilen bis zu dieser Länge werden direkt dekodiert; längere (minifizierte Dateien
+# ohne Zeilenumbrüche) gehen über den Scanner, statt pro Element den Rest zu kopieren
+_FAST_LINE_LIMIT = 256 * 1024
+
+
+class MappedJson:
+    """Per mmap eingeblendete JSON-Datei mit Scanner für Werte und Arrays."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Leere Datei lässt sich nicht mappen
+            self._data = b""
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def iter_array(self, key=None):
+        """Elemente des obersten JSON-Arrays einzeln dekodiert; liefert (Element, Byte-Position).
+
+        Mit key das Array unter diesem Schlüssel des obersten Objekts (eine Liste ohne
+        umgebendes Objekt wird direkt gelesen)."""
+        pos = self._skip_ws(0)
+        if pos >= len(self._data):
+            return
+        if key is not None and self._data[pos:pos + 1] == b"{":
+            pos = self._member_pos(pos, key)
+            if pos is None:
+                return
+        if self._data[pos:pos + 1] != b"[":
+            raise ValueError(f"{self.path} enthält keine Liste")
+        data = self._data
+        pos = self._skip_ws(pos + 1)
+        if data[pos:pos + 1] == b"]":
+            return
+        line_end = -1
+        searched = 0  # bis hier gibt es keinen Zeilenumbruch (nach line_end)
+        while True:
+            # Schneller Weg für zeilenweise Dateien (Scryfall-Bulk: ein Objekt pro Zeile):
+            # die Zeile direkt dekodieren. Ist sie kein vollständiger Wert, sucht der
+            # Scanner das Ende.
+            item = end = None
+            if line_end < pos and pos >= searched:
+                line_end = data.find(b"\n", pos, pos + _FAST_LINE_LIMIT)
+                searched = line_end + 1 if line_end != -1 else pos + _FAST_LINE_LIMIT
+            if line_end >= pos:
+                candidate = data[pos:line_end].rstrip(b" \t\r,")
+                try:
+                    item = serializer.loads(candidate)
+                    end = pos + len(candidate)
+                except Exception:
+                    pass
+            if end is None:
+                end = self._skip_value(pos)
+                item = serializer.loads(data[pos:end])
+            yield item, end
+            pos = self._skip_ws(end)
+            if data[pos:pos + 1] != b",":
+                return
+            pos = self._skip_ws(pos + 1)
+
+    def size(self):
+        return len(self._data)
+
+    # --- Scanner ---
+    def _skip_ws(self, pos):
+        return _WHITESPACE.match(self._data, pos).end()
+
+    def _skip_value(self, pos):
+        """Position direkt hinter dem JSON-Wert, der bei pos beginnt."""
+        data = self._data
+        first = data[pos:pos + 1]
+        if first == b'"':
+            return _STRING.match(data, pos).end()
+        if first not in (b"{", b"["):
+            match = _SCALAR.match(data, pos)
+            if not match:
+                raise ValueError(f"Ungültiges JSON an Position {pos}")
+            return match.end()
+        depth = 0
+        while True:
+            match = _STRUCTURE.search(data, pos)
+            if not match:
+                raise ValueError("Unerwartetes Dateiende")
+            char = match.group()
+            if char == b'"':
+                pos = _STRING.match(data, match.start()).end()
+                continue
+            pos = match.end()
+            depth += 1 if char in (b"{", b"[") else -1
+            if depth == 0:
+                return pos
+
+    def _member_pos(self, pos, key):
+        # Position des Werts zu key im Objekt bei pos (andere Werte werden nur übersprungen)
+        data = self._data
+        pos = self._skip_ws(pos + 1)
+        while data[pos:pos + 1] == b'"':
+            key_end = self._skip_value(pos)
+            name = serializer.loads(data[pos:key_end])
+            pos = self._skip_ws(key_end)
+            pos = self._skip_ws(pos + 1)  # ':'
+            if name == key:
+                return pos
+            pos = self._skip_ws(self._skip_value(pos))
+            if data[pos:pos + 1] != b",":
+                break
+            pos = self._skip_ws(pos + 1)
+        return None
+
+    def _item_spans(self, pos):
+        data = self._data
+        pos = self._skip_ws(pos + 1)
+        if data[pos:pos + 1] == b"]":
+            return
+        while True:
+            end = self._skip_value(pos)
+            yield pos, end
+            pos = self._skip_ws(end)
+            if data[pos:pos + 1] != b",":
+                return
+            pos = self._skip_ws(pos + 1)
+
+
+class LazyCollectionsFile(MappedJson):
+    """Lazy-Zugriff auf eine collections.json. Als Context-Manager verwenden."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._headers = []
+        self._cards_pos = []
+        try:
+            self._scan_headers()
+        except BaseException:
+            self.close()
+            raise
+
+    # --- Öffentliche API ---
+    def headers(self):
+        """Kopfdaten aller Sammlungen ohne Karten; 'card_count' ist die Anzahl Einträge."""
+        return self._headers
+
+    def iter_cards(self, index):
+        """Liefert die Karten der index-ten Sammlung einzeln, jeweils frisch dekodiert."""
+        pos = self._cards_pos[index]
+        if pos is None:
+            return
+        for start, end in self._item_spans(pos):
+            yield serializer.loads(self._data[start:end])
+
+    def __iter__(self):
+        """(Kopfdaten, Karten-Iterator) für jede Sammlung, in Dateireihenfolge."""
+        for index, header in enumerate(self._headers):
+            yield header, self.iter_cards(index)
+
+    def _count_items(self, pos):
+        # Zählt die Elemente eines Arrays, ohne sie zu dekodieren
+        return sum(1 for _ in self._item_spans(pos))
+
+    def _scan_headers(self):
+        data = self._data
+        pos = self._skip_ws(0)
+        if data[pos:pos + 1] != b"[":
+            if pos < len(data):
+                raise ValueError("collections.json enthält keine Liste")
+            return
+        for start, end in self._item_spans(pos):
+            if data[start:start + 1] != b"{":
+                continue
+            header, cards_pos = self._parse_header(start)
+            if cards_pos is not None:
+                header["card_count"] = self._count_items(cards_pos)
+            else:
+                header["card_count"] = 0
+            self._headers.append(header)
+            self._cards_pos.append(cards_pos)
+
+    def _parse_header(self, pos):
+        # Liest ein Sammlungs-Objekt Schlüssel für Schlüssel; "cards" wird nur übersprungen
+        data = self._data
+        header = {}
+        cards_pos = None
+        pos = self._skip_ws(pos + 1)
+        while data[pos:pos + 1] != b"}":
+            key_end = self._skip_value(pos)
+            key = serializer.loads(data[pos:key_end])
+            pos = self._skip_ws(key_end)
+            pos = self._skip_ws(pos + 1)  # ':'
+            value_end = self._skip_value(pos)
+            if key == "cards":
+                if data[pos:pos + 1] == b"[":
+                    cards_pos = pos
+            else:
+                header[key] = serializer.loads(data[pos:value_end])
+            pos = self._skip_ws(value_end)
+            if data[pos:pos + 1] == b",":
+                pos = self._skip_ws(pos + 1)
+        return header, cards_pos
+
+
+def iter_json_array(path):
+    """Streamt die Elemente eines JSON-Arrays aus einer (auch sehr großen) Datei."""
+    with MappedJson(path) as data:
+        for item, _ in data.iter_array():
+            yield item
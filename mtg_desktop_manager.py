@@ -5,21 +5,34 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from PyQt6.QtGui import QImage, QPixmap
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from ui_startscreen import StartScreen
 from ui_search import MTGDesktopManager
 from ui_collection import CollectionViewer
+from collection_store import get_store, close_store
+import http_client
+import single_flight
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
     QMessageBox, QTextEdit, QScrollArea, QDialog, QSizePolicy, QStackedWidget, QListWidget, QInputDialog, QComboBox, QCheckBox, QGroupBox, QFrame
     )
 
+# Schlüssel des gemeinsamen Preisupdate-Threads in CollectionOverview.threads
+PRICE_SCHEDULER_KEY = "__preisupdate__"
+
+# Wartezeit, in der fertige Preisupdates gesammelt werden, bevor das Diagramm einmal neu gezeichnet wird
+OVERVIEW_REDRAW_DELAY_MS = 500
+
 # HIER BEGINNT DIE KORREKTE MAINWINDOW-KLASSE
 class MainWindow(QWidget):
     def closeEvent(self, event):
         # Beim Schließen des Hauptfensters: Beende alle CollectionOverview-Threads sauber
         if hasattr(self, 'collection_view') and self.collection_view is not None:
             self.collection_view.closeEvent(event)
+        # Datenbank sauber schließen (letzter Checkpoint des Änderungslogs)
+        close_store()
+        print(f"[DEBUG] HTTP-Cache: {http_client.stats()}")
+        print(f"[DEBUG] Zusammengefasste Anfragen: {single_flight.stats()}")
         super().closeEvent(event)
     
 
@@ -63,22 +76,10 @@ class MainWindow(QWidget):
     from PyQt6.QtGui import QImage
 
     class CollectionOverview(QWidget):
-        @staticmethod
-        def safe_float(val):
-            if val is None:
-                return 0.0
-            if isinstance(val, (int, float)):
-                return float(val)
-            if isinstance(val, str):
-                val = val.replace(',', '.')
-                try:
-                    return float(val)
-                except Exception:
-                    return 0.0
-            return 0.0
         def closeEvent(self, event):
             # Beende alle laufenden Preisupdate-Threads und Timer sauber (mit Timeout)
             print(f"[DEBUG] closeEvent: Beende {len(self.threads)} Threads...")
+            self.abort_price_scheduler()
             # Beende und entferne ALLE Threads, auch wenn kein update_finished mehr kommt
             for name, thread in list(self.threads.items()):
                 print(f"[DEBUG] closeEvent: Thread für '{name}' wird FINAL beendet...")
@@ -96,6 +97,7 @@ class MainWindow(QWidget):
                 timer.stop()
             self.status_timers.clear()
             self.status_start_times.clear()
+            self._overview_redraw_timer.stop()
             print(f"[DEBUG] closeEvent: Alle Threads/Ticker gestoppt.")
             super().closeEvent(event)
         def __init__(self, return_to_menu):
@@ -104,11 +106,18 @@ class MainWindow(QWidget):
             self.setStyleSheet("background-color: #1e1e1e; color: white;")
 
             # --- Wichtige Attribute initialisieren, bevor load_collections() aufgerufen werden kann ---
-            self.threads = {}        # sammlungsname -> QThread
+            self.threads = {}        # sammlungsname -> QThread (Preisupdate: PRICE_SCHEDULER_KEY)
+            self.price_scheduler = None
+            self.retired_schedulers = set()  # abgebrochene Scheduler, bis ihr all_finished kommt
             self.status_timers = {}  # sammlungsname -> QTimer
             self.status_start_times = {}  # sammlungsname -> float (startzeit)
             self.update_status = {}  # sammlungsname -> 'pending'|'done'|'error'
             self.status_labels = {}  # sammlungsname -> QLabel
+            # Werden mehrere Sammlungen kurz nacheinander fertig, wird das Diagramm nur einmal neu gezeichnet
+            self._overview_redraw_timer = QTimer(self)
+            self._overview_redraw_timer.setSingleShot(True)
+            self._overview_redraw_timer.setInterval(OVERVIEW_REDRAW_DELAY_MS)
+            self._overview_redraw_timer.timeout.connect(self.redraw_overview)
 
             # --- Kreisdiagramm für alle Sammlungen ---
             diagram_label = QLabel()
@@ -171,14 +180,13 @@ class MainWindow(QWidget):
             """Manuelles Update aller Preise: setzt alle last_price_update auf 0 und startet load_collections neu."""
             if hasattr(self, 'updating_collections') and self.updating_collections:
                 return
+            # Laufendes Update anhalten, sonst schreibt es nach dem Reset weiter
+            self.abort_price_scheduler()
+            for thread in self.threads.values():
+                thread.quit()
+                thread.wait(5000)
             # Setze alle last_price_update auf 0 (force update)
-            if os.path.exists("collections.json"):
-                with open("collections.json", "r", encoding="utf-8") as f:
-                    collections = json.load(f)
-                for col in collections:
-                    col['last_price_update'] = 0
-                with open("collections.json", "w", encoding="utf-8") as f:
-                    json.dump(collections, f, indent=2, ensure_ascii=False)
+            get_store().reset_price_updates()
             # --- ALLE laufenden Threads und Timer beenden, bevor Status zurückgesetzt wird ---
             for name, thread in list(self.threads.items()):
                 try:
@@ -209,14 +217,11 @@ class MainWindow(QWidget):
             self.load_collections()
 
         def update_overview_diagram(self, collections):
-            # Summiere alle Karten aller Sammlungen
-            all_cards = []
-            for col in collections:
-                all_cards.extend([c for c in col.get('cards', []) if isinstance(c, dict)])
-            marktwert = sum(self.safe_float(c.get('eur')) for c in all_cards)
-            einkauf = sum(self.safe_float(c.get('purchase_price')) for c in all_cards)
+            # Summiere die gespeicherten Summen aller Sammlungen (Manifest, keine Karten)
+            marktwert = sum(col.get('market_value', 0) for col in collections)
+            einkauf = sum(col.get('purchase_value', 0) for col in collections)
             diff = marktwert - einkauf
-            num_cards = len(all_cards)
+            num_cards = sum(col.get('card_count', 0) for col in collections)
             percent = (diff / einkauf * 100) if einkauf > 0 else 0
 
             # Farben
@@ -228,8 +233,7 @@ class MainWindow(QWidget):
             values = []
             colors = []
             for col in collections:
-                col_cards = [c for c in col.get('cards', []) if isinstance(c, dict)]
-                col_value = sum(self.safe_float(c.get('eur')) for c in col_cards)
+                col_value = col.get('market_value', 0)
                 if col_value > 0:
                     values.append(col_value)
                     colors.append(col.get('color', '#888888'))
@@ -287,10 +291,12 @@ class MainWindow(QWidget):
             if self.update_status.get(collection_name) == 'pending':
                 QMessageBox.information(self, "Preisupdate läuft", f"Das Preisupdate für '{collection_name}' läuft noch. Bitte warte, bis es abgeschlossen ist.")
                 return
-            if not os.path.exists("collections.json"):
+            col = get_store().get_collection(collection_name)
+            if col is None:
                 QMessageBox.warning(self, "Fehler", "Sammlung nicht gefunden.")
                 return
             # --- Stoppe alle laufenden Preisupdate-Threads und Timer, bevor die Einzelansicht geladen wird ---
+            self.abort_price_scheduler()
             for thread in self.threads.values():
                 thread.quit()
                 thread.wait(3000)
@@ -299,26 +305,20 @@ class MainWindow(QWidget):
                 timer.stop()
             self.status_timers.clear()
             self.status_start_times.clear()
-            with open("collections.json", "r", encoding="utf-8") as f:
-                collections = json.load(f)
-                for col in collections:
-                    if col["name"] == collection_name:
-                        stack = self.parent()
-                        viewer = CollectionViewer(col, self.return_to_menu, stack_widget=stack)
-                        stack.addWidget(viewer)
-                        stack.setCurrentWidget(viewer)
-                        return
+            stack = self.parent()
+            viewer = CollectionViewer(col, self.return_to_menu, stack_widget=stack)
+            stack.addWidget(viewer)
+            stack.setCurrentWidget(viewer)
 
         def delete_collection(self):
             selected = self.list_widget.currentRow()
             if selected < 0:
                 QMessageBox.warning(self, "Fehler", "Keine Sammlung ausgewählt.")
                 return
-            if not os.path.exists("collections.json"):
+            names = get_store().collection_names()
+            if selected >= len(names):
                 return
-            with open("collections.json", "r", encoding="utf-8") as f:
-                collections = json.load(f)
-            name = collections[selected]["name"]
+            name = names[selected]
             reply = QMessageBox.question(
                 self,
                 "Bestätigung",
@@ -326,9 +326,9 @@ class MainWindow(QWidget):
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
             )
             if reply == QMessageBox.StandardButton.Yes:
-                del collections[selected]
-                with open("collections.json", "w", encoding="utf-8") as f:
-                    json.dump(collections, f, indent=2, ensure_ascii=False)
+                # Erst das Preisupdate anhalten, es arbeitet sonst noch mit der gelöschten Sammlung
+                self.abort_price_scheduler()
+                get_store().delete_collection(name)
                 self.load_collections()
                 QMessageBox.information(self, "Gelöscht", f"Die Sammlung '{name}' wurde gelöscht.")
 
@@ -337,13 +337,15 @@ class MainWindow(QWidget):
             # Button während Update deaktivieren
             if hasattr(self, 'update_all_button'):
                 self.update_all_button.setEnabled(False)
+            # Das Diagramm wird hier ohnehin neu gezeichnet
+            self._overview_redraw_timer.stop()
             from PyQt6.QtWidgets import QListWidgetItem, QWidget, QHBoxLayout, QLabel, QSizePolicy
             from PyQt6.QtGui import QPixmap, QPainter, QColor, QIcon
             from PyQt6.QtCore import QThread, QTimer
-            from price_updater import PriceUpdaterWorker
             import time
             UPDATE_INTERVAL = 3600  # 1 Stunde (in Sekunden)
             # --- ALLE laufenden Threads und Timer beenden, bevor Status zurückgesetzt wird ---
+            self.abort_price_scheduler()
             for name, thread in list(self.threads.items()):
                 try:
                     thread.quit()
@@ -366,13 +368,12 @@ class MainWindow(QWidget):
                 return
             self.updating_collections = True
             self.list_widget.clear()
-            collections = []
-            if os.path.exists("collections.json"):
-                with open("collections.json", "r", encoding="utf-8") as f:
-                    collections = json.load(f)
+            # Für die Übersicht reicht das Manifest, Karteneinträge werden nicht geladen
+            collections = get_store().list_manifest()
             self.update_overview_diagram(collections)
             now = time.time()
             def start_workers():
+                stale = []
                 for col in collections:
                     # Prüfe, ob das letzte Update zu lange her ist
                     last_update = col.get('last_price_update', 0)
@@ -386,8 +387,8 @@ class MainWindow(QWidget):
                     painter.setPen(QColor(color))
                     painter.drawEllipse(4, 4, 20, 20)
                     painter.end()
-                    marktwert = sum(self.safe_float(c.get('eur')) * int(c.get('count', 1) or 1) for c in col['cards'])
-                    einkauf = sum(self.safe_float(c.get('purchase_price')) * int(c.get('count', 1) or 1) for c in col['cards'])
+                    marktwert = col['market_value']
+                    einkauf = col['purchase_value']
                     diff = marktwert - einkauf
                     row_widget = QWidget()
                     row_layout = QHBoxLayout()
@@ -400,15 +401,9 @@ class MainWindow(QWidget):
                     name_label.setStyleSheet("font-size: 18px; font-weight: bold;")
                     row_layout.addWidget(name_label)
                     # Zeige die Gesamtanzahl aller Karten (inkl. Stückzahl)
-                    total_count = 0
-                    for card in col['cards']:
-                        cnt = card.get('count', 1)
-                        try:
-                            cnt = int(cnt)
-                        except Exception:
-                            cnt = 1
-                        total_count += cnt
+                    total_count = col['card_count']
                     count_label = QLabel(f"| {total_count} Karten |")
+                    count_label.setToolTip(f"{col['unique_prints']} verschiedene Drucke")
                     count_label.setStyleSheet("font-size: 16px; margin-left: 8px;")
                     row_layout.addWidget(count_label)
                     marktwert_label = QLabel(f"Marktwert: {marktwert:.2f} €")
@@ -435,7 +430,7 @@ class MainWindow(QWidget):
                     status_label.setText('⟳ 0s')
                     row_layout.addWidget(status_label)
                     self.status_labels[col['name']] = status_label
-                    if len(col['cards']) == 0:
+                    if col['entry_count'] == 0:
                         status_label.setText('✅')
                         status_label.setStyleSheet("font-size: 20px; margin-left: 12px; color: #4caf50;")
                         self.update_status[col['name']] = 'done'
@@ -459,29 +454,19 @@ class MainWindow(QWidget):
                                 label.setText(f'⟳ {sek}s')
                         timer.timeout.connect(update_label)
                         self.status_timers[col['name']] = timer
-                        # --- Preisupdate-Worker nur starten, wenn nötig ---
-                        if needs_update and col['name'] not in self.threads:
-                            print(f"[DEBUG] Starte Preisupdate-Worker für Sammlung '{col['name']}' um {time.strftime('%H:%M:%S')}")
+                        # --- Preisupdate nur vormerken, wenn nötig; alle Sammlungen teilen sich einen Durchlauf ---
+                        if needs_update and PRICE_SCHEDULER_KEY not in self.threads:
                             self.status_start_times[col['name']] = time.time()
                             self.status_timers[col['name']].start()
-                            thread = QThread()
-                            worker = PriceUpdaterWorker(col, col['name'])
-                            worker.moveToThread(thread)
-                            worker.update_status.connect(self.on_update_status)
-                            worker.update_finished.connect(self.on_update_finished)
-                            def handle_worker_error(sammlungsname, status):
-                                print(f"[DEBUG] Fehler im Preisupdate-Worker für '{sammlungsname}' um {time.strftime('%H:%M:%S')}: Status={status}")
-                                self.on_update_status(sammlungsname, 'error')
-                            worker.update_status.connect(lambda name, status: handle_worker_error(name, status) if status == 'error' else None)
-                            thread.started.connect(worker.run)
-                            thread.start()
-                            self.threads[col['name']] = thread
+                            stale.append(col['name'])
                     row_layout.addStretch(1)
                     row_widget.setLayout(row_layout)
                     item = QListWidgetItem()
                     item.setSizeHint(row_widget.sizeHint())
                     self.list_widget.addItem(item)
                     self.list_widget.setItemWidget(item, row_widget)
+                if stale:
+                    self.start_price_scheduler(stale)
                 self.updating_collections = False
                 # Button wieder aktivieren, wenn keine Updates mehr laufen
                 if hasattr(self, 'update_all_button'):
@@ -489,6 +474,58 @@ class MainWindow(QWidget):
             # Starte Worker erst nach kurzem Delay, damit alle alten Threads wirklich beendet sind
             QTimer.singleShot(150, start_workers)
 
+        def start_price_scheduler(self, names):
+            # Ein Worker-Thread für alle veralteten Sammlungen; jede Karte wird nur einmal abgefragt
+            from PyQt6.QtCore import QThread
+            from price_updater import PriceRefreshScheduler
+            import time
+            print(f"[DEBUG] Starte Preisupdate für {len(names)} Sammlungen um {time.strftime('%H:%M:%S')}: {names}")
+            thread = QThread()
+            # Der Scheduler liest die offenen IDs selbst aus dem Store und speichert nach jedem Batch
+            scheduler = PriceRefreshScheduler(names)
+            scheduler.moveToThread(thread)
+            # Meldungen nur annehmen, solange dieser Durchlauf der aktuelle ist
+            scheduler.update_status.connect(self.for_current_run(scheduler, self.on_update_status))
+            scheduler.update_finished.connect(self.for_current_run(scheduler, self.on_update_finished))
+            scheduler.all_finished.connect(lambda scheduler=scheduler: self.on_price_scheduler_finished(scheduler))
+            thread.started.connect(scheduler.run)
+            # Referenz halten, sonst räumt Python den Scheduler ab, während der Thread läuft
+            self.price_scheduler = scheduler
+            thread.start()
+            self.threads[PRICE_SCHEDULER_KEY] = thread
+
+        def for_current_run(self, scheduler, handler):
+            # Späte Meldungen eines abgebrochenen Durchlaufs (z. B. 'error' für offene Sammlungen)
+            # dürfen die Zeilen eines danach gestarteten Durchlaufs nicht überschreiben
+            def forward(*args):
+                if scheduler is self.price_scheduler:
+                    handler(*args)
+            return forward
+
+        def abort_price_scheduler(self):
+            # Laufendes Preisupdate anhalten; Geholtes ist gespeichert, der Rest bleibt in der Warteschlange
+            scheduler = self.price_scheduler
+            if scheduler is None:
+                return
+            scheduler.abort()
+            # Ab hier ist der Durchlauf nicht mehr der aktuelle; Referenz halten, bis er fertig ist
+            self.retired_schedulers.add(scheduler)
+            self.price_scheduler = None
+
+        def on_price_scheduler_finished(self, scheduler):
+            # Abgebrochener Durchlauf: Thread und Status gehören schon dem Aufrufer bzw. dem neuen Lauf
+            if scheduler in self.retired_schedulers:
+                self.retired_schedulers.discard(scheduler)
+                return
+            if scheduler is not self.price_scheduler:
+                return
+            thread = self.threads.pop(PRICE_SCHEDULER_KEY, None)
+            if thread:
+                thread.quit()
+                thread.wait(5000)
+                print(f"[DEBUG] Preisupdate-Thread gestoppt: {not thread.isRunning()}")
+            self.price_scheduler = None
+
         def on_update_status(self, sammlungsname, status):
             import time
             print(f"[DEBUG] on_update_status: {sammlungsname} -> {status}")
@@ -518,42 +555,18 @@ class MainWindow(QWidget):
 
         def on_update_finished(self, sammlungsname, cards):
             import time
-            print(f"[DEBUG] on_update_finished für '{sammlungsname}' um {time.strftime('%H:%M:%S')} (Threads: {list(self.threads.keys())})")
-            # --- Update last_price_update Zeitstempel ---
-            now = time.time()
-            if os.path.exists("collections.json"):
-                with open("collections.json", "r", encoding="utf-8") as f:
-                    collections = json.load(f)
-                for col in collections:
-                    if col['name'] == sammlungsname:
-                        col['cards'] = cards
-                        col['last_price_update'] = now
-                        break
-                with open("collections.json", "w", encoding="utf-8") as f:
-                    json.dump(collections, f, indent=2, ensure_ascii=False)
-            thread = self.threads.get(sammlungsname)
-            if thread:
-                print(f"[DEBUG] on_update_finished: Thread für '{sammlungsname}' wird beendet...")
-                thread.quit()
-                thread.wait(5000)
-                print(f"[DEBUG] on_update_finished: Thread für '{sammlungsname}' gestoppt: {not thread.isRunning()}")
-                del self.threads[sammlungsname]
-            else:
-                print(f"[DEBUG] on_update_finished: Kein Thread für '{sammlungsname}' gefunden!")
-            print(f"[DEBUG] on_update_finished: Noch laufende Threads: {list(self.threads.keys())}")
-            with open("collections.json", "r", encoding="utf-8") as f:
-                collections = json.load(f)
-            self.update_overview_diagram(collections)
+            print(f"[DEBUG] on_update_finished für '{sammlungsname}' um {time.strftime('%H:%M:%S')}")
+            # --- Gespeichert hat der Scheduler schon (pro Batch); nur das Neuzeichnen wird gebündelt ---
+            self._overview_redraw_timer.start()
             # Status-Label auf 'done' setzen (wird ohnehin von on_update_status gemacht)
             # (Optional: Hier könnte man gezielt die Zeile für die Sammlung aktualisieren)
 
+        def redraw_overview(self):
+            self.update_overview_diagram(get_store().list_manifest())
+
         def create_collection(self):
             from PyQt6.QtWidgets import QColorDialog
             from PyQt6.QtGui import QColor
-            collections = []
-            if os.path.exists("collections.json"):
-                with open("collections.json", "r", encoding="utf-8") as f:
-                    collections = json.load(f)
             name, ok = QInputDialog.getText(self, "Sammlung benennen", "Name der neuen Sammlung:")
             if not (ok and name):
                 return
@@ -562,9 +575,10 @@ class MainWindow(QWidget):
             if not color.isValid():
                 color = QColor("#888888")
             color_hex = color.name()
-            collections.append({"name": name, "cards": [], "color": color_hex})
-            with open("collections.json", "w", encoding="utf-8") as f:
-                json.dump(collections, f, indent=2, ensure_ascii=False)
+            if name in get_store().collection_names():
+                QMessageBox.warning(self, "Fehler", f"Eine Sammlung mit dem Namen '{name}' existiert bereits.")
+                return
+            get_store().create_collection(name, color_hex)
             self.load_collections()
 import sys
 from PyQt6.QtWidgets import QApplication
@@ -0,0 +1,216 @@
+# name_index.py
+# Lokaler Fuzzy-Index über alle bekannten Kartennamen
+#
+# Ersetzt /cards/named?fuzzy: Die Namen kommen aus der lokalen Kartendatenbank
+# (englische und gedruckte, z. B. deutsche Namen) und aus den eigenen Sammlungen.
+# Jeder Name wird normalisiert (Kleinbuchstaben, ohne Akzente/Satzzeichen) und
+# in Trigramme zerlegt; ein invertierter Index Trigramm -> Namens-IDs liefert die
+# Kandidaten, bewertet wird mit dem Dice-Koeffizienten der Trigramm-Mengen.
+import re
+import heapq
+import bisect
+import threading
+import unicodedata
+from collections import Counter
+from itertools import chain
+from operator import itemgetter
+from card_db import get_card_db
+from collection_store import get_store
+
+# Kandidaten, die nach dem Trigramm-Zählen genauer bewertet werden
+CANDIDATE_POOL = 200
+# Trigramme in mehr als diesem Anteil aller Namen (mindestens COMMON_GRAM_MIN)
+# gelten als häufig und werden bei der Kandidatensuche übersprungen
+COMMON_GRAM_SHARE = 0.02
+COMMON_GRAM_MIN = 500
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_name(name):
+    """Kleinbuchstaben, ohne Akzente und Satzzeichen ("Æther Vial" -> "aether vial")."""
+    if not name.isascii():
+        name = name.replace("Æ", "Ae").replace("æ", "ae").replace("ß", "ss")
+        name = unicodedata.normalize("NFKD", name)
+        name = "".join(ch for ch in name if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(" ", name.lower()).strip()
+
+
+def trigrams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Trigramm-Index. entries: Iterable von (angezeigter Name, Kartenname, Sprache oder None)."""
+
+    def __init__(self, entries):
+        self._entries = []
+        self._exact = {}
+        self._postings = {}
+        self._prefix_keys = None
+        self._prefix_ids = None
+        seen = set()
+        for display, card_name, lang in entries:
+            if not display or (display, lang) in seen:
+                continue
+            seen.add((display, lang))
+            normalized = normalize_name(display)
+            if not normalized:
+                continue
+            entry_id = len(self._entries)
+            grams = trigrams(normalized)
+            self._entries.append((display, card_name, lang, normalized, len(grams)))
+            self._exact.setdefault(normalized, entry_id)
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(entry_id)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def search(self, query, limit=10):
+        """Beste Treffer als Liste von (Score 0..1, angezeigter Name, Kartenname, Sprache)."""
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+        query_grams = trigrams(normalized)
+        # Kandidaten nur über seltene Trigramme sammeln; sehr häufige ("  s", "of ") blähen
+        # die Zählung auf, ohne Namen zu unterscheiden. Gezählt wird danach exakt.
+        postings = [self._postings[gram] for gram in query_grams if gram in self._postings]
+        if not postings:
+            return []
+        common_limit = max(COMMON_GRAM_MIN, int(len(self._entries) * COMMON_GRAM_SHARE))
+        rare = [ids for ids in postings if len(ids) <= common_limit] or [min(postings, key=len)]
+        counts = Counter(chain.from_iterable(rare))
+        # Nur Namen, die mindestens halb so viele Trigramme teilen wie der beste Kandidat
+        floor = max(counts.values()) // 2
+        candidates = [item for item in counts.items() if item[1] >= floor]
+        if len(candidates) > CANDIDATE_POOL:
+            candidates = heapq.nlargest(CANDIDATE_POOL, candidates, key=itemgetter(1))
+        results = []
+        for entry_id, _ in candidates:
+            display, card_name, lang, candidate, gram_count = self._entries[entry_id]
+            shared = len(query_grams & trigrams(candidate))
+            score = 2.0 * shared / (len(query_grams) + gram_count)
+            if candidate == normalized:
+                score = 1.0
+            elif candidate.startswith(normalized):
+                # Anfang des Namens getippt: vor ähnlich klingende Namen sortieren
+                score = max(score, 0.6 + 0.3 * len(normalized) / len(candidate))
+            results.append((score, display, card_name, lang))
+        results.sort(key=lambda result: (-result[0], len(result[1])))
+        return results[:limit]
+
+    def _build_prefix_array(self):
+        # Schlüssel: normalisierter Name ab jedem Wortanfang, z. B. "lightning bolt" und "bolt"
+        pairs = []
+        for entry_id, entry in enumerate(self._entries):
+            normalized = entry[3]
+            start = 0
+            while start >= 0:
+                pairs.append((normalized[start:], entry_id))
+                start = normalized.find(" ", start)
+                if start >= 0:
+                    start += 1
+        pairs.sort()
+        self._prefix_keys = [key for key, _ in pairs]
+        self._prefix_ids = [entry_id for _, entry_id in pairs]
+
+    def complete(self, prefix, limit=10, lang=None):
+        """Angezeigte Namen, die mit prefix beginnen (oder ein Wort darin).
+
+        Treffer am Namensanfang kommen vor Treffern mitten im Namen, Namen in der
+        Sprache lang vor anderen, kürzere vor längeren."""
+        normalized = normalize_name(prefix)
+        if not normalized:
+            return []
+        if self._prefix_keys is None:
+            with _index_lock:
+                if self._prefix_keys is None:
+                    self._build_prefix_array()
+        keys = self._prefix_keys
+        # Alle Schlüssel mit diesem Präfix liegen im sortierten Array direkt hintereinander
+        start = bisect.bisect_left(keys, normalized)
+        end = bisect.bisect_left(keys, normalized + "\uffff", start)
+        ranked = {}
+        for pos in range(start, end):
+            entry_id = self._prefix_ids[pos]
+            display, _, entry_lang, candidate, _ = self._entries[entry_id]
+            rank = (not candidate.startswith(normalized), entry_lang != lang, len(display), display)
+            if entry_id not in ranked or rank < ranked[entry_id]:
+                ranked[entry_id] = rank
+        names = []
+        for rank in heapq.nsmallest(limit * 2, ranked.values()):
+            if rank[3] not in names:
+                names.append(rank[3])
+        return names[:limit]
+
+    def exact(self, query):
+        entry_id = self._exact.get(normalize_name(query))
+        if entry_id is None:
+            return None
+        display, card_name, lang, _, _ = self._entries[entry_id]
+        return display, card_name, lang
+
+
+_index = None
+_index_key = None
+_index_lock = threading.Lock()
+_rebuild_lock = threading.Lock()
+_rebuilding = False
+
+
+def _index_entries():
+    yield from get_card_db().name_entries()
+    yield from get_store().card_name_entries()
+
+
+def _current_key():
+    return get_card_db().imported_at(), get_store().print_count()
+
+
+def get_name_index():
+    """Gemeinsamer Index; wird neu gebaut, wenn sich Kartendatenbank oder gespeicherte Karten ändern.
+
+    Wartet auf den Bau, also nur außerhalb des GUI-Threads aufrufen (dort peek_name_index)."""
+    global _index, _index_key
+    key = _current_key()
+    with _index_lock:
+        if _index is None or key != _index_key:
+            index = NameIndex(_index_entries())
+            # Präfix-Array gleich mitbauen, sonst baut es der erste Tastendruck
+            index._build_prefix_array()
+            _index = index
+            _index_key = key
+        return _index
+
+
+def peek_name_index():
+    """Der zuletzt fertige Index ohne Warten (None, solange noch keiner gebaut ist).
+
+    Ist er veraltet (neue Karten, neuer Spiegel), wird im Hintergrund neu gebaut und
+    bis dahin der alte geliefert; neue Namen tauchen also kurz verzögert auf."""
+    if _rebuilding:
+        # Der Bau hält die Store-Sperre; den Schlüssel jetzt zu prüfen hieße darauf warten
+        return _index
+    if _index is None or _current_key() != _index_key:
+        warm_name_index()
+    return _index
+
+
+def warm_name_index():
+    """Baut Index und Präfix-Array im Hintergrund, damit der erste Tastendruck nicht wartet."""
+    global _rebuilding
+    with _rebuild_lock:
+        if _rebuilding:
+            return
+        _rebuilding = True
+
+    def build():
+        global _rebuilding
+        try:
+            get_name_index()
+        finally:
+            with _rebuild_lock:
+                _rebuilding = False
+    threading.Thread(target=build, name="name-index", daemon=True).start()
@@ -0,0 +1,234 @@
+# oracle_index.py
+# Index oracle_id -> Drucke und verfügbare Sprachen
+#
+# Beantwortet "gibt es die Karte auf Deutsch?", den DE/EN-Wechsel und die
+# Variantenliste ohne /cards/search. Quellen:
+#   - lokale Kartendatenbank: nur (oracle_id, ID, Sprache), die Kartenobjekte
+#     werden erst für die angefragten Drucke dekodiert
+#   - eigene Sammlungen
+#   - Antworten von Scryfall: jede vollständige Antwort auf "oracleid:X lang:Y"
+#     wird als bekannte Liste für (X, Y) gemerkt, auch leere Antworten ("keine
+#     deutsche Ausgabe"). Gespeichert wird je Antwort eine Zeile in
+#     oracle_prints.db (SQLite im WAL-Modus), gelesen nur für die
+#     angefragte oracle_id.
+# Die Maps aus Kartendatenbank und Sammlungen werden im Hintergrund gebaut;
+# Abfragen (auch aus dem GUI-Thread) warten nie darauf.
+import time
+import sqlite3
+import threading
+import serializer
+from card_db import get_card_db
+from collection_store import get_store
+from card_projection import project_card
+from query_engine import ENTRY_FIELDS
+
+ORACLE_INDEX_FILE = "oracle_prints.db"
+
+
+class OracleIndex:
+    """Drucke und Sprachen je oracle_id aus Kartendatenbank, Sammlungen und gemerkten Scryfall-Antworten."""
+
+    def __init__(self, path=ORACLE_INDEX_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        # Quelle -> (fertige Map, Schlüssel beim Bau); gelesen wird nur die fertige Map
+        self._snapshots = {"mirror": ({}, None), "owned": ({}, None)}
+        self._refreshing = set()
+        self._conn = None
+        self._learned = {}  # oracle_id -> {sprache: drucke}, gelesene Zeilen aus der Datenbank
+
+    # --- Quellen ---
+    # Spiegel und eigene Sammlungen werden im Hintergrund zu Maps oracle_id -> Drucke
+    # gebaut (ein Durchlauf über alle Zeilen bzw. Sammlungen). Abfragen aus dem
+    # GUI-Thread sehen immer die zuletzt fertige Map; ist sie veraltet, wird neu
+    # gebaut und bis dahin die alte geliefert.
+    def _source(self, name, key_fn, build):
+        data, built_key = self._snapshots[name]
+        if name in self._refreshing:
+            # Der Bau hält u. U. die Sperre der Quelle; den Schlüssel jetzt zu prüfen hieße warten
+            return data
+        key = key_fn()
+        if key != built_key:
+            self._refresh_in_background(name, key, build)
+        return data
+
+    def _refresh_in_background(self, name, key, build):
+        with self._lock:
+            if name in self._refreshing:
+                return
+            self._refreshing.add(name)
+
+        def run():
+            data = self._snapshots[name][0]
+            try:
+                data = build()
+            except Exception as e:
+                print(f"[ERROR] Oracle-Index ({name}) konnte nicht gebaut werden: {e}")
+            finally:
+                # Auch nach einem Fehler erst bei der nächsten Änderung erneut versuchen
+                self._snapshots[name] = (data, key)
+                with self._lock:
+                    self._refreshing.discard(name)
+        threading.Thread(target=run, name=f"oracle-index-{name}", daemon=True).start()
+
+    def warm(self):
+        """Beide Maps im Hintergrund bauen, damit die erste angezeigte Karte sie schon hat."""
+        self._mirror_prints()
+        self._owned_prints()
+
+    def _mirror_prints(self):
+        card_db = get_card_db()
+
+        def build():
+            mirror = {}
+            for oracle_id, card_id, lang in card_db.oracle_rows():
+                mirror.setdefault(oracle_id, []).append((card_id, lang))
+            return mirror
+        return self._source("mirror", card_db.imported_at, build)
+
+    def _owned_prints(self):
+        store = get_store()
+
+        def build():
+            owned = {}
+            for collection in store.load_collections():
+                for card in collection["cards"]:
+                    if card.get("oracle_id") and card.get("id"):
+                        prints = owned.setdefault(card["oracle_id"], {})
+                        prints.setdefault(card["id"], {k: v for k, v in card.items() if k not in ENTRY_FIELDS})
+            return {oracle_id: list(prints.values()) for oracle_id, prints in owned.items()}
+        return self._source("owned", store.data_version, build)
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS learned ("
+                " oracle_id TEXT NOT NULL,"
+                " lang TEXT NOT NULL,"
+                " cards BLOB NOT NULL,"
+                " recorded_at REAL NOT NULL,"
+                " PRIMARY KEY (oracle_id, lang))"
+            )
+        return self._conn
+
+    def _learned_prints(self, oracle_id):
+        # {sprache: drucke} der gemerkten Antworten zu oracle_id
+        learned = self._learned.get(oracle_id)
+        if learned is None:
+            learned = {}
+            try:
+                for lang, cards in self._db().execute(
+                    "SELECT lang, cards FROM learned WHERE oracle_id = ?", (oracle_id,)
+                ):
+                    learned[lang] = serializer.loads(cards)
+            except (sqlite3.Error, ValueError) as e:
+                print(f"[ERROR] {self.path} nicht lesbar: {e}")
+            self._learned[oracle_id] = learned
+        return learned
+
+    # --- Abfragen ---
+    def languages(self, oracle_id):
+        """Alle Sprachen, in denen Drucke bekannt sind."""
+        with self._lock:
+            langs = {lang for _, lang in self._mirror_prints().get(oracle_id, ())}
+            langs.update(card.get("lang") for card in self._owned_prints().get(oracle_id, ()))
+            langs.update(lang for lang, cards in self._learned_prints(oracle_id).items() if cards)
+            langs.discard(None)
+            return langs
+
+    def is_complete(self, oracle_id, lang):
+        """True, wenn alle Drucke von (oracle_id, lang) lokal bekannt sind: aus dem Spiegel
+        oder einer gemerkten vollständigen Scryfall-Antwort. Eigene Sammlungen zählen nicht."""
+        if not oracle_id or not lang:
+            return False
+        with self._lock:
+            if lang in self._learned_prints(oracle_id):
+                return True
+            if oracle_id in self._mirror_prints():
+                # Ohne all_cards enthält der Spiegel verlässlich nur die englischen Drucke
+                return lang == "en" or get_card_db().is_multilingual()
+        return False
+
+    def has_language(self, oracle_id, lang):
+        """True/False, wenn lokal bekannt; None, wenn nur Scryfall es sicher weiß.
+
+        Eigene Drucke können nur ein "ja" bestätigen, ein "nein" braucht eine vollständige Quelle."""
+        if not oracle_id:
+            return None
+        if lang in self.languages(oracle_id):
+            return True
+        if self.is_complete(oracle_id, lang):
+            return False
+        return None
+
+    def prints(self, oracle_id, lang=None):
+        """Bekannte Drucke (neueste zuerst), optional nur in einer Sprache.
+
+        Kann unvollständig sein (nur eigene Drucke); für eine vollständige Liste complete_prints()."""
+        if not oracle_id:
+            return []
+        with self._lock:
+            mirror_ids = [card_id for card_id, card_lang in self._mirror_prints().get(oracle_id, ())
+                          if lang is None or card_lang == lang]
+            learned = self._learned_prints(oracle_id)
+            others = list(self._owned_prints().get(oracle_id, ()))
+            for learned_lang, cards in learned.items():
+                if lang is None or learned_lang == lang:
+                    others.extend(cards)
+        cards = get_card_db().get_many(mirror_ids) if mirror_ids else []
+        seen = {card.get("id") for card in cards}
+        for card in others:
+            if card.get("id") not in seen and (lang is None or card.get("lang") == lang):
+                seen.add(card.get("id"))
+                cards.append(card)
+        cards.sort(key=lambda card: card.get("released_at") or "", reverse=True)
+        return cards
+
+    def complete_prints(self, oracle_id, lang):
+        """Alle Drucke in einer Sprache, oder None, wenn die lokale Liste unvollständig sein kann."""
+        if not self.is_complete(oracle_id, lang):
+            return None
+        return self.prints(oracle_id, lang)
+
+    # --- Scryfall-Antworten merken ---
+    def record(self, oracle_id, lang, cards):
+        """Merkt die vollständige Antwort auf "oracleid:X lang:Y" (auch eine leere)."""
+        if not oracle_id or not lang:
+            return
+        with self._lock:
+            prints = [
+                project_card(card) for card in cards if isinstance(card, dict) and card.get("lang", lang) == lang
+            ]
+            self._learned_prints(oracle_id)[lang] = prints
+            try:
+                # Nur diese eine Antwort schreiben, nicht alle bisher gemerkten
+                self._db().execute(
+                    "INSERT OR REPLACE INTO learned (oracle_id, lang, cards, recorded_at) VALUES (?, ?, ?, ?)",
+                    (oracle_id, lang, serializer.dumps(prints, serializer.ENCODING_JSON_ZLIB), time.time()),
+                )
+            except sqlite3.Error as e:
+                print(f"[ERROR] {self.path} konnte nicht gespeichert werden: {e}")
+
+    def record_search_response(self, oracle_id, lang, data):
+        """Wie record(), aber direkt mit der JSON-Antwort von /cards/search (nur wenn vollständig)."""
+        if not isinstance(data, dict) or data.get("has_more"):
+            return
+        if data.get("object") == "error" and data.get("code") != "not_found":
+            return
+        self.record(oracle_id, lang, data.get("data") or [])
+
+
+_oracle_index = None
+_oracle_index_lock = threading.Lock()
+
+
+def get_oracle_index():
+    """Gemeinsame Instanz des Oracle-Index."""
+    global _oracle_index
+    with _oracle_index_lock:
+        if _oracle_index is None:
+            _oracle_index = OracleIndex()
+        return _oracle_index
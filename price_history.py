@@ -0,0 +1,337 @@
+# price_history.py
+# Preisverlauf pro Druck und Variante (spaltenorientiert, nur anhängen)
+#
+# Bei jedem Preisupdate wird der neue Preis jedes Eintrags festgehalten, statt
+# nur eur zu überschreiben. Gespeichert wird in price_history/ als drei
+# Spalten gleicher Länge (Zeile i gehört zusammen):
+#   ts.u32     Zeitstempel (Sekunden), aufsteigend
+#   sid.u32    Serie = Zeile in keys.txt ("scryfall_id|variante")
+#   cents.i32  Preis in Cent (0 = kein Preis)
+#   prev.i32   vorheriger Preis derselben Serie (0 beim ersten Punkt)
+# Unveränderte Preise werden nicht erneut geschrieben, eine Serie ist also
+# eine Treppenfunktion. Gelesen wird per numpy.memmap; Abfragen wie "Wert der
+# Sammlung X in den letzten 90 Tagen" sind eine kumulierte Summe über
+# (cents - prev) * Stückzahl, ganz ohne Sortieren.
+#
+# compact() dünnt alte Punkte aus: älter als RAW_RETENTION bleibt ein Punkt
+# pro Serie und Tag, älter als DAILY_RETENTION einer pro Woche (jeweils der
+# letzte). Die neuen Spalten werden erst als *.new geschrieben und dann
+# umbenannt; ein abgebrochener Umbau wird beim nächsten Öffnen abgeschlossen
+# oder verworfen.
+#
+#   python price_history.py value "Meine Sammlung" --days 90
+#   python price_history.py compact
+import os
+import sys
+import time
+import argparse
+import threading
+import numpy as np
+from utils import safe_float
+
+HISTORY_DIR = "price_history"
+KEYS_FILE = "keys.txt"
+COMPACT_MARKER = "compacting"
+COLUMNS = (("ts", np.uint32), ("sid", np.uint32), ("cents", np.int32), ("prev", np.int32))
+
+DAY = 24 * 3600
+WEEK = 7 * DAY
+RAW_RETENTION = 90 * DAY
+DAILY_RETENTION = 2 * 365 * DAY
+# Automatisch ausdünnen höchstens einmal pro Tag
+COMPACT_INTERVAL = DAY
+
+
+def to_cents(price):
+    return int(round(safe_float(price) * 100))
+
+
+def series_key(print_id, variant):
+    return f"{print_id}|{variant or 'nonfoil'}"
+
+
+class PriceHistory:
+    """Spaltenorientierter Preisverlauf; schreibt nur ans Ende, liest per memmap."""
+
+    def __init__(self, path=HISTORY_DIR):
+        self.path = path
+        self._lock = threading.RLock()
+        self._compacting = False
+        os.makedirs(path, exist_ok=True)
+        self._recover()
+        with open(self._file(KEYS_FILE), "a+", encoding="utf-8") as f:
+            f.seek(0)
+            self._keys = f.read().splitlines()
+        self._key_ids = {key: sid for sid, key in enumerate(self._keys)}
+        self._maps = None
+        self._last = self._last_values()
+        ts = self._columns()[0]
+        self._last_ts = int(ts[-1]) if len(ts) else 0
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _column_file(self, name):
+        return self._file(f"{name}.{np.dtype(dict(COLUMNS)[name]).str[1:]}")
+
+    # --- Dateien ---
+    def _recover(self):
+        # Abgebrochenes compact(): mit vollständigen *.new fertig umbenennen, sonst verwerfen
+        marker = self._file(COMPACT_MARKER)
+        new_files = [self._column_file(name) + ".new" for name, _ in COLUMNS]
+        if os.path.exists(marker):
+            for name, _ in COLUMNS:
+                new_file = self._column_file(name) + ".new"
+                if os.path.exists(new_file):
+                    os.replace(new_file, self._column_file(name))
+            os.remove(marker)
+        for new_file in new_files:
+            if os.path.exists(new_file):
+                os.remove(new_file)
+        # Nach einem Absturz beim Anhängen können die Spalten unterschiedlich lang sein
+        lengths = []
+        for name, dtype in COLUMNS:
+            column_file = self._column_file(name)
+            size = os.path.getsize(column_file) if os.path.exists(column_file) else 0
+            lengths.append(size // np.dtype(dtype).itemsize)
+        rows = min(lengths)
+        for name, dtype in COLUMNS:
+            with open(self._column_file(name), "ab") as f:
+                f.truncate(rows * np.dtype(dtype).itemsize)
+
+    def _columns(self):
+        """(ts, sid, cents, prev) als memmaps; neu eingeblendet, wenn angehängt wurde."""
+        with self._lock:
+            if self._maps is None:
+                maps = []
+                for name, dtype in COLUMNS:
+                    column_file = self._column_file(name)
+                    if os.path.getsize(column_file):
+                        maps.append(np.memmap(column_file, dtype=dtype, mode="r"))
+                    else:
+                        maps.append(np.empty(0, dtype=dtype))
+                self._maps = tuple(maps)
+            return self._maps
+
+    def _last_values(self):
+        # Letzter Preis je Serie, für das Weglassen unveränderter Werte
+        ts, sid, cents, _ = self._columns()
+        if not len(sid):
+            return {}
+        order = np.argsort(sid, kind="stable")
+        sid_sorted = sid[order]
+        last = np.append(sid_sorted[1:] != sid_sorted[:-1], True)
+        return dict(zip(sid_sorted[last].tolist(), cents[order][last].tolist()))
+
+    def _series_id(self, key, new_keys):
+        sid = self._key_ids.get(key)
+        if sid is None:
+            sid = self._key_ids[key] = len(self._keys)
+            self._keys.append(key)
+            new_keys.append(key)
+        return sid
+
+    # --- Schreiben ---
+    def record(self, prices, timestamp=None):
+        """prices: Iterable von (scryfall_id, variante, preis). Gibt die Anzahl neuer Punkte zurück."""
+        timestamp = int(timestamp or time.time())
+        with self._lock:
+            # Nur anhängen: ein älterer Zeitstempel zählt als "jetzt", damit ts sortiert bleibt
+            timestamp = max(timestamp, self._last_ts)
+            new_keys = []
+            rows = {}
+            for print_id, variant, price in prices:
+                if not print_id:
+                    continue
+                sid = self._series_id(series_key(print_id, variant), new_keys)
+                cents = to_cents(price)
+                if self._last.get(sid) != cents:
+                    rows[sid] = cents
+            if new_keys:
+                with open(self._file(KEYS_FILE), "a", encoding="utf-8") as f:
+                    f.write("".join(key + "\n" for key in new_keys))
+            if not rows:
+                return 0
+            values = {
+                "ts": np.full(len(rows), timestamp, dtype=np.uint32),
+                "sid": np.fromiter(rows.keys(), dtype=np.uint32, count=len(rows)),
+                "cents": np.fromiter(rows.values(), dtype=np.int32, count=len(rows)),
+                "prev": np.fromiter((self._last.get(sid, 0) for sid in rows), dtype=np.int32, count=len(rows)),
+            }
+            for name, _ in COLUMNS:
+                with open(self._column_file(name), "ab") as f:
+                    f.write(values[name].tobytes())
+            self._last.update(rows)
+            self._last_ts = timestamp
+            self._maps = None
+            return len(rows)
+
+    def record_cards(self, cards, timestamp=None):
+        """Preise von Sammlungseinträgen (id, variant, eur) festhalten."""
+        return self.record(((card.get("id"), card.get("variant"), card.get("eur")) for card in cards), timestamp)
+
+    # --- Lesen ---
+    def series(self, print_id, variant=None, start=None, end=None):
+        """[(zeitstempel, preis_eur)] einer Serie, optional auf [start, end] begrenzt."""
+        sid = self._key_ids.get(series_key(print_id, variant))
+        if sid is None:
+            return []
+        ts, sids, cents, _ = self._columns()
+        rows = np.flatnonzero(sids == sid)
+        points = zip(ts[rows].tolist(), (cents[rows] / 100).tolist())
+        return [(t, price) for t, price in points if (start is None or t >= start) and (end is None or t <= end)]
+
+    def value_over_time(self, holdings, start, end=None, step=DAY):
+        """Summierter Wert von Beständen über die Zeit.
+
+        holdings: {(scryfall_id, variante): stückzahl}. Ergebnis: [(zeitstempel, wert_eur)]
+        für start, start + step, ... bis end; zu jedem Zeitpunkt zählt der zuletzt bekannte Preis.
+        """
+        end = int(end or time.time())
+        samples = np.arange(int(start), end + 1, step, dtype=np.int64)
+        if not len(samples):
+            samples = np.array([end], dtype=np.int64)
+        weights = np.zeros(len(self._keys) + 1, dtype=np.int64)
+        for (print_id, variant), count in holdings.items():
+            sid = self._key_ids.get(series_key(print_id, variant))
+            if sid is not None:
+                weights[sid] += count
+        ts, sids, cents, prev = self._columns()
+        rows = np.flatnonzero(weights[sids])
+        if not len(rows):
+            return [(int(t), 0.0) for t in samples]
+        # Jeder Punkt ändert die Summe um (neuer - vorheriger Preis der Serie) * Stückzahl
+        delta = (cents[rows].astype(np.int64) - prev[rows]) * weights[sids[rows]]
+        totals = np.cumsum(delta)
+        positions = np.searchsorted(ts[rows], samples, side="right") - 1
+        values = np.where(positions >= 0, totals[np.maximum(positions, 0)], 0)
+        return list(zip(samples.tolist(), (values / 100).tolist()))
+
+    def point_count(self):
+        return len(self._columns()[0])
+
+    # --- Ausdünnen ---
+    def compact(self, now=None):
+        """Alte Punkte auf einen pro Tag bzw. Woche reduzieren; gibt die Anzahl entfernter Punkte zurück."""
+        now = int(now or time.time())
+        with self._lock:
+            ts, sid, cents, _ = (np.array(column) for column in self._columns())
+            if not len(ts):
+                return 0
+            age = now - ts.astype(np.int64)
+            bucket = np.where(age > DAILY_RETENTION, ts // WEEK * WEEK, np.where(age > RAW_RETENTION, ts // DAY * DAY, ts))
+            # ts ist aufsteigend, die stabile Sortierung nach Serie erhält die Zeitfolge
+            order = np.argsort(sid, kind="stable")
+            sid_o, bucket_o = sid[order], bucket[order]
+            # Letzter Punkt je (Serie, Zeitraum) ...
+            keep = np.ones(len(order), dtype=bool)
+            keep[:-1] = (sid_o[1:] != sid_o[:-1]) | (bucket_o[1:] != bucket_o[:-1])
+            order = order[keep]
+            sid_o, cents_o = sid[order], cents[order]
+            # ... und davon nur Preisänderungen; prev neu aus dem Vorgänger der Serie
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = sid_o[1:] != sid_o[:-1]
+            prev_o = np.zeros(len(order), dtype=np.int32)
+            prev_o[1:] = cents_o[:-1]
+            prev_o[first] = 0
+            changed = first | (cents_o != prev_o)
+            order, prev_o = order[changed], prev_o[changed]
+            # Nach dem Entfernen unveränderter Punkte stimmt prev weiterhin (gleicher Preis)
+            by_time = np.argsort(order, kind="stable")
+            order, prev = order[by_time], prev_o[by_time]
+            removed = len(ts) - len(order)
+            if not removed:
+                return 0
+            self._maps = None
+            columns = (ts[order], sid[order], cents[order], prev)
+            for (name, dtype), column in zip(COLUMNS, columns):
+                with open(self._column_file(name) + ".new", "wb") as f:
+                    f.write(column.astype(dtype).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            open(self._file(COMPACT_MARKER), "w").close()
+            for name, _ in COLUMNS:
+                os.replace(self._column_file(name) + ".new", self._column_file(name))
+            os.remove(self._file(COMPACT_MARKER))
+            self._last = self._last_values()
+            print(f"[DEBUG] Preisverlauf: {removed} alte Punkte ausgedünnt, {len(order)} verbleiben")
+            return removed
+
+    def compact_in_background(self):
+        # Höchstens einmal pro COMPACT_INTERVAL; der letzte Lauf steht als mtime von compacted_at
+        stamp = self._file("compacted_at")
+        try:
+            if time.time() - os.path.getmtime(stamp) < COMPACT_INTERVAL:
+                return
+        except OSError:
+            pass
+        if self._compacting:
+            return
+        self._compacting = True
+
+        def run():
+            try:
+                self.compact()
+                open(stamp, "w").close()
+            except (OSError, ValueError) as e:
+                print(f"[ERROR] Preisverlauf konnte nicht ausgedünnt werden: {e}")
+            finally:
+                self._compacting = False
+        threading.Thread(target=run, name="price-history-compact", daemon=True).start()
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_price_history():
+    """Gemeinsame Instanz des Preisverlaufs."""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = PriceHistory()
+        return _history
+
+
+def collection_holdings(collection):
+    """{(scryfall_id, variante): stückzahl} einer Sammlung (auch full=False)."""
+    holdings = {}
+    for card in collection.get("cards", []):
+        if card.get("id"):
+            key = (card["id"], card.get("variant") or "nonfoil")
+            holdings[key] = holdings.get(key, 0) + (card.get("count") or 1)
+    return holdings
+
+
+def collection_value_history(name, days=90, step=DAY):
+    """[(zeitstempel, wert_eur)] der Sammlung über die letzten days Tage (aktueller Bestand)."""
+    from collection_store import get_store
+    collection = get_store().get_collection(name, full=False)
+    if collection is None:
+        return []
+    now = int(time.time())
+    return get_price_history().value_over_time(collection_holdings(collection), now - days * DAY, now, step)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Preisverlauf (price_history/)")
+    parser.add_argument("--dir", default=HISTORY_DIR, help="Verzeichnis des Verlaufs (Standard: price_history)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    value_cmd = commands.add_parser("value", help="Wert einer Sammlung über die Zeit")
+    value_cmd.add_argument("collection")
+    value_cmd.add_argument("--days", type=int, default=90)
+    commands.add_parser("compact", help="Alte Punkte ausdünnen")
+    args = parser.parse_args(argv)
+
+    global _history
+    _history = PriceHistory(args.dir)
+    if args.command == "value":
+        for timestamp, value in collection_value_history(args.collection, args.days):
+            print(f"{time.strftime('%Y-%m-%d', time.localtime(timestamp))}  {value:10.2f} €")
+    elif args.command == "compact":
+        print(f"{_history.compact()} Punkte entfernt, {_history.point_count()} verbleiben")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
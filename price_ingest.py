@@ -0,0 +1,179 @@
+# price_ingest.py
+# Preise offline aus Bulk-Dateien übernehmen (ohne API-Aufrufe)
+#
+# Statt jede Karte bei Scryfall nachzufragen, wird eine heruntergeladene
+# Preisquelle in eine lokale Preistabelle (prices.db) gestreamt:
+#   - Scryfall-Bulk-Datei (default_cards/all_cards): prices.eur/eur_foil/...
+#     pro Scryfall-ID
+#   - Cardmarket-Preisexport (price_guide_*.json, "priceGuides"): trend und
+#     trend-foil pro idProduct, über das gespeicherte cardmarket_id den
+#     eigenen Drucken zugeordnet
+# Danach setzt CollectionStore.apply_price_table() die Preise aller
+# Einträge passend zur Variante in einem einzigen UPDATE ... FROM (Join
+# entries x prices), schreibt last_price_update und hält die Preise im
+# Preisverlauf (price_history) fest.
+#
+#   python price_ingest.py scryfall default-cards.json
+#   python price_ingest.py cardmarket price_guide_1.json
+#   python price_ingest.py apply
+import os
+import sys
+import time
+import sqlite3
+import argparse
+from json_stream import MappedJson
+from collection_store import get_store, close_store
+from price_history import get_price_history
+
+PRICE_DB_FILE = "prices.db"
+INGEST_BATCH_SIZE = 5000
+
+PRICE_COLUMNS = ("eur", "eur_foil", "eur_etched", "eur_gilded")
+
+# Cardmarket kennt nur normal und foil; etched/gilded bleiben leer
+CARDMARKET_FIELDS = {"eur": "trend", "eur_foil": "trend-foil"}
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS prices ("
+    " id TEXT PRIMARY KEY,"
+    " eur TEXT NOT NULL DEFAULT '',"
+    " eur_foil TEXT NOT NULL DEFAULT '',"
+    " eur_etched TEXT NOT NULL DEFAULT '',"
+    " eur_gilded TEXT NOT NULL DEFAULT '',"
+    " source TEXT,"
+    " updated_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+)
+
+
+def _price(value):
+    # Gleiche Regel wie beim Preisupdate: fehlend oder 0 ergibt ''
+    if value in (None, "", "0", 0):
+        return ""
+    if isinstance(value, (int, float)):
+        return f"{value:.2f}"
+    return str(value)
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    for statement in _SCHEMA:
+        conn.execute(statement)
+    return conn
+
+
+def _write(conn, rows, source, started):
+    conn.executemany(
+        "INSERT OR REPLACE INTO prices (id, eur, eur_foil, eur_etched, eur_gilded, source, updated_at)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [row + (source, started) for row in rows],
+    )
+
+
+def _finish(conn, source, started, count):
+    conn.executemany(
+        "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+        (("source", source), ("imported_at", str(started)), ("row_count", str(count))),
+    )
+    conn.commit()
+    conn.close()
+    print(f"[DEBUG] Preistabelle: {count} Preise aus {source} in {time.time() - started:.1f}s übernommen")
+    return count
+
+
+def ingest_scryfall_bulk(bulk_path, db_path=PRICE_DB_FILE, progress=None):
+    """Streamt die Preise einer Scryfall-Bulk-Datei in die Preistabelle; gibt die Anzahl zurück."""
+    started = time.time()
+    source = os.path.basename(bulk_path)
+    conn = _connect(db_path)
+    count = 0
+    batch = []
+    with MappedJson(bulk_path) as bulk:
+        total_bytes = bulk.size()
+        for card, pos in bulk.iter_array():
+            if not isinstance(card, dict) or not card.get("id"):
+                continue
+            prices = card.get("prices") or {}
+            batch.append((card["id"],) + tuple(_price(prices.get(column)) for column in PRICE_COLUMNS))
+            if len(batch) >= INGEST_BATCH_SIZE:
+                _write(conn, batch, source, started)
+                count += len(batch)
+                batch = []
+                if progress:
+                    progress(count, pos, total_bytes)
+    _write(conn, batch, source, started)
+    return _finish(conn, source, started, count + len(batch))
+
+
+def ingest_cardmarket_guide(guide_path, db_path=PRICE_DB_FILE, cardmarket_ids=None):
+    """Übernimmt einen Cardmarket-Preisexport für alle gespeicherten Drucke mit cardmarket_id."""
+    started = time.time()
+    source = os.path.basename(guide_path)
+    if cardmarket_ids is None:
+        cardmarket_ids = get_store().cardmarket_ids()
+    rows = []
+    # Wie die Bulk-Datei gestreamt: nur der aktuelle Eintrag von "priceGuides" liegt im Speicher
+    with MappedJson(guide_path) as guide_file:
+        for guide, _ in guide_file.iter_array("priceGuides"):
+            if not isinstance(guide, dict):
+                continue
+            try:
+                card_ids = cardmarket_ids.get(int(guide.get("idProduct")))
+            except (TypeError, ValueError):
+                continue
+            if not card_ids:
+                continue
+            prices = tuple(_price(guide.get(CARDMARKET_FIELDS[column])) if column in CARDMARKET_FIELDS else ""
+                           for column in PRICE_COLUMNS)
+            rows.extend((card_id,) + prices for card_id in card_ids)
+    conn = _connect(db_path)
+    _write(conn, rows, source, started)
+    return _finish(conn, source, started, len(rows))
+
+
+def apply_prices(db_path=PRICE_DB_FILE, timestamp=None):
+    """Preistabelle auf alle Sammlungen anwenden; gibt die Anzahl geänderter Einträge zurück."""
+    if not os.path.exists(db_path):
+        print(f"[ERROR] Preistabelle {db_path} fehlt, zuerst eine Preisdatei einlesen")
+        return 0
+    started = time.time()
+    store = get_store()
+    timestamp = timestamp or time.time()
+    changed = store.apply_price_table(db_path, timestamp)
+    history = get_price_history()
+    for collection in store.load_collections(full=False):
+        history.record_cards(collection["cards"], timestamp)
+    print(f"[DEBUG] Preistabelle angewendet: {changed} Einträge geändert in {time.time() - started:.2f}s")
+    return changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Preise offline aus Bulk-Dateien übernehmen")
+    parser.add_argument("--db", default=PRICE_DB_FILE, help="Pfad der Preistabelle (Standard: prices.db)")
+    parser.add_argument("--no-apply", action="store_true", help="Nur einlesen, Sammlungen nicht aktualisieren")
+    commands = parser.add_subparsers(dest="command", required=True)
+    scryfall_cmd = commands.add_parser("scryfall", help="Scryfall-Bulk-Datei (default_cards/all_cards)")
+    scryfall_cmd.add_argument("bulk_file")
+    cardmarket_cmd = commands.add_parser("cardmarket", help="Cardmarket-Preisexport (price_guide_*.json)")
+    cardmarket_cmd.add_argument("guide_file")
+    commands.add_parser("apply", help="Vorhandene Preistabelle auf alle Sammlungen anwenden")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "scryfall":
+            def progress(count, pos, total):
+                print(f"  {count} Preise ({pos * 100 // max(total, 1)} %)", flush=True)
+            ingest_scryfall_bulk(args.bulk_file, args.db, progress)
+        elif args.command == "cardmarket":
+            ingest_cardmarket_guide(args.guide_file, args.db)
+        if args.command == "apply" or not args.no_apply:
+            apply_prices(args.db)
+    finally:
+        close_store()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
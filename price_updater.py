@@ -1,18 +1,82 @@
 # price_updater.py
 # Hintergrund-Worker für Preisupdates von Sammlungen
-from PyQt6.QtCore import QObject, QThread, pyqtSignal
-import requests
+#
+# Preise kommen gebündelt über POST /cards/collection: bis zu
+# COLLECTION_BATCH_SIZE Scryfall-IDs pro Anfrage statt einer Anfrage pro
+# Karte. Gleiche IDs (mehrere Einträge derselben Karte) werden nur einmal
+# angefragt. Die API-Basis kommt aus http_client.SCRYFALL_API_BASE und lässt
+# sich für Tests auf einen lokalen Stub-Server umstellen.
+#
+# PriceRefreshScheduler aktualisiert alle veralteten Sammlungen in einem
+# Durchlauf: eine Karte, die in drei Sammlungen liegt, wird einmal abgefragt.
+# Fortschritt und Abschluss werden weiterhin pro Sammlung gemeldet. Preise
+# werden nach jedem Batch gespeichert, offene IDs stehen in einer
+# persistenten Warteschlange (price_queue im Store), so dass ein
+# abgebrochenes Update dort weitermacht, wo es aufgehört hat. Jeder
+# gespeicherte Batch landet auch gleich im Preisverlauf.
 import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+import http_client
+from collection_store import get_store
+from price_history import get_price_history
+
+# Obergrenze von Scryfall für /cards/collection
+COLLECTION_BATCH_SIZE = 75
+
+# Gleichzeitig laufende Batch-Anfragen (die Drosselung in http_client gilt zusätzlich)
+PRICE_FETCH_PARALLEL = 2
+
+# Preisfeld je Variante; alles andere (nonfoil, leer) nimmt "eur"
+VARIANT_PRICE_FIELDS = {
+    'foil': 'eur_foil',
+    'etched': 'eur_etched',
+    'gilded': 'eur_gilded',
+}
+
+
+def price_for_variant(data, variant):
+    """EUR-Preis der Variante aus einem Scryfall-Kartenobjekt ('' wenn keiner)."""
+    price = (data.get('prices') or {}).get(VARIANT_PRICE_FIELDS.get(variant, 'eur'))
+    return price if price not in (None, '', '0', 0) else ''
+
+
+def fetch_collection(ids, api_base=None, timeout=15):
+    """Kartenobjekte zu bis zu COLLECTION_BATCH_SIZE IDs: ({id: karte}, [nicht gefundene IDs])."""
+    url = f"{api_base or http_client.SCRYFALL_API_BASE}/cards/collection"
+    resp = http_client.post_json(url, {"identifiers": [{"id": card_id} for card_id in ids]}, timeout=timeout)
+    if resp.status_code != 200:
+        raise RuntimeError(f"HTTP {resp.status_code}")
+    data = resp.json()
+    found = {card['id']: card for card in data.get('data', []) if card.get('id')}
+    not_found = [entry.get('id') for entry in data.get('not_found', [])]
+    return found, not_found
+
 
-class PriceUpdaterWorker(QObject):
+def variant_prices(data):
+    """Preise eines Scryfall-Kartenobjekts je Variante ({variante: preis})."""
+    prices = {variant: price_for_variant(data, variant) for variant in VARIANT_PRICE_FIELDS}
+    prices['nonfoil'] = price_for_variant(data, 'nonfoil')
+    return prices
+
+
+class PriceRefreshScheduler(QObject):
+    """Ein Preisupdate für mehrere Sammlungen: jede Scryfall-ID wird genau einmal
+    abgefragt, der Preis an alle Einträge aller Sammlungen mit dieser ID verteilt.
+
+    Jeder fertige Batch wird sofort gespeichert (CollectionStore.checkpoint_prices)
+    und aus der Warteschlange gestrichen. Ein abgebrochener Durchlauf macht beim
+    nächsten Start mit den noch offenen IDs weiter."""
     update_status = pyqtSignal(str, str)  # (sammlungsname, status: 'pending'|'done'|'error')
-    update_progress = pyqtSignal(str, int, int)  # (sammlungsname, aktuelle_karte, gesamt)
+    update_progress = pyqtSignal(str, int, int)  # (sammlungsname, fertige_karten, gesamt)
     update_finished = pyqtSignal(str, list)  # (sammlungsname, cards)
+    all_finished = pyqtSignal()
 
-    def __init__(self, sammlung, sammlungsname):
+    def __init__(self, sammlungsnamen, api_base=None, max_parallel=PRICE_FETCH_PARALLEL):
         super().__init__()
-        self.sammlungsname = sammlungsname
-        self.sammlung = sammlung  # dict mit 'cards': [...]
+        self.sammlungsnamen = list(sammlungsnamen)
+        self.api_base = api_base
+        self.max_parallel = max_parallel
         self._abort = False
 
     def abort(self):
@@ -20,47 +84,88 @@ class PriceUpdaterWorker(QObject):
 
     def run(self):
         import traceback
-        self.update_status.emit(self.sammlungsname, 'pending')
-        cards = self.sammlung.get('cards', [])
-        for idx, card in enumerate(cards):
-            if self._abort:
-                print(f"[DEBUG] Preisupdate-Worker für '{self.sammlungsname}' abgebrochen bei Karte {idx+1}/{len(cards)}: {card.get('name')}")
-                self.update_status.emit(self.sammlungsname, 'error')
-                return
+        try:
+            self._run()
+        except Exception as e:
+            print(f"[ERROR] Preisupdate abgebrochen: {e}\n{traceback.format_exc()}")
+        finally:
+            # Ohne all_finished bleibt der Thread stehen und der Update-Button gesperrt
+            self.all_finished.emit()
+
+    def _run(self):
+        store = get_store()
+        for name in self.sammlungsnamen:
+            self.update_status.emit(name, 'pending')
+        resumed = store.start_price_run(self.sammlungsnamen)
+        totals = {}
+        open_ids = {}  # sammlungsname -> noch offene IDs; leer = Sammlung fertig
+        for name in self.sammlungsnamen:
+            all_ids, pending_ids = store.price_run_ids(name)
+            totals[name] = len(all_ids)
+            open_ids[name] = pending_ids
+            if name in resumed:
+                print(f"[DEBUG] Preisupdate für '{name}' wird fortgesetzt: {len(pending_ids)}/{len(all_ids)} Karten offen")
+        for name in self.sammlungsnamen:
+            if not open_ids[name]:
+                self._finish(store, name)
+        ids = list(dict.fromkeys(card_id for name in self.sammlungsnamen for card_id in sorted(open_ids[name])))
+        print(f"[DEBUG] Preisupdate: {len(self.sammlungsnamen)} Sammlungen, {len(ids)} verschiedene Karten offen")
+
+        batches = [ids[start:start + COLLECTION_BATCH_SIZE] for start in range(0, len(ids), COLLECTION_BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as pool:
+            pending = {}
+            for batch in batches:
+                # Nicht alle Batches auf einmal einreihen, sonst greift abort() zu spät
+                while len(pending) >= self.max_parallel:
+                    self._apply(store, pending, wait(pending, return_when=FIRST_COMPLETED).done, open_ids, totals)
+                if self._abort:
+                    break
+                pending[pool.submit(fetch_collection, batch, self.api_base)] = batch
+            self._apply(store, pending, wait(pending).done, open_ids, totals)
+        for name in self.sammlungsnamen:
+            if open_ids[name]:
+                reason = "abgebrochen" if self._abort else "unvollständig"
+                print(f"[DEBUG] Preisupdate für '{name}' {reason}: {len(open_ids[name])} Karten offen, wird beim nächsten Mal fortgesetzt")
+                self.update_status.emit(name, 'error')
+        get_price_history().compact_in_background()
+
+    def _apply(self, store, pending, finished, open_ids, totals):
+        # Ergebnisse fertiger Batches speichern und aus der Warteschlange streichen
+        import traceback
+        for future in finished:
+            batch = pending.pop(future)
             try:
-                scryfall_id = card.get('id')
-                print(f"[DEBUG] Preisupdate-Worker: {self.sammlungsname} | {idx+1}/{len(cards)} | {card.get('name')} | id={scryfall_id}")
-                if not scryfall_id:
-                    print(f"[DEBUG] Preisupdate-Worker: Karte ohne Scryfall-ID übersprungen: {card.get('name')}")
+                found, not_found = future.result()
+            except Exception as e:
+                # IDs bleiben in der Warteschlange und werden beim nächsten Durchlauf geholt
+                print(f"[ERROR] Preisupdate: Batch mit {len(batch)} Karten fehlgeschlagen: {e}\n{traceback.format_exc()}")
+                continue
+            if not_found:
+                print(f"[DEBUG] Preisupdate: {len(not_found)} IDs bei Scryfall nicht gefunden")
+            # Nicht gefundene Karten bekommen wie bisher einen leeren Preis
+            applied = store.checkpoint_prices({card_id: variant_prices(found[card_id]) if card_id in found else {}
+                                               for card_id in batch})
+            # Auch Batches eines später abgebrochenen Durchlaufs gehören in den Verlauf
+            get_price_history().record(applied)
+            done_ids = set(batch)
+            existing = set(store.collection_names())
+            for name, ids in open_ids.items():
+                if ids.isdisjoint(done_ids):
                     continue
-                url = f"https://api.scryfall.com/cards/{scryfall_id}"
-                try:
-                    resp = requests.get(url, timeout=5)
-                except Exception as e:
-                    print(f"[ERROR] Preisupdate-Worker: Request-Fehler bei {card.get('name')} ({scryfall_id}): {e}")
-                    card['eur'] = ''
+                if name not in existing:
+                    # Während des Updates gelöscht: nichts mehr zu melden
+                    ids.clear()
                     continue
-                if resp.status_code == 200:
-                    data = resp.json()
-                    variant = card.get('variant', 'nonfoil')
-                    price = None
-                    if variant == 'foil':
-                        price = data.get('prices', {}).get('eur_foil')
-                    elif variant == 'etched':
-                        price = data.get('prices', {}).get('eur_etched')
-                    elif variant == 'gilded':
-                        price = data.get('prices', {}).get('eur_gilded')
-                    else:
-                        price = data.get('prices', {}).get('eur')
-                    card['eur'] = price if price not in (None, '', '0', 0) else ''
-                    print(f"[DEBUG] Preisupdate-Worker: {card.get('name')} | Variante: {variant} | Preis: {card['eur']}")
-                else:
-                    print(f"[ERROR] Preisupdate-Worker: HTTP {resp.status_code} für {card.get('name')} ({scryfall_id})")
-                    card['eur'] = ''
-            except Exception as e:
-                print(f"[ERROR] Preisupdate-Worker: Exception bei {card.get('name')} ({card.get('id')}): {e}\n{traceback.format_exc()}")
-                card['eur'] = ''
-            self.update_progress.emit(self.sammlungsname, idx+1, len(cards))
-            time.sleep(0.05)  # UI-Entlastung
-        self.update_status.emit(self.sammlungsname, 'done')
-        self.update_finished.emit(self.sammlungsname, cards)
+                ids.difference_update(done_ids)
+                self.update_progress.emit(name, totals[name] - len(ids), totals[name])
+                if not ids:
+                    self._finish(store, name)
+
+    def _finish(self, store, name):
+        collection = store.get_collection(name, full=False)
+        if collection is None:
+            print(f"[DEBUG] Preisupdate: Sammlung '{name}' wurde inzwischen gelöscht")
+            return
+        store.finish_price_run(name, time.time())
+        self.update_status.emit(name, 'done')
+        self.update_finished.emit(name, collection['cards'])
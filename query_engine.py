@@ -0,0 +1,535 @@
+# query_engine.py
+# Lokale Auswertung einer Teilmenge der Scryfall-Suchsyntax
+#
+# Unterstützt (wie auf scryfall.com/docs/syntax):
+#   bolt, "lightning bolt", !"Lightning Bolt"    Name enthält / exakter Name
+#   name:  t: type:  o: oracle:                  Text enthält (auch gedruckte Namen)
+#   c: color:  id: identity:                     Farben (wubrg, c, m, Farb- und Gildennamen)
+#   cmc mv usd eur (:, =, !=, <, <=, >, >=)       Zahlen
+#   r: rarity: (auch r>=rare)  s: set: e:  lang: l:  oracleid:  is:foil/nonfoil/etched
+#   Verknüpfung: Leerzeichen (und), "or", "-" (nicht), Klammern
+#
+# Pro Quelle (lokale Kartendatenbank, eigene Sammlungen) wird ein CardIndex
+# gebaut: invertierte Indizes Wort -> Dokument-IDs für Name/Typ/Text (Teilwörter
+# über einen Trigramm-Index auf dem Vokabular wie im name_index), exakte
+# Indizes für Set/Sprache/Oracle-ID/Finish/Farbkombination und sortierte
+# Spalten für Zahlen (Bereichsabfragen per Binärsuche). Die Dokument-IDs sind
+# nach Name sortiert vergeben, sortierte Ergebnisse sind damit einfach
+# sortierte ID-Mengen.
+import re
+import bisect
+import threading
+from card_db import get_card_db
+from collection_store import get_store
+from name_index import normalize_name
+
+# Wie eine Ergebnisseite von Scryfall
+MAX_RESULTS = 175
+
+COLOR_BITS = {"w": 1, "u": 2, "b": 4, "r": 8, "g": 16}
+COLOR_NAMES = {
+    "white": "w", "blue": "u", "black": "b", "red": "r", "green": "g",
+    "azorius": "wu", "dimir": "ub", "rakdos": "br", "gruul": "rg", "selesnya": "gw",
+    "orzhov": "wb", "izzet": "ur", "golgari": "bg", "boros": "rw", "simic": "gu",
+    "colorless": "c", "multicolor": "m",
+}
+RARITIES = {"common": 0, "uncommon": 1, "rare": 2, "special": 3, "mythic": 4, "bonus": 5}
+RARITY_ALIASES = {"c": "common", "u": "uncommon", "r": "rare", "s": "special", "m": "mythic", "b": "bonus"}
+
+KEY_ALIASES = {
+    "name": "name", "n": "name",
+    "t": "type", "type": "type",
+    "o": "oracle", "oracle": "oracle",
+    "c": "color", "color": "color", "colour": "color",
+    "id": "identity", "identity": "identity", "ci": "identity",
+    "cmc": "cmc", "mv": "cmc", "manavalue": "cmc",
+    "usd": "usd", "eur": "eur",
+    "r": "rarity", "rarity": "rarity",
+    "s": "set", "set": "set", "e": "set", "edition": "set",
+    "l": "lang", "lang": "lang", "language": "lang",
+    "oracleid": "oracleid",
+    "is": "is",
+}
+# Besitzfelder, die nicht in Suchergebnisse übernommen werden (die Sprache gehört zur Karte)
+ENTRY_FIELDS = ("entry_id", "count", "variant", "is_proxy", "purchase_price", "eur")
+TEXT_FIELDS = ("name", "type", "oracle")
+NUMERIC_FIELDS = ("cmc", "usd", "eur", "rarity")
+TERM_FIELDS = ("set", "lang", "oracleid", "is")
+
+_TERM = re.compile(r'(!)?(?:([a-zA-Z]+)(>=|<=|!=|:|=|>|<))?("[^"]*"?|[^\s()"]+)')
+_WORD = re.compile(r"[0-9a-z]+")
+
+
+class QueryError(ValueError):
+    """Suchsyntax, die die lokale Suche nicht versteht (Aufrufer fragen dann Scryfall)."""
+
+
+# --- Parser ---
+def _tokenize(query):
+    tokens = []
+    pos = 0
+    while pos < len(query):
+        ch = query[pos]
+        if ch.isspace():
+            pos += 1
+        elif ch in "()":
+            tokens.append(ch)
+            pos += 1
+        elif ch == "-" and pos + 1 < len(query) and not query[pos + 1].isspace():
+            tokens.append("-")
+            pos += 1
+        else:
+            match = _TERM.match(query, pos)
+            if not match or match.end() == pos:
+                raise QueryError(f"Unerwartetes Zeichen an Position {pos}: {ch!r}")
+            exact, key, op, value = match.groups()
+            quoted = value.startswith('"')
+            value = value.strip('"')
+            if not key and not exact and not quoted and value.lower() in ("or", "and"):
+                tokens.append(value.lower())
+            else:
+                tokens.append(("term", key.lower() if key else None, op, value, bool(exact)))
+            pos = match.end()
+    return tokens
+
+
+def parse(query):
+    """Zerlegt eine Suchanfrage in einen Baum aus ("and"|"or", [...]), ("not", x) und ("term", ...)."""
+    tokens = _tokenize(query)
+    pos = 0
+
+    def parse_or():
+        nonlocal pos
+        children = [parse_and()]
+        while pos < len(tokens) and tokens[pos] == "or":
+            pos += 1
+            children.append(parse_and())
+        return children[0] if len(children) == 1 else ("or", children)
+
+    def parse_and():
+        nonlocal pos
+        children = []
+        while pos < len(tokens) and tokens[pos] not in ("or", ")"):
+            if tokens[pos] == "and":
+                pos += 1
+                continue
+            children.append(parse_unary())
+        if not children:
+            raise QueryError("Leerer Suchausdruck")
+        return children[0] if len(children) == 1 else ("and", children)
+
+    def parse_unary():
+        nonlocal pos
+        token = tokens[pos]
+        if token == "-":
+            pos += 1
+            if pos >= len(tokens):
+                raise QueryError("'-' ohne Ausdruck")
+            return ("not", parse_unary())
+        if token == "(":
+            pos += 1
+            node = parse_or()
+            if pos >= len(tokens) or tokens[pos] != ")":
+                raise QueryError("Fehlende schließende Klammer")
+            pos += 1
+            return node
+        pos += 1
+        return token
+
+    node = parse_or()
+    if pos != len(tokens):
+        raise QueryError("Unerwartete schließende Klammer")
+    return node
+
+
+# --- Aufbereitung der Kartenfelder ---
+def _card_faces(card):
+    faces = card.get("card_faces")
+    return [face for face in faces if isinstance(face, dict)] if isinstance(faces, list) else []
+
+
+def _color_mask(colors):
+    mask = 0
+    for color in colors or ():
+        mask |= COLOR_BITS.get(str(color).lower(), 0)
+    return mask
+
+
+def _price(card, currency):
+    value = (card.get("prices") or {}).get(currency)
+    if value is None and currency == "eur":
+        # Eigene Einträge tragen den zuletzt ermittelten Marktwert direkt
+        value = card.get("eur")
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _document(card):
+    """Kompakte Suchdaten einer Karte; das Kartenobjekt selbst wird nicht im Index gehalten."""
+    faces = _card_faces(card)
+    names = [card.get("name") or "", card.get("printed_name") or ""]
+    names += [face.get("printed_name") or "" for face in faces]
+    oracle = card.get("oracle_text") or "\n".join(face.get("oracle_text") or "" for face in faces)
+    colors = card.get("colors")
+    if colors is None:
+        colors = [color for face in faces for color in face.get("colors") or ()]
+    if card.get("variant"):
+        finishes = (card["variant"],)
+    else:
+        finishes = tuple(card.get("finishes") or ())
+    cmc = card.get("cmc")
+    rarity = RARITIES.get(card.get("rarity"))
+    return {
+        "name": "\n".join(normalize_name(name) for name in names if name),
+        "type": normalize_name(card.get("type_line") or ""),
+        "oracle": oracle.lower(),
+        "color": _color_mask(colors),
+        "identity": _color_mask(card.get("color_identity")),
+        "cmc": float(cmc) if isinstance(cmc, (int, float)) else None,
+        "usd": _price(card, "usd"),
+        "eur": _price(card, "eur"),
+        "rarity": float(rarity) if rarity is not None else None,
+        "set": (card.get("set") or "").lower(),
+        "lang": card.get("lang") or "",
+        "oracleid": card.get("oracle_id") or "",
+        "is": finishes,
+    }
+
+
+def _parse_colors(value):
+    value = value.lower()
+    value = COLOR_NAMES.get(value, value)
+    if value == "m":
+        return None
+    if value == "c":
+        return 0
+    if not value or any(ch not in COLOR_BITS for ch in value):
+        raise QueryError(f"Unbekannte Farbe: {value}")
+    return _color_mask(value)
+
+
+def _compare_colors(mask, op, query_mask):
+    if op == "=":
+        return mask == query_mask
+    if op == "!=":
+        return mask != query_mask
+    if op == ">=":
+        return mask & query_mask == query_mask
+    if op == ">":
+        return mask & query_mask == query_mask and mask != query_mask
+    if op == "<=":
+        return mask & ~query_mask == 0
+    if op == "<":
+        return mask & ~query_mask == 0 and mask != query_mask
+    raise QueryError(f"Operator {op} für Farben nicht möglich")
+
+
+def _word_grams(word):
+    # Alle Teilstücke der Länge 1 bis 3; längere Suchwörter werden über ihre Trigramme gefunden
+    return {word[i:i + size] for size in (1, 2, 3) for i in range(len(word) - size + 1)}
+
+
+class CardIndex:
+    """Suchindex über Karten. cards: Iterable von (Nutzlast, Kartenobjekt); Treffer liefern die Nutzlast."""
+
+    def __init__(self, cards):
+        docs = []
+        for payload, card in cards:
+            if not isinstance(card, dict):
+                continue
+            doc = _document(card)
+            sort_key = ((card.get("name") or "").lower(), doc["lang"] != "en", card.get("released_at") or "")
+            docs.append((sort_key, payload, doc))
+        # Wie Scryfall: nach Name, dann englisch vor anderen Sprachen, neueste Ausgabe zuerst
+        docs.sort(key=lambda item: item[0][2], reverse=True)
+        docs.sort(key=lambda item: item[0][:2])
+
+        self.payloads = [payload for _, payload, _ in docs]
+        self._oracle_ids = [doc["oracleid"] or sort_key[0] for sort_key, _, doc in docs]
+        self._all = set(range(len(docs)))
+        self._texts = {field: [doc[field] for _, _, doc in docs] for field in TEXT_FIELDS}
+        self._words = {field: {} for field in TEXT_FIELDS}
+        self._masks = {"color": {}, "identity": {}}
+        self._terms = {field: {} for field in TERM_FIELDS}
+        columns = {field: [] for field in NUMERIC_FIELDS}
+        for doc_id, (_, _, doc) in enumerate(docs):
+            for field in TEXT_FIELDS:
+                words = self._words[field]
+                for word in set(_WORD.findall(doc[field])):
+                    words.setdefault(word, []).append(doc_id)
+            for field in NUMERIC_FIELDS:
+                if doc[field] is not None:
+                    columns[field].append((doc[field], doc_id))
+            for field in ("set", "lang", "oracleid"):
+                if doc[field]:
+                    self._terms[field].setdefault(doc[field], []).append(doc_id)
+            for field in ("color", "identity"):
+                self._masks[field].setdefault(doc[field], []).append(doc_id)
+            for finish in doc["is"]:
+                self._terms["is"].setdefault(finish, []).append(doc_id)
+        # Teilwort-Suche: Vokabular je Feld plus Index Trigramm (bzw. 1-/2-Gramm) -> Wort-IDs
+        self._vocab = {}
+        self._word_grams = {}
+        for field in TEXT_FIELDS:
+            vocab = list(self._words[field])
+            grams = {}
+            for word_id, word in enumerate(vocab):
+                for gram in _word_grams(word):
+                    grams.setdefault(gram, []).append(word_id)
+            self._vocab[field] = vocab
+            self._word_grams[field] = grams
+        # Sortierte Spalten: Werte und Dokument-IDs parallel, Bereiche per bisect
+        self._columns = {}
+        for field, pairs in columns.items():
+            pairs.sort()
+            self._columns[field] = ([value for value, _ in pairs], [doc_id for _, doc_id in pairs])
+
+    def __len__(self):
+        return len(self.payloads)
+
+    # --- Auswertung ---
+    def query(self, query):
+        """Sortierte Dokument-IDs aller Treffer."""
+        return sorted(self._eval(parse(query)))
+
+    def search(self, query, limit=MAX_RESULTS, unique=False):
+        """Nutzlasten der Treffer; unique=True: nur der erste Druck je Karte (wie unique=cards)."""
+        results = []
+        seen = set()
+        for doc_id in self.query(query):
+            if unique:
+                oracle_id = self._oracle_ids[doc_id]
+                if oracle_id in seen:
+                    continue
+                seen.add(oracle_id)
+            results.append(self.payloads[doc_id])
+            if limit and len(results) >= limit:
+                break
+        return results
+
+    def _eval(self, node):
+        kind = node[0]
+        if kind == "term":
+            return self._term(*node[1:])
+        if kind == "not":
+            return self._all - self._eval(node[1])
+        if kind == "or":
+            result = set()
+            for child in node[1]:
+                result |= self._eval(child)
+            return result
+        # "und": Negationen werden am Ende abgezogen statt als Komplement gebildet
+        positive = [child for child in node[1] if child[0] != "not"]
+        negative = [child[1] for child in node[1] if child[0] == "not"]
+        result = None
+        for child in positive:
+            ids = self._eval(child)
+            result = ids if result is None else result & ids
+            if not result:
+                return set()
+        if result is None:
+            result = set(self._all)
+        for child in negative:
+            result -= self._eval(child)
+        return result
+
+    def _term(self, key, op, value, exact):
+        if key is None:
+            field, op = "name", ":"
+        elif key in KEY_ALIASES:
+            field = KEY_ALIASES[key]
+        else:
+            raise QueryError(f"Unbekanntes Suchfeld: {key}")
+        if exact:
+            return self._exact_name(value)
+        if field in TEXT_FIELDS:
+            if op not in (":", "="):
+                raise QueryError(f"Operator {op} für {key} nicht möglich")
+            return self._text(field, value)
+        if field in ("color", "identity"):
+            return self._colors(field, op, value)
+        if field in NUMERIC_FIELDS:
+            return self._numeric(field, op, value)
+        return self._exact_term(field, op, value)
+
+    def _word_ids(self, field, token):
+        # Teilwörter wie bei Scryfall: "bol" findet "bolt". Kandidaten sind die Wörter mit allen
+        # Trigrammen des Suchworts (kurze Suchwörter direkt als 1-/2-Gramm), geprüft wird am Wort
+        grams = {token[i:i + 3] for i in range(len(token) - 2)} or {token}
+        index = self._word_grams[field]
+        postings = sorted((index.get(gram, ()) for gram in grams), key=len)
+        word_ids = set(postings[0])
+        for posting in postings[1:]:
+            if not word_ids:
+                break
+            word_ids.intersection_update(posting)
+        vocab = self._vocab[field]
+        words = self._words[field]
+        ids = set()
+        for word_id in word_ids:
+            word = vocab[word_id]
+            if len(grams) == 1 or token in word:
+                ids.update(words[word])
+        return ids
+
+    def _text(self, field, value):
+        needle = normalize_name(value) if field != "oracle" else value.lower()
+        tokens = _WORD.findall(needle)
+        if not tokens:
+            raise QueryError(f"Leerer Suchbegriff für {field}")
+        candidates = None
+        # Längere Wörter zuerst, sie schränken am stärksten ein
+        for token in sorted(set(tokens), key=len, reverse=True):
+            ids = self._word_ids(field, token)
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return set()
+        if len(tokens) > 1 or tokens[0] != needle:
+            # Wortfolgen und Satzzeichen ("+1/+1") am eigentlichen Text prüfen
+            texts = self._texts[field]
+            candidates = {doc_id for doc_id in candidates if needle in texts[doc_id]}
+        return candidates
+
+    def _exact_name(self, value):
+        needle = normalize_name(value)
+        texts = self._texts["name"]
+        candidates = self._text("name", value)
+        return {doc_id for doc_id in candidates if needle in texts[doc_id].split("\n")}
+
+    def _colors(self, field, op, value):
+        # Nur 32 mögliche Farbkombinationen: Bedingung pro Kombination prüfen, nicht pro Karte
+        if value.isdigit():
+            # c>=2: Anzahl der Farben
+            count = int(value)
+            op = "=" if op == ":" else op
+            matches = lambda mask: _compare_numbers(bin(mask).count("1"), op, count)
+        else:
+            query_mask = _parse_colors(value)
+            if query_mask is None:
+                matches = lambda mask: bin(mask).count("1") >= 2
+            else:
+                if op == ":":
+                    # c: heißt "mindestens diese Farben", id: "höchstens diese Farben"; c:c = farblos
+                    op = "<=" if field == "identity" or query_mask == 0 else ">="
+                matches = lambda mask: _compare_colors(mask, op, query_mask)
+        ids = set()
+        for mask, doc_ids in self._masks[field].items():
+            if matches(mask):
+                ids.update(doc_ids)
+        return ids
+
+    def _numeric(self, field, op, value):
+        if field == "rarity":
+            value = value.lower()
+            value = RARITY_ALIASES.get(value, value)
+            if value not in RARITIES:
+                raise QueryError(f"Unbekannte Seltenheit: {value}")
+            number = float(RARITIES[value])
+        else:
+            try:
+                number = float(value)
+            except ValueError:
+                raise QueryError(f"Keine Zahl für {field}: {value}")
+        values, doc_ids = self._columns[field]
+        low = bisect.bisect_left(values, number)
+        high = bisect.bisect_right(values, number)
+        if op in (":", "="):
+            return set(doc_ids[low:high])
+        if op == "!=":
+            return set(doc_ids[:low]) | set(doc_ids[high:])
+        if op == "<":
+            return set(doc_ids[:low])
+        if op == "<=":
+            return set(doc_ids[:high])
+        if op == ">":
+            return set(doc_ids[high:])
+        return set(doc_ids[low:])
+
+    def _exact_term(self, field, op, value):
+        if op not in (":", "=", "!="):
+            raise QueryError(f"Operator {op} für {field} nicht möglich")
+        value = value if field == "oracleid" else value.lower()
+        ids = set(self._terms[field].get(value, ()))
+        return self._all - ids if op == "!=" else ids
+
+
+def _compare_numbers(a, op, b):
+    if op in (":", "="):
+        return a == b
+    if op == "!=":
+        return a != b
+    if op == "<":
+        return a < b
+    if op == "<=":
+        return a <= b
+    if op == ">":
+        return a > b
+    return a >= b
+
+
+# --- Gemeinsame Indizes ---
+_mirror_index = None
+_mirror_key = None
+_owned_index = None
+_owned_key = None
+_index_lock = threading.Lock()
+
+
+def get_mirror_index():
+    """Index über die lokale Kartendatenbank; Nutzlast ist die Scryfall-ID."""
+    global _mirror_index, _mirror_key
+    card_db = get_card_db()
+    key = card_db.imported_at()
+    with _index_lock:
+        if _mirror_index is None or key != _mirror_key:
+            _mirror_index = CardIndex((card.get("id"), card) for card in card_db.iter_cards())
+            _mirror_key = key
+        return _mirror_index
+
+
+def get_owned_index():
+    """Index über alle Einträge der eigenen Sammlungen; Nutzlast ist das Kartenobjekt ohne Besitzfelder."""
+    global _owned_index, _owned_key
+    store = get_store()
+    key = store.data_version()
+    with _index_lock:
+        if _owned_index is None or key != _owned_key:
+            cards = [
+                ({key: value for key, value in card.items() if key not in ENTRY_FIELDS}, card)
+                for collection in store.load_collections()
+                for card in collection["cards"]
+            ]
+            _owned_index = CardIndex(cards)
+            _owned_key = key
+        return _owned_index
+
+
+def search_cards(query, limit=MAX_RESULTS, unique=False, mirror=True, owned=True):
+    """Sucht in der Kartendatenbank und den eigenen Sammlungen, Ergebnis nach Name sortiert.
+
+    Eigene Einträge erscheinen nur, wenn ihr Druck nicht schon aus der Kartendatenbank kommt.
+    Wirft QueryError bei nicht unterstützter Syntax.
+    """
+    cards = []
+    if mirror and get_card_db().available():
+        cards = get_card_db().get_many(get_mirror_index().search(query, limit, unique))
+    if owned:
+        seen = {card.get("id") for card in cards}
+        seen_oracle = {card.get("oracle_id") or card.get("name") for card in cards}
+        for card in get_owned_index().search(query, limit, unique):
+            if card.get("id") in seen:
+                continue
+            if unique and (card.get("oracle_id") or card.get("name")) in seen_oracle:
+                continue
+            seen.add(card.get("id"))
+            cards.append(card)
+        # Stabil nach Name, die Reihenfolge innerhalb eines Namens bleibt erhalten
+        cards.sort(key=lambda card: (card.get("name") or "").lower())
+    return cards[:limit] if limit else cards
+
+
+def warm_query_index():
+    """Baut den Index der Kartendatenbank im Hintergrund, damit die erste Suche nicht wartet."""
+    threading.Thread(target=get_mirror_index, name="query-index", daemon=True).start()
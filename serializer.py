@@ -0,0 +1,104 @@
+# serializer.py
+# Einheitliche Serialisierung für alle Lade- und Speicherstellen
+#
+# JSON wird mit orjson geschrieben/gelesen, falls installiert, sonst mit der
+# Standardbibliothek (immer kompakt, ohne Einrückung). Optional gibt es
+# kompakte Binärformate:
+#   "json+zlib"     - komprimiertes JSON, nur Standardbibliothek
+#   "msgpack+zstd"  - msgpack mit zstd-Kompression (braucht msgpack und zstandard)
+# Binärdaten beginnen mit einer eigenen Kennung (MAGIC_*), loads() erkennt das
+# Format daran automatisch. Alte JSON-Daten bleiben damit immer lesbar.
+#
+# Das Format für neue Daten kommt aus der Umgebungsvariable MTG_SERIALIZER
+# (Standard: "json").
+import os
+import json
+import zlib
+from utils import atomic_write
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+    import zstandard
+except ImportError:
+    msgpack = zstandard = None
+
+ENCODING_JSON = "json"
+ENCODING_JSON_ZLIB = "json+zlib"
+ENCODING_MSGPACK_ZSTD = "msgpack+zstd"
+
+MAGIC_JSON_ZLIB = b"JZ\x01"
+MAGIC_MSGPACK_ZSTD = b"MZ\x01"
+
+JSON_BACKEND = "orjson" if orjson else "json"
+
+
+def available_encodings():
+    encodings = [ENCODING_JSON, ENCODING_JSON_ZLIB]
+    if msgpack and zstandard:
+        encodings.append(ENCODING_MSGPACK_ZSTD)
+    return encodings
+
+
+def _default_encoding():
+    encoding = os.environ.get("MTG_SERIALIZER", ENCODING_JSON)
+    if encoding not in available_encodings():
+        print(f"[ERROR] Serializer '{encoding}' nicht verfügbar, verwende {ENCODING_JSON}")
+        return ENCODING_JSON
+    return encoding
+
+
+DEFAULT_ENCODING = _default_encoding()
+
+
+def _json_bytes(obj):
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(obj, encoding=None):
+    """Serialisiert obj. JSON kommt als str zurück, Binärformate als bytes."""
+    encoding = encoding or DEFAULT_ENCODING
+    if encoding == ENCODING_JSON:
+        if orjson:
+            return orjson.dumps(obj).decode("utf-8")
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    if encoding == ENCODING_JSON_ZLIB:
+        return MAGIC_JSON_ZLIB + zlib.compress(_json_bytes(obj), 6)
+    if encoding == ENCODING_MSGPACK_ZSTD:
+        if not (msgpack and zstandard):
+            raise ValueError("msgpack+zstd benötigt die Pakete msgpack und zstandard")
+        return MAGIC_MSGPACK_ZSTD + zstandard.ZstdCompressor(level=3).compress(msgpack.packb(obj, use_bin_type=True))
+    raise ValueError(f"Unbekanntes Format: {encoding}")
+
+
+def loads(data):
+    """Liest Daten in jedem unterstützten Format (str, bytes oder memoryview)."""
+    if isinstance(data, memoryview):
+        data = bytes(data)
+    if isinstance(data, bytes):
+        if data.startswith(MAGIC_JSON_ZLIB):
+            data = zlib.decompress(data[len(MAGIC_JSON_ZLIB):])
+        elif data.startswith(MAGIC_MSGPACK_ZSTD):
+            if not (msgpack and zstandard):
+                raise ValueError("msgpack+zstd-Daten, aber msgpack/zstandard sind nicht installiert")
+            raw = zstandard.ZstdDecompressor().decompress(data[len(MAGIC_MSGPACK_ZSTD):])
+            return msgpack.unpackb(raw, raw=False)
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dump_file(obj, path, encoding=None):
+    """Schreibt obj atomar nach path."""
+    atomic_write(path, dumps(obj, encoding))
+
+
+def load_file(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
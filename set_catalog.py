@@ -0,0 +1,207 @@
+# set_catalog.py
+# Persistenter Katalog aller Scryfall-Sets (für set_size & Co.)
+#
+# Statt pro Kartenzeile /sets/{code} abzufragen, wird die komplette Set-Liste
+# einmal über /sets geladen (eine Anfrage, ca. 1000 Sets) und in sets.json
+# gespeichert. Nachschlagen geht danach per Dict in O(1) und ohne Netz.
+# Fehlt die Datei oder ist sie älter als SET_CATALOG_MAX_AGE, wird sie im
+# Hintergrund geladen bzw. erneuert; bis dahin gelten die alten Daten (beim
+# ersten Start der Standardwert des Aufrufers), die GUI wartet nie auf /sets.
+# Unbekannte Codes (neue Sets zwischen zwei Aktualisierungen) werden einzeln
+# nachgeladen und ergänzt.
+#
+# Offline befüllen (z. B. mit einem gespeicherten /sets-Dump):
+#   python set_catalog.py import sets-dump.json
+import os
+import sys
+import time
+import argparse
+import threading
+import http_client
+import serializer
+from single_flight import get_group
+
+SET_CATALOG_FILE = "sets.json"
+SETS_API_URL = "https://api.scryfall.com/sets"
+
+# Nach einer Woche wird die Set-Liste erneuert
+SET_CATALOG_MAX_AGE = 7 * 24 * 3600
+
+# Felder, die pro Set gespeichert werden
+SET_FIELDS = ("code", "name", "set_type", "released_at", "card_count", "printed_size", "parent_set_code", "icon_svg_uri")
+
+
+def _project_set(set_data):
+    return {key: set_data[key] for key in SET_FIELDS if key in set_data}
+
+
+_set_flight = get_group("sets")
+
+
+class SetCatalog:
+    """Set-Daten nach Code; lädt beim ersten Zugriff aus sets.json bzw. im Hintergrund von Scryfall."""
+
+    def __init__(self, path=SET_CATALOG_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._sets = None
+        self._fetched_at = 0
+        self._missing = set()
+        self._refreshing = False
+        self._filling = False
+
+    def _load(self):
+        with self._lock:
+            if self._sets is not None:
+                return
+            self._sets = {}
+            if os.path.exists(self.path):
+                try:
+                    data = serializer.load_file(self.path)
+                    self._sets = {code: entry for code, entry in data.get("sets", {}).items()}
+                    self._fetched_at = data.get("fetched_at", 0)
+                except (OSError, ValueError) as e:
+                    print(f"[ERROR] Set-Katalog {self.path} nicht lesbar: {e}")
+            if not self._sets:
+                # Erste Befüllung dauert mehrere Seiten /sets, also nicht im aufrufenden (GUI-)Thread
+                self._filling = True
+                self._refresh_in_background()
+            elif time.time() - self._fetched_at > SET_CATALOG_MAX_AGE:
+                self._refresh_in_background()
+
+    def _save(self):
+        serializer.dump_file({"fetched_at": self._fetched_at, "sets": self._sets}, self.path)
+
+    def import_sets(self, sets, fetched_at=None):
+        """Übernimmt eine Liste von Scryfall-Set-Objekten (Inhalt von /sets, Feld "data")."""
+        with self._lock:
+            if self._sets is None:
+                self._sets = {}
+            for set_data in sets:
+                if isinstance(set_data, dict) and set_data.get("code"):
+                    self._sets[set_data["code"].lower()] = _project_set(set_data)
+            self._fetched_at = fetched_at or time.time()
+            self._missing.clear()
+            self._save()
+            return len(self._sets)
+
+    def refresh(self):
+        """Lädt die komplette Set-Liste von Scryfall. Gibt False zurück, wenn das nicht ging."""
+        sets = []
+        url = SETS_API_URL
+        try:
+            while url:
+                resp = http_client.get(url, timeout=10)
+                if resp.status_code != 200:
+                    print(f"[ERROR] Set-Liste konnte nicht geladen werden: HTTP {resp.status_code}")
+                    return False
+                page = resp.json()
+                sets.extend(page.get("data", []))
+                url = page.get("next_page") if page.get("has_more") else None
+        except Exception as e:
+            print(f"[ERROR] Set-Liste konnte nicht geladen werden: {e}")
+            return False
+        count = self.import_sets(sets)
+        print(f"[DEBUG] Set-Katalog: {count} Sets geladen")
+        return True
+
+    def _refresh_in_background(self):
+        if self._refreshing:
+            return
+        self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+                self._filling = False
+        threading.Thread(target=run, name="set-catalog", daemon=True).start()
+
+    def _fetch_single(self, code):
+        # Einzelnes, noch unbekanntes Set; jeder Code wird pro Sitzung höchstens einmal gefragt
+        try:
+            resp = http_client.get(f"{SETS_API_URL}/{code}", timeout=3)
+            if resp.status_code != 200:
+                return None
+            set_data = _project_set(resp.json())
+        except Exception as e:
+            print(f"[ERROR] Set {code} konnte nicht geladen werden: {e}")
+            return None
+        finally:
+            self._missing.add(code)
+        with self._lock:
+            self._sets[code] = set_data
+            self._save()
+        return set_data
+
+    def get(self, code):
+        """Set-Daten zum Code (ohne Groß/Klein) oder None."""
+        if not code:
+            return None
+        code = str(code).lower()
+        self._load()
+        set_data = self._sets.get(code)
+        # Während der ersten Befüllung fehlt jedes Set, Einzelabfragen wären hier nur doppelte Arbeit
+        if set_data is None and code not in self._missing and not self._filling:
+            # Mehrere Zeilen mit demselben neuen Set warten auf dieselbe Anfrage
+            set_data = _set_flight.do(code, self._fetch_single, code)
+        return set_data
+
+    def set_size(self, code, default=None):
+        """Anzahl Karten im Set (card_count wie bei /sets/{code}) oder default."""
+        set_data = self.get(code)
+        if not set_data or set_data.get("card_count") in (None, ""):
+            return default
+        return set_data["card_count"]
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_set_catalog():
+    """Gemeinsame Instanz des Set-Katalogs."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = SetCatalog()
+        return _catalog
+
+
+def set_size(code, default=None):
+    return get_set_catalog().set_size(code, default)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Set-Katalog (sets.json)")
+    parser.add_argument("--file", default=SET_CATALOG_FILE, help="Pfad des Katalogs (Standard: sets.json)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_cmd = commands.add_parser("import", help="/sets-Dump (JSON) übernehmen")
+    import_cmd.add_argument("dump_file")
+    commands.add_parser("refresh", help="Set-Liste von Scryfall laden")
+    lookup_cmd = commands.add_parser("lookup", help="Set nach Code anzeigen")
+    lookup_cmd.add_argument("code")
+    args = parser.parse_args(argv)
+
+    catalog = SetCatalog(args.file)
+    if args.command == "lookup" and not os.path.exists(args.file):
+        # Auf der Kommandozeile darf gewartet werden
+        catalog.refresh()
+    if args.command == "import":
+        data = serializer.load_file(args.dump_file)
+        sets = data.get("data", []) if isinstance(data, dict) else data
+        print(f"{catalog.import_sets(sets)} Sets im Katalog")
+    elif args.command == "refresh":
+        return 0 if catalog.refresh() else 1
+    elif args.command == "lookup":
+        set_data = catalog.get(args.code)
+        if set_data is None:
+            print("Nicht gefunden.")
+            return 1
+        print(f"{set_data.get('code', '').upper()} | {set_data.get('name')} | {set_data.get('card_count')} Karten")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+# single_flight.py
+# Gleichzeitige Anfragen nach demselben Schlüssel zu einer zusammenfassen
+#
+# Mehrere Threads wollen oft dieselbe Ressource gleichzeitig: zwei Preis-
+# updates treffen dieselbe Karten-ID, mehrere Zeilen der Sammlungsansicht
+# dasselbe Set, Anzeige und "Zur Sammlung hinzufügen" dasselbe Bild.
+# SingleFlight.do(key, fn, ...) führt fn pro Schlüssel nur einmal gleichzeitig
+# aus; wer währenddessen mit demselben Schlüssel kommt, wartet und bekommt
+# dasselbe Ergebnis (bzw. dieselbe Ausnahme). Es wird nichts über den Aufruf
+# hinaus gespeichert, das erledigen die Caches dahinter.
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Führt fn pro Schlüssel höchstens einmal gleichzeitig aus und teilt das Ergebnis."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        """Ausgeführte Aufrufe und eingesparte (an laufende angehängte) Aufrufe."""
+        with self._lock:
+            return {"executed": self.executed, "saved": self.shared}
+
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+def get_group(name):
+    """Gemeinsame SingleFlight-Gruppe pro Name (z. B. "http", "images")."""
+    with _groups_lock:
+        group = _groups.get(name)
+        if group is None:
+            group = _groups[name] = SingleFlight(name)
+        return group
+
+
+def stats():
+    """Zähler aller Gruppen: {name: {"executed": ..., "saved": ...}}."""
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.stats() for group in groups}
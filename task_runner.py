@@ -0,0 +1,85 @@
+# task_runner.py
+# Blockierende Aufrufe (Netz, Datenbank, Indexaufbau) im Hintergrund ausführen
+#
+# TaskRunner.submit() startet eine Funktion im globalen QThreadPool und gibt
+# eine fortlaufende Anfrage-ID zurück. Das Ergebnis kommt per Signal im
+# GUI-Thread an. Jede Anfrage gehört zu einem Kanal (z. B. "card"); pro Kanal
+# zählt nur die neueste Anfrage. Ergebnisse älterer Anfragen werden verworfen,
+# eine neue Suche ersetzt also eine noch laufende.
+import traceback
+from itertools import count
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot
+
+
+class _TaskSignals(QObject):
+    finished = pyqtSignal(int, object)  # (anfrage_id, ergebnis)
+    failed = pyqtSignal(int, str)  # (anfrage_id, fehlermeldung)
+
+
+class _Task(QRunnable):
+    def __init__(self, request_id, fn, args, signals):
+        super().__init__()
+        self.request_id = request_id
+        self.fn = fn
+        self.args = args
+        self.signals = signals
+
+    def run(self):
+        try:
+            result = self.fn(*self.args)
+        except Exception as e:
+            print(f"[ERROR] Hintergrundaufgabe {self.request_id}: {e}\n{traceback.format_exc()}")
+            self.signals.failed.emit(self.request_id, str(e))
+            return
+        self.signals.finished.emit(self.request_id, result)
+
+
+class TaskRunner(QObject):
+    """Führt Funktionen im QThreadPool aus; pro Kanal wird nur das Ergebnis der neuesten Anfrage gemeldet."""
+
+    _ids = count(1)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._signals = _TaskSignals(self)
+        self._signals.finished.connect(self._on_finished)
+        self._signals.failed.connect(self._on_failed)
+        self._latest = {}
+        self._callbacks = {}
+
+    def submit(self, channel, fn, *args, on_done=None, on_error=None):
+        request_id = next(self._ids)
+        self._latest[channel] = request_id
+        self._callbacks[request_id] = (channel, on_done, on_error)
+        QThreadPool.globalInstance().start(_Task(request_id, fn, args, self._signals))
+        return request_id
+
+    def cancel(self, channel=None):
+        """Verwirft laufende Anfragen eines Kanals (ohne Kanal: alle)."""
+        if channel is None:
+            self._latest.clear()
+        else:
+            self._latest.pop(channel, None)
+
+    def is_current(self, request_id):
+        return request_id in self._latest.values()
+
+    def _take(self, request_id):
+        channel, on_done, on_error = self._callbacks.pop(request_id, (None, None, None))
+        if channel is None or self._latest.get(channel) != request_id:
+            print(f"[DEBUG] Veraltetes Ergebnis von Anfrage {request_id} ({channel}) verworfen")
+            return None, None
+        del self._latest[channel]
+        return on_done, on_error
+
+    @pyqtSlot(int, object)
+    def _on_finished(self, request_id, result):
+        on_done, _ = self._take(request_id)
+        if on_done:
+            on_done(result)
+
+    @pyqtSlot(int, str)
+    def _on_failed(self, request_id, message):
+        _, on_error = self._take(request_id)
+        if on_error:
+            on_error(message)
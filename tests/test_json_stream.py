@@ -0,0 +1,85 @@
+# test_json_stream.py
+# Streamender Leser für JSON-Arrays und collections.json
+import json
+import pytest
+import json_stream
+from json_stream import LazyCollectionsFile, MappedJson, iter_json_array
+
+ITEMS = [{"id": 1, "name": "Bolt", "text": "a, [b] {c}"}, {"id": 2, "name": "Ring \"x\""}, [1, 2], "s", 3, None]
+
+
+def write(tmp_path, text, name="data.json"):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_one_item_per_line(tmp_path):
+    # Scryfall-Bulk-Format: schneller Weg über die Zeilen
+    text = "[\n" + ",\n".join(json.dumps(item) for item in ITEMS) + "\n]\n"
+    assert list(iter_json_array(write(tmp_path, text))) == ITEMS
+
+
+def test_minified_without_line_breaks(tmp_path):
+    assert list(iter_json_array(write(tmp_path, json.dumps(ITEMS)))) == ITEMS
+
+
+def test_pretty_printed_falls_back_to_scanner(tmp_path):
+    assert list(iter_json_array(write(tmp_path, json.dumps(ITEMS, indent=2)))) == ITEMS
+
+
+def test_long_lines_fall_back_to_scanner(tmp_path, monkeypatch):
+    monkeypatch.setattr(json_stream, "_FAST_LINE_LIMIT", 8)
+    text = "[\n" + ",\n".join(json.dumps(item) for item in ITEMS) + "\n]"
+    assert list(iter_json_array(write(tmp_path, text))) == ITEMS
+
+
+def test_positions_point_behind_each_item(tmp_path):
+    text = json.dumps(ITEMS)
+    with MappedJson(write(tmp_path, text)) as data:
+        for item, end in data.iter_array():
+            assert text[:end].endswith(json.dumps(item))
+
+
+def test_array_under_key(tmp_path):
+    text = json.dumps({"version": 1, "skip": {"priceGuides": [0]}, "priceGuides": ITEMS, "after": []})
+    with MappedJson(write(tmp_path, text)) as data:
+        assert [item for item, _ in data.iter_array("priceGuides")] == ITEMS
+    with MappedJson(write(tmp_path, text)) as data:
+        assert list(data.iter_array("missing")) == []
+    with MappedJson(write(tmp_path, json.dumps(ITEMS))) as data:
+        assert [item for item, _ in data.iter_array("priceGuides")] == ITEMS
+
+
+@pytest.mark.parametrize("text", ["", "  \n", "[]", "[ \n ]"])
+def test_empty(tmp_path, text):
+    assert list(iter_json_array(write(tmp_path, text))) == []
+
+
+def test_not_a_list(tmp_path):
+    with pytest.raises(ValueError):
+        list(iter_json_array(write(tmp_path, '{"a": 1}')))
+
+
+def test_lazy_collections_file(tmp_path):
+    collections = [
+        {"name": "A", "color": "#111", "cards": [{"id": "x", "count": 2}, {"id": "y"}], "last_price_update": 5},
+        {"name": "B", "cards": []},
+        "kein Objekt",
+        {"name": "C"},
+    ]
+    path = write(tmp_path, json.dumps(collections, indent=1))
+    with LazyCollectionsFile(path) as lazy:
+        assert lazy.headers() == [
+            {"name": "A", "color": "#111", "last_price_update": 5, "card_count": 2},
+            {"name": "B", "card_count": 0},
+            {"name": "C", "card_count": 0},
+        ]
+        assert [(header["name"], list(cards)) for header, cards in lazy] == [
+            ("A", [{"id": "x", "count": 2}, {"id": "y"}]), ("B", []), ("C", []),
+        ]
+
+
+def test_lazy_collections_file_rejects_non_list(tmp_path):
+    with pytest.raises(ValueError):
+        LazyCollectionsFile(write(tmp_path, '{"name": "A"}'))
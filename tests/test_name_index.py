@@ -0,0 +1,71 @@
+# test_name_index.py
+# Bewertung und Vervollständigung im lokalen Namensindex
+from name_index import NameIndex, normalize_name, trigrams
+
+ENTRIES = [
+    ("Lightning Bolt", "Lightning Bolt", None),
+    ("Blitzschlag", "Lightning Bolt", "de"),
+    ("Lightning Helix", "Lightning Helix", None),
+    ("Chain Lightning", "Chain Lightning", None),
+    ("Bolt Bend", "Bolt Bend", None),
+    ("Æther Vial", "Aether Vial", None),
+    ("Éclair", "Lightning Bolt", "fr"),
+    ("Lightning Bolt", "Lightning Bolt", None),  # doppelt, wird übersprungen
+    ("", "Leer", None),
+]
+
+
+def test_normalize_name():
+    assert normalize_name("Æther Vial") == "aether vial"
+    assert normalize_name("Jötun Grunt") == "jotun grunt"
+    assert normalize_name("Straße") == "strasse"
+    assert normalize_name("  Fire // Ice! ") == "fire ice"
+
+
+def test_trigrams_are_padded():
+    assert trigrams("ab") == {"  a", " ab", "ab "}
+
+
+def test_duplicates_and_empty_names_are_skipped():
+    assert len(NameIndex(ENTRIES)) == 7
+
+
+def test_search_ranks_exact_then_prefix_then_similar():
+    index = NameIndex(ENTRIES)
+    results = index.search("lightning bolt")
+    assert results[0] == (1.0, "Lightning Bolt", "Lightning Bolt", None)
+    results = index.search("lightning")
+    assert [name for _, name, _, _ in results[:2]] == ["Lightning Bolt", "Lightning Helix"]
+    assert all(score >= 0.6 for score, _, _, _ in results[:2])
+    assert results[0][0] > results[2][0]
+
+
+def test_search_tolerates_typos_and_accents():
+    index = NameIndex(ENTRIES)
+    assert index.search("lightnig bolt")[0][1] == "Lightning Bolt"
+    assert index.search("aether vail")[0][1:] == ("Æther Vial", "Aether Vial", None)
+    assert index.search("eclair")[0][1:] == ("Éclair", "Lightning Bolt", "fr")
+    assert index.search("") == []
+    assert index.search("qqqq") == []
+
+
+def test_search_limit():
+    assert len(NameIndex(ENTRIES).search("lightning", limit=2)) == 2
+
+
+def test_complete_prefers_name_start_then_language_then_length():
+    index = NameIndex(ENTRIES)
+    assert index.complete("light") == ["Lightning Bolt", "Lightning Helix", "Chain Lightning"]
+    assert index.complete("bolt") == ["Bolt Bend", "Lightning Bolt"]
+    assert index.complete("b", lang="de")[0] == "Blitzschlag"
+    assert index.complete("b")[0] == "Bolt Bend"
+    assert index.complete("light", limit=1) == ["Lightning Bolt"]
+    assert index.complete("xyz") == []
+    assert index.complete("  ") == []
+
+
+def test_exact():
+    index = NameIndex(ENTRIES)
+    assert index.exact("blitzschlag") == ("Blitzschlag", "Lightning Bolt", "de")
+    assert index.exact("AETHER VIAL") == ("Æther Vial", "Aether Vial", None)
+    assert index.exact("lightning") is None
@@ -0,0 +1,115 @@
+# test_price_history.py
+# Anhängen, Ausdünnen und Lesen des Preisverlaufs
+import os
+import numpy as np
+import pytest
+from price_history import COLUMNS, DAY, RAW_RETENTION, DAILY_RETENTION, PriceHistory
+
+T0 = 1_700_000_000
+
+
+@pytest.fixture
+def history(tmp_path):
+    return PriceHistory(str(tmp_path / "history"))
+
+
+def test_record_skips_unchanged_prices(history):
+    assert history.record([("a", None, "1.00"), ("b", "foil", 2)], T0) == 2
+    assert history.record([("a", None, "1.00"), ("b", "foil", 2.5), ("", None, 9)], T0 + 10) == 1
+    assert history.point_count() == 3
+    assert history.series("a") == [(T0, 1.0)]
+    assert history.series("b", "foil") == [(T0, 2.0), (T0 + 10, 2.5)]
+    assert history.series("b") == []
+
+
+def test_record_cards_uses_variant_and_eur(history):
+    history.record_cards([{"id": "a", "variant": "etched", "eur": "3.10"}, {"id": None, "eur": 1}], T0)
+    assert history.series("a", "etched") == [(T0, 3.1)]
+    assert history.point_count() == 1
+
+
+def test_older_timestamp_is_appended_as_now(history):
+    history.record([("a", None, 1)], T0)
+    history.record([("a", None, 2)], T0 - 100)
+    assert history.series("a") == [(T0, 1.0), (T0, 2.0)]
+
+
+def test_series_range(history):
+    for day, price in enumerate((1, 2, 3)):
+        history.record([("a", None, price)], T0 + day * DAY)
+    assert history.series("a", start=T0 + DAY) == [(T0 + DAY, 2.0), (T0 + 2 * DAY, 3.0)]
+    assert history.series("a", end=T0 + DAY) == [(T0, 1.0), (T0 + DAY, 2.0)]
+
+
+def test_value_over_time(history):
+    history.record([("a", None, 1), ("b", None, 10)], T0)
+    history.record([("a", None, 2)], T0 + DAY)
+    history.record([("b", None, 5)], T0 + 2 * DAY)
+    values = history.value_over_time({("a", None): 3, ("b", "nonfoil"): 1, ("x", None): 5}, T0 - DAY, T0 + 2 * DAY)
+    assert values == [(T0 - DAY, 0.0), (T0, 13.0), (T0 + DAY, 16.0), (T0 + 2 * DAY, 11.0)]
+    assert history.value_over_time({("x", None): 1}, T0, T0 + DAY) == [(T0, 0.0), (T0 + DAY, 0.0)]
+
+
+def test_reopen_keeps_points_and_last_prices(tmp_path):
+    path = str(tmp_path / "history")
+    PriceHistory(path).record([("a", None, 1), ("b", None, 2)], T0)
+    history = PriceHistory(path)
+    assert history.record([("a", None, 1), ("b", None, 3)], T0 + 1) == 1
+    assert history.series("b") == [(T0, 2.0), (T0 + 1, 3.0)]
+
+
+def test_compact_thins_old_points(history):
+    now = T0 + DAILY_RETENTION + 30 * DAY
+    # Sehr alt: mehrere Tage einer Woche -> ein Punkt; älter als RAW_RETENTION: mehrere pro Tag -> einer
+    week_start = (T0 // (7 * DAY)) * 7 * DAY
+    for i, price in enumerate((1, 2, 3)):
+        history.record([("a", None, price)], week_start + i * DAY)
+    day_start = ((now - RAW_RETENTION - 5 * DAY) // DAY) * DAY
+    for i, price in enumerate((4, 5, 6)):
+        history.record([("a", None, price)], day_start + i * 3600)
+    recent = now - DAY
+    for i, price in enumerate((7, 8)):
+        history.record([("a", None, price)], recent + i)
+    assert history.compact(now) == 4
+    assert history.series("a") == [(week_start + 2 * DAY, 3.0), (day_start + 7200, 6.0), (recent, 7.0), (recent + 1, 8.0)]
+    assert history.compact(now) == 0
+    # prev wurde neu berechnet: der Wert über die Zeit bleibt stimmig
+    assert history.value_over_time({("a", None): 1}, now, now) == [(now, 8.0)]
+
+
+def test_compact_drops_unchanged_points(history):
+    now = T0 + RAW_RETENTION + 10 * DAY
+    history.record([("a", None, 1)], T0)
+    history.record([("a", None, 2)], T0 + 3600)
+    history.record([("a", None, 1)], T0 + DAY)
+    assert history.compact(now) == 1
+    assert history.series("a") == [(T0 + 3600, 2.0), (T0 + DAY, 1.0)]
+
+
+def test_recover_truncates_uneven_columns(tmp_path):
+    path = str(tmp_path / "history")
+    history = PriceHistory(path)
+    history.record([("a", None, 1)], T0)
+    history.record([("a", None, 2)], T0 + 1)
+    # Absturz mitten im Anhängen: nur die erste Spalte hat die neue Zeile
+    with open(history._column_file(COLUMNS[0][0]), "ab") as f:
+        f.write(np.array([T0 + 2], dtype=COLUMNS[0][1]).tobytes())
+    reopened = PriceHistory(path)
+    assert reopened.point_count() == 2
+    assert reopened.series("a") == [(T0, 1.0), (T0 + 1, 2.0)]
+
+
+def test_recover_finishes_interrupted_compact(tmp_path):
+    path = str(tmp_path / "history")
+    history = PriceHistory(path)
+    history.record([("a", None, 1)], T0)
+    history.record([("a", None, 2)], T0 + 1)
+    # Neue Spalten mit nur der zweiten Zeile liegen vollständig vor, umbenannt wurde noch nicht
+    ts, sid, cents, prev = (np.array(column) for column in history._columns())
+    for (name, dtype), column in zip(COLUMNS, (ts[1:], sid[1:], cents[1:], np.zeros(1))):
+        with open(history._column_file(name) + ".new", "wb") as f:
+            f.write(column.astype(dtype).tobytes())
+    open(os.path.join(path, "compacting"), "w").close()
+    reopened = PriceHistory(path)
+    assert reopened.series("a") == [(T0 + 1, 2.0)]
+    assert not os.path.exists(os.path.join(path, "compacting"))
@@ -0,0 +1,110 @@
+# test_query_engine.py
+# Parser und Auswertung der lokalen Scryfall-Suche
+import pytest
+from query_engine import CardIndex, QueryError, parse
+
+CARDS = [
+    {"name": "Lightning Bolt", "type_line": "Instant", "oracle_text": "Lightning Bolt deals 3 damage to any target.",
+     "colors": ["R"], "color_identity": ["R"], "cmc": 1.0, "rarity": "common", "set": "lea", "lang": "en",
+     "oracle_id": "o-bolt", "finishes": ["nonfoil"], "prices": {"eur": "2.50", "usd": "3.00"},
+     "released_at": "1993-08-05"},
+    {"name": "Lightning Bolt", "printed_name": "Blitzschlag", "type_line": "Instant",
+     "oracle_text": "Lightning Bolt deals 3 damage to any target.", "colors": ["R"], "color_identity": ["R"],
+     "cmc": 1.0, "rarity": "uncommon", "set": "m10", "lang": "de", "oracle_id": "o-bolt",
+     "finishes": ["nonfoil", "foil"], "prices": {"eur": "1.00"}, "released_at": "2009-07-17"},
+    {"name": "Boros Charm", "type_line": "Instant", "oracle_text": "Choose one — Boros Charm deals 4 damage to target player.",
+     "colors": ["R", "W"], "color_identity": ["R", "W"], "cmc": 2.0, "rarity": "uncommon", "set": "gtc",
+     "lang": "en", "oracle_id": "o-charm", "finishes": ["nonfoil"], "prices": {"eur": "0.80"}},
+    {"name": "Grizzly Bears", "type_line": "Creature — Bear", "oracle_text": "",
+     "colors": ["G"], "color_identity": ["G"], "cmc": 2.0, "rarity": "common", "set": "lea", "lang": "en",
+     "oracle_id": "o-bears", "finishes": ["nonfoil"], "prices": {}},
+    {"name": "Sol Ring", "type_line": "Artifact", "oracle_text": "{T}: Add {C}{C}.", "colors": [],
+     "color_identity": [], "cmc": 1.0, "rarity": "uncommon", "set": "lea", "lang": "en",
+     "oracle_id": "o-ring", "finishes": ["nonfoil"], "prices": {"eur": "40"}},
+]
+
+
+@pytest.fixture
+def index():
+    return CardIndex((i, card) for i, card in enumerate(CARDS))
+
+
+def names(index, query, **kwargs):
+    return [CARDS[i]["printed_name"] if CARDS[i].get("printed_name") else CARDS[i]["name"]
+            for i in index.search(query, **kwargs)]
+
+
+# --- Parser ---
+def test_parse_implicit_and_or_and_not():
+    tree = parse('bolt or (t:instant -c:r)')
+    assert tree == ("or", [
+        ("term", None, None, "bolt", False),
+        ("and", [("term", "t", ":", "instant", False), ("not", ("term", "c", ":", "r", False))]),
+    ])
+
+
+def test_parse_quoted_and_exact():
+    assert parse('!"Lightning Bolt"') == ("term", None, None, "Lightning Bolt", True)
+    assert parse('o:"any target"') == ("term", "o", ":", "any target", False)
+    assert parse("cmc>=2") == ("term", "cmc", ">=", "2", False)
+
+
+@pytest.mark.parametrize("query", ["", "(bolt", "bolt)", "bolt or", "()"])
+def test_parse_errors(query):
+    with pytest.raises(QueryError):
+        parse(query)
+
+
+# --- Auswertung ---
+def test_sorted_by_name_english_first(index):
+    assert names(index, "t:instant") == ["Boros Charm", "Lightning Bolt", "Blitzschlag"]
+
+
+def test_partial_words_and_printed_names(index):
+    assert names(index, "bol") == ["Lightning Bolt", "Blitzschlag"]
+    assert names(index, "ol") == ["Lightning Bolt", "Blitzschlag", "Sol Ring"]
+    assert names(index, "blitz") == ["Blitzschlag"]
+    assert names(index, "zzl") == ["Grizzly Bears"]
+    assert names(index, "xyz") == []
+
+
+def test_exact_name_and_phrases(index):
+    assert names(index, '!"lightning bolt"') == ["Lightning Bolt", "Blitzschlag"]
+    assert names(index, '!"bolt"') == []
+    assert names(index, 'o:"any target"') == ["Lightning Bolt", "Blitzschlag"]
+    assert names(index, 'o:"target player"') == ["Boros Charm"]
+
+
+def test_colors(index):
+    assert names(index, "c:r") == ["Boros Charm", "Lightning Bolt", "Blitzschlag"]
+    assert names(index, "c=r") == ["Lightning Bolt", "Blitzschlag"]
+    assert names(index, "c:m") == ["Boros Charm"]
+    assert names(index, "c:c") == ["Sol Ring"]
+    assert names(index, "id:boros") == ["Boros Charm", "Lightning Bolt", "Blitzschlag", "Sol Ring"]
+    assert names(index, "c>=2") == ["Boros Charm"]
+
+
+def test_numbers_and_rarity(index):
+    assert names(index, "cmc>=2") == ["Boros Charm", "Grizzly Bears"]
+    assert names(index, "eur<1") == ["Boros Charm"]
+    assert names(index, "usd>0") == ["Lightning Bolt"]
+    assert names(index, "r>=uncommon") == ["Boros Charm", "Blitzschlag", "Sol Ring"]
+
+
+def test_terms_and_negation(index):
+    assert names(index, "s:lea -t:creature") == ["Lightning Bolt", "Sol Ring"]
+    assert names(index, "lang:de") == ["Blitzschlag"]
+    assert names(index, "is:foil") == ["Blitzschlag"]
+    assert names(index, "-is:foil bolt") == ["Lightning Bolt"]
+    assert names(index, "oracleid:o-bears or sol") == ["Grizzly Bears", "Sol Ring"]
+
+
+def test_unique_and_limit(index):
+    assert names(index, "c:r", unique=True) == ["Boros Charm", "Lightning Bolt"]
+    assert names(index, "c:r", limit=1) == ["Boros Charm"]
+
+
+@pytest.mark.parametrize("query", ["foo:bar", "c:xyz", "cmc:abc", "r:legendary", "t>instant"])
+def test_unknown_syntax_raises(index, query):
+    with pytest.raises(QueryError):
+        index.search(query)
@@ -10,12 +10,20 @@ from PyQt6.QtWidgets import (
 )
 from dialogs import VariantSelector  # Dialog zum Auswählen von Kartenvarianten
 from utils import get_cached_image   # Hilfsfunktion zum Laden/Cachen von Kartenbildern
+from collection_store import get_store  # Zugriff auf die gespeicherten Sammlungen
+from card_db import get_card_db      # Lokale Scryfall-Kartendatenbank
+from set_catalog import set_size as set_size_for  # Set-Größen aus dem lokalen Set-Katalog
 from PyQt6.QtGui import QPixmap      # Für Bilder
-from PyQt6.QtCore import Qt         # Für Ausrichtungen und Flags
+from PyQt6.QtCore import Qt, QTimer  # Für Ausrichtungen/Flags und den schrittweisen Listenaufbau
 import os
 import json
+from itertools import islice
 from urllib.parse import quote       # Für evtl. URL-Encoding
 
+# Kartenzeilen, die beim Öffnen sofort gebaut werden; der Rest folgt in Häppchen
+FIRST_ROWS = 12
+ROW_BATCH_SIZE = 8
+
 
 
 ##
@@ -109,27 +117,10 @@ class CollectionViewer(QWidget):
             reply = QMessageBox.question(self, "Karte löschen", f"Möchtest du '{card_name}' wirklich aus der Sammlung entfernen?", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
             if reply == QMessageBox.StandardButton.Yes:
                 try:
-                    with open("collections.json", "r", encoding="utf-8") as f:
-                        collections = json.load(f)
-                    for c in collections:
-                        if c['name'] == self.collection['name']:
-                            print(f"[DEBUG] Karten vor dem Löschen: {len(c['cards'])}")
-                            for idx_del, card_entry in enumerate(c['cards']):
-                                if isinstance(card_entry, dict) and all(card_entry.get(k) == card_obj.get(k) for k in ['id', 'lang', 'is_proxy', 'collector_number', 'set_code']):
-                                    del c['cards'][idx_del]
-                                    print(f"[DEBUG] Karte entfernt an Index {idx_del}")
-                                    break
-                            print(f"[DEBUG] Karten nach dem Löschen: {len(c['cards'])}")
-                            break
-                    with open("collections.json", "w", encoding="utf-8") as f:
-                        json.dump(collections, f, indent=2, ensure_ascii=False)
-                    print("[DEBUG] collections.json wurde aktualisiert.")
+                    get_store().delete_card(card_obj.get('entry_id'))
+                    print(f"[DEBUG] Karteneintrag {card_obj.get('entry_id')} entfernt.")
                     # Nach dem Löschen: Ansicht neu laden
-                    updated_collection = None
-                    for c in collections:
-                        if c['name'] == self.collection['name']:
-                            updated_collection = c
-                            break
+                    updated_collection = get_store().get_collection(self.collection['name'])
                     stack = self.stack_widget or find_parent_with_attr(self, widget_type=QStackedWidget)
                     if stack and updated_collection:
                         idx = stack.indexOf(self)
@@ -146,6 +137,8 @@ class CollectionViewer(QWidget):
             from PyQt6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QCheckBox, QPushButton, QMessageBox
             from PyQt6.QtCore import QTimer
             from PyQt6.QtGui import QPixmap
+            # Arbeitskopie: der Eintrag gehört dem gemeinsamen Store-Cache und wird erst beim Speichern geändert
+            card_obj = dict(card_obj)
             # Bild vorab cachen
             def pre_cache_image(card_data):
                 if card_data.get("card_faces") and isinstance(card_data["card_faces"], list):
@@ -227,16 +220,9 @@ class CollectionViewer(QWidget):
                 collector_number = card.get('collector_number', '')
                 # Versuche set_size nachzuladen, falls nicht vorhanden
                 if (not set_size or set_size == '?') and set_code:
-                    try:
-                        import requests
-                        set_api_url = f"https://api.scryfall.com/sets/{set_code}"
-                        resp = requests.get(set_api_url, timeout=3)
-                        if resp.status_code == 200:
-                            set_data = resp.json()
-                            set_size = set_data.get("card_count", '')
-                            card['set_size'] = set_size
-                    except Exception:
-                        set_size = ''
+                    set_size = set_size_for(set_code, '')
+                    if set_size:
+                        card['set_size'] = set_size
                 info_line = []
                 if mana_cost_clean:
                     info_line.append(f"Manakosten: {mana_cost_clean}")
@@ -424,8 +410,8 @@ class CollectionViewer(QWidget):
             edit_dialog.setLayout(layout)
 
             # --- Dynamik: Felder aktualisieren bei Variantenwahl ---
-            # Merke die ursprünglichen Identifikationsdaten der Karte
-            original_keys = {k: card_obj.get(k) for k in ['id', 'lang', 'is_proxy', 'collector_number', 'set_code']}
+            # Merke den Datenbank-Eintrag der Karte (update_fields ersetzt den Inhalt von card_obj)
+            entry_id = card_obj.get('entry_id')
 
 
             def update_fields(new_card):
@@ -435,15 +421,9 @@ class CollectionViewer(QWidget):
                     new_card['set_code'] = new_card['set']
                 # set_size ggf. nachladen
                 if not new_card.get('set_size') and new_card.get('set_code'):
-                    try:
-                        import requests
-                        set_api_url = f"https://api.scryfall.com/sets/{new_card.get('set_code')}"
-                        resp = requests.get(set_api_url, timeout=3)
-                        if resp.status_code == 200:
-                            set_data = resp.json()
-                            new_card['set_size'] = set_data.get("card_count", '')
-                    except Exception:
-                        pass
+                    set_size = set_size_for(new_card.get('set_code'))
+                    if set_size:
+                        new_card['set_size'] = set_size
                 # Marktwert (eur) aus prices['eur'] übernehmen, falls vorhanden
                 if 'prices' in new_card and isinstance(new_card['prices'], dict):
                     eur_val = new_card['prices'].get('eur')
@@ -513,48 +493,34 @@ class CollectionViewer(QWidget):
 
             def save_changes():
                 try:
-                    with open("collections.json", "r", encoding="utf-8") as f:
-                        collections = json.load(f)
-                    for c in collections:
-                        if c['name'] == self.collection['name']:
-                            for idx_card, card in enumerate(c['cards']):
-                                if isinstance(card, dict) and all(card.get(k) == original_keys.get(k) for k in ['id', 'lang', 'is_proxy', 'collector_number', 'set_code']):
-                                    # Übernehme alle Felder aus card_obj (nach Variantenwahl und Edit)
-                                    new_card = dict(card_obj)
-                                    new_card['lang'] = lang_combo.currentText()
-                                    new_card['is_proxy'] = proxy_checkbox.isChecked()
-                                    # Speichere die gewählte Variante
-                                    variant_key, variant_price = foil_combo.currentData()
-                                    new_card['variant'] = variant_key
-                                    # Setze den Marktwert (eur) auf den Preis der gewählten Variante
-                                    if variant_price not in (None, '', '0', 0):
-                                        new_card['eur'] = variant_price
-                                    else:
-                                        new_card['eur'] = ''
-                                    try:
-                                        new_card['purchase_price'] = float(price_edit.text().replace(",", "."))
-                                    except Exception:
-                                        new_card['purchase_price'] = price_edit.text()
-                                    # Speichere die Stückzahl
-                                    try:
-                                        count_val = int(count_edit.text())
-                                        if count_val < 1:
-                                            count_val = 1
-                                    except Exception:
-                                        count_val = 1
-                                    new_card['count'] = count_val
-                                    c['cards'][idx_card] = new_card
-                                    break
-                            break
-                    with open("collections.json", "w", encoding="utf-8") as f:
-                        json.dump(collections, f, indent=2, ensure_ascii=False)
+                    # Übernehme alle Felder aus card_obj (nach Variantenwahl und Edit)
+                    new_card = dict(card_obj)
+                    new_card['lang'] = lang_combo.currentText()
+                    new_card['is_proxy'] = proxy_checkbox.isChecked()
+                    # Speichere die gewählte Variante
+                    variant_key, variant_price = foil_combo.currentData()
+                    new_card['variant'] = variant_key
+                    # Setze den Marktwert (eur) auf den Preis der gewählten Variante
+                    if variant_price not in (None, '', '0', 0):
+                        new_card['eur'] = variant_price
+                    else:
+                        new_card['eur'] = ''
+                    try:
+                        new_card['purchase_price'] = float(price_edit.text().replace(",", "."))
+                    except Exception:
+                        new_card['purchase_price'] = price_edit.text()
+                    # Speichere die Stückzahl
+                    try:
+                        count_val = int(count_edit.text())
+                        if count_val < 1:
+                            count_val = 1
+                    except Exception:
+                        count_val = 1
+                    new_card['count'] = count_val
+                    get_store().update_card(entry_id, new_card)
                     edit_dialog.accept()
                     # Nach dem Editieren: Ansicht neu laden
-                    updated_collection = None
-                    for c in collections:
-                        if c['name'] == self.collection['name']:
-                            updated_collection = c
-                            break
+                    updated_collection = get_store().get_collection(self.collection['name'])
                     stack = self.stack_widget or find_parent_with_attr(self, widget_type=QStackedWidget)
                     if stack and updated_collection:
                         idx = stack.indexOf(self)
@@ -570,7 +536,13 @@ class CollectionViewer(QWidget):
             edit_dialog.exec()
 
         # Komplette Kartenlisten-Logik wie im Original (inkl. Buttons, Oracle-Text, Trennlinien)
-        for idx, card in enumerate(cards):
+        def build_row(idx, card):
+            if idx > 0:
+                line = QFrame()
+                line.setFrameShape(QFrame.Shape.HLine)
+                line.setFrameShadow(QFrame.Shadow.Sunken)
+                line.setStyleSheet("color: #444;")
+                grid.addWidget(line)
             group = QGroupBox()
             group.setStyleSheet("QGroupBox { border: 1px solid #444; border-radius: 6px; margin-top: 8px; margin-bottom: 8px; padding: 8px; }")
             hbox = QHBoxLayout()
@@ -791,12 +763,26 @@ class CollectionViewer(QWidget):
             hbox.addWidget(info_widget, 1)
             group.setLayout(hbox)
             grid.addWidget(group)
-            if idx < len(cards) - 1:
-                line = QFrame()
-                line.setFrameShape(QFrame.Shape.HLine)
-                line.setFrameShadow(QFrame.Shadow.Sunken)
-                line.setStyleSheet("color: #444;")
-                grid.addWidget(line)
+
+        # Die ersten Zeilen sofort bauen, den Rest häppchenweise über die Event-Loop,
+        # damit die Sammlung sofort sichtbar und bedienbar ist
+        rows = enumerate(cards)
+        def build_batch(size=ROW_BATCH_SIZE):
+            built = 0
+            for idx, card in islice(rows, size):
+                build_row(idx, card)
+                built += 1
+            if built < size:
+                self._row_timer.stop()
+                self._pending_rows = None
+        if not hasattr(self, '_row_timer'):
+            self._row_timer = QTimer(self)
+            self._row_timer.setInterval(0)
+            self._row_timer.timeout.connect(lambda: self._pending_rows and self._pending_rows())
+        self._pending_rows = build_batch
+        build_batch(FIRST_ROWS)
+        if self._pending_rows:
+            self._row_timer.start()
     def _refresh_card_list(self):
         print("[DEBUG] _refresh_card_list aufgerufen")
         # Diese Methode baut die Kartenliste nach Filter/Sortierung neu auf
@@ -843,7 +829,7 @@ class CollectionViewer(QWidget):
         Öffnet einen Dialog, in den der Nutzer eine Deckliste (Text) einfügen kann. Importiert Karten per Scryfall.
         """
         from PyQt6.QtWidgets import QDialog, QVBoxLayout, QTextEdit, QPushButton, QMessageBox, QLabel
-        import requests
+        import http_client
         import re
         dlg = QDialog(self)
         dlg.setWindowTitle("Deck importieren")
@@ -880,27 +866,37 @@ class CollectionViewer(QWidget):
                     name = rest
                     set_code = None
                     collector_number = None
-                try:
-                    if set_code and collector_number:
-                        scry_url = f"https://api.scryfall.com/cards/{set_code.lower()}/{collector_number}"
-                        scry_resp = requests.get(scry_url, timeout=6)
-                        if scry_resp.status_code != 200:
-                            scry_url = f"https://api.scryfall.com/cards/named?exact={requests.utils.quote(name)}"
-                            scry_resp = requests.get(scry_url, timeout=6)
-                    elif set_code:
-                        scry_url = f"https://api.scryfall.com/cards/named?exact={requests.utils.quote(name)}&set={set_code.lower()}"
-                        scry_resp = requests.get(scry_url, timeout=6)
+                # Zuerst lokal nachschlagen (gleiche Reihenfolge wie unten bei Scryfall)
+                card_db = get_card_db()
+                scry_card = None
+                if set_code and collector_number:
+                    scry_card = card_db.by_set_number(set_code, collector_number)
+                if not scry_card and set_code:
+                    scry_card = card_db.named(name, set_code)
+                if not scry_card:
+                    scry_card = card_db.named(name)
+                if not scry_card:
+                    try:
+                        if set_code and collector_number:
+                            scry_url = f"https://api.scryfall.com/cards/{set_code.lower()}/{collector_number}"
+                            scry_resp = http_client.get(scry_url, timeout=6)
+                            if scry_resp.status_code != 200:
+                                scry_url = f"https://api.scryfall.com/cards/named?exact={quote(name)}"
+                                scry_resp = http_client.get(scry_url, timeout=6)
+                        elif set_code:
+                            scry_url = f"https://api.scryfall.com/cards/named?exact={quote(name)}&set={set_code.lower()}"
+                            scry_resp = http_client.get(scry_url, timeout=6)
+                            if scry_resp.status_code != 200:
+                                scry_url = f"https://api.scryfall.com/cards/named?exact={quote(name)}"
+                                scry_resp = http_client.get(scry_url, timeout=6)
+                        else:
+                            scry_url = f"https://api.scryfall.com/cards/named?exact={quote(name)}"
+                            scry_resp = http_client.get(scry_url, timeout=6)
                         if scry_resp.status_code != 200:
-                            scry_url = f"https://api.scryfall.com/cards/named?exact={requests.utils.quote(name)}"
-                            scry_resp = requests.get(scry_url, timeout=6)
-                    else:
-                        scry_url = f"https://api.scryfall.com/cards/named?exact={requests.utils.quote(name)}"
-                        scry_resp = requests.get(scry_url, timeout=6)
-                    if scry_resp.status_code != 200:
+                            continue
+                        scry_card = scry_resp.json()
+                    except Exception:
                         continue
-                    scry_card = scry_resp.json()
-                except Exception:
-                    continue
                 variant = 'nonfoil'
                 if scry_card.get('foil') and not scry_card.get('nonfoil'):
                     variant = 'foil'
@@ -925,14 +921,7 @@ class CollectionViewer(QWidget):
                 set_code_val = scry_card.get("set") or scry_card.get("set_code") or scry_card.get("set_id")
                 set_size = scry_card.get("set_size")
                 if not set_size and set_code_val:
-                    try:
-                        set_api_url = f"https://api.scryfall.com/sets/{set_code_val}"
-                        resp = requests.get(set_api_url, timeout=3)
-                        if resp.status_code == 200:
-                            set_data = resp.json()
-                            set_size = set_data.get("card_count")
-                    except Exception:
-                        set_size = None
+                    set_size = set_size_for(set_code_val)
                 eur_value = scry_card.get("prices", {}).get("eur")
                 # Build normalized card entry (mit count)
                 card_entry = dict(scry_card)
@@ -951,38 +940,27 @@ class CollectionViewer(QWidget):
                 QMessageBox.warning(dlg, "Fehler", "Keine Karten im Text gefunden oder alle Karten konnten nicht erkannt werden.")
                 return
             try:
-                with open("collections.json", "r", encoding="utf-8") as f:
-                    collections = json.load(f)
-                for c in collections:
-                    if c["name"] == self.collection["name"]:
-                        # --- Karten zusammenfassen: gleiche Karte = gleicher Name, Edition, Sprache, Foil, Zustand, Collector Number, etc. ---
-                        def card_key(card):
-                            return (
-                                card.get('name'), card.get('set_code'), card.get('lang'), card.get('variant'),
-                                card.get('collector_number'), card.get('is_proxy'), card.get('purchase_price'), card.get('eur')
-                            )
-                        card_map = {}
-                        # Bestehende Karten übernehmen
-                        for card in c["cards"]:
-                            k = card_key(card)
-                            if k in card_map:
-                                card_map[k]["count"] += card.get("count", 1)
-                            else:
-                                card_map[k] = dict(card)
-                                if "count" not in card_map[k]:
-                                    card_map[k]["count"] = 1
-                        # Importierte Karten einfügen
-                        for card in imported_cards:
-                            k = card_key(card)
-                            if k in card_map:
-                                card_map[k]["count"] += card.get("count", 1)
-                            else:
-                                card_map[k] = dict(card)
-                        # Neue Kartenliste zurückschreiben
-                        c["cards"] = list(card_map.values())
-                        break
-                with open("collections.json", "w", encoding="utf-8") as f:
-                    json.dump(collections, f, indent=2, ensure_ascii=False)
+                store = get_store()
+                # --- Karten zusammenfassen: gleiche Karte = gleicher Name, Edition, Sprache, Foil, Zustand, Collector Number, etc. ---
+                def card_key(card):
+                    return (
+                        card.get('name'), card.get('set_code'), card.get('lang'), card.get('variant'),
+                        card.get('collector_number'), card.get('is_proxy'), card.get('purchase_price'), card.get('eur')
+                    )
+                existing = store.get_collection(self.collection["name"]) or {"cards": []}
+                card_map = {card_key(card): card for card in existing["cards"]}
+                # Alle Importzeilen in einer Transaktion schreiben
+                with store.transaction():
+                    for card in imported_cards:
+                        k = card_key(card)
+                        if k in card_map:
+                            # Vorhandenen Eintrag hochzählen statt neu anzulegen
+                            target = card_map[k]
+                            target["count"] = int(target.get("count", 1) or 1) + card.get("count", 1)
+                            store.update_card(target["entry_id"], target)
+                        else:
+                            store.add_card(self.collection["name"], card)
+                            card_map[k] = card
                 QMessageBox.information(dlg, "Import erfolgreich", f"{sum(card.get('count',1) for card in imported_cards)} Karten wurden importiert.")
                 dlg.accept()
                 # Ansicht neu laden
@@ -1003,23 +981,12 @@ class CollectionViewer(QWidget):
     def __init__(self, collection_data, return_to_menu, stack_widget=None, scroll_value=None):
         super().__init__()
         # --- Sammlung laden ---
-        # Die Sammlung wird immer frisch aus der Datei geladen, damit Änderungen (z.B. Bild, Name) sofort sichtbar sind.
+        # Die Sammlung wird immer frisch aus dem Store geladen, damit Änderungen (z.B. Bild, Name) sofort sichtbar sind.
         self.collection = None
         if isinstance(collection_data, dict) and 'name' in collection_data:
             collection_name = collection_data['name']
             try:
-                if os.path.exists("collections.json"):
-                    with open("collections.json", "r", encoding="utf-8") as f:
-                        collections = json.load(f)
-                    # Suche die Sammlung mit passendem Namen
-                    for c in collections:
-                        if c['name'] == collection_name:
-                            self.collection = c
-                            break
-                    else:
-                        self.collection = collection_data
-                else:
-                    self.collection = collection_data
+                self.collection = get_store().get_collection(collection_name) or collection_data
             except Exception as e:
                 QMessageBox.critical(self, "Fehler", f"Fehler beim Laden der Sammlung: {e}")
                 self.collection = collection_data
@@ -1368,7 +1335,6 @@ class CollectionViewer(QWidget):
             # Funktion zum Öffnen des Editier-Dialogs für eine Karte
             # Hier kann man Sprache, Proxy-Status und Variante ändern
             def open_edit_dialog(card_obj):
-                import requests
                 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QCheckBox, QPushButton, QMessageBox
                 import copy
                 from PyQt6.QtGui import QPixmap
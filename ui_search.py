@@ -2,12 +2,29 @@
 # Such- und Kartenanzeige-UI
 import os
 import json
-import requests
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QScrollArea, QLabel, QComboBox, QCheckBox, QMessageBox, QFrame, QSizePolicy
+import http_client
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QCompleter, QPushButton, QScrollArea, QLabel, QComboBox, QCheckBox, QMessageBox, QFrame, QSizePolicy
 from PyQt6.QtGui import QPixmap
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer, QStringListModel
 from dialogs import CardSelectorDialog, VariantSelector
 from utils import get_cached_image
+from collection_store import get_store
+from card_db import get_card_db
+from set_catalog import set_size as set_size_for
+from name_index import get_name_index, peek_name_index, warm_name_index
+from query_engine import search_cards, warm_query_index, QueryError
+from oracle_index import get_oracle_index
+from task_runner import TaskRunner
+
+# Lokale Fuzzy-Suche: Mindestscore, Anzahl Vorschläge im Auswahl-Dialog sowie Score
+# und Vorsprung, ab denen der beste Treffer ohne Nachfrage angezeigt wird
+FUZZY_MIN_SCORE = 0.45
+FUZZY_CHOICES = 12
+FUZZY_DIRECT_SCORE = 0.75
+FUZZY_CLEAR_LEAD = 0.15
+# Autovervollständigung: ab wie vielen Zeichen und wie viele Vorschläge
+COMPLETER_MIN_CHARS = 2
+COMPLETER_CHOICES = 15
 
 
 
@@ -19,9 +36,11 @@ class MTGDesktopManager(QWidget):
         super().__init__()
         self.setWindowTitle("MTG Desktop Manager")
         self.setStyleSheet("background-color: #1e1e1e; color: white; font-size: 14px;")
-        self.init_ui()
         self.current_card_data = None
         self.current_language = 'en'
+        # Netzwerk- und Indexzugriffe laufen im Hintergrund, Ergebnisse kommen per Signal
+        self.tasks = TaskRunner(self)
+        self.init_ui()
 
     def init_ui(self):
         top_bar = QHBoxLayout()
@@ -36,9 +55,24 @@ class MTGDesktopManager(QWidget):
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Kartennamen eingeben (auch Teil möglich)...")
         self.search_input.setStyleSheet("background-color: #2e2e2e; color: white; padding: 7px; font-size: 18px; font-weight: 600;")
-        self.search_input.returnPressed.connect(self.search_card)
+        self.search_input.returnPressed.connect(self.on_search_return)
         search_layout.addWidget(self.search_input)
 
+        # Vorschläge kommen aus dem lokalen Namensindex, gefiltert wird dort (nicht im QCompleter)
+        self.completer_model = QStringListModel(self)
+        self.completer = QCompleter(self.completer_model, self)
+        self.completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.completer.setMaxVisibleItems(COMPLETER_CHOICES)
+        self.completer.popup().setStyleSheet("background-color: #2e2e2e; color: white; font-size: 16px;")
+        self.completer.activated.connect(self.on_completion_activated)
+        self.search_input.setCompleter(self.completer)
+        self.search_input.textEdited.connect(self.update_completions)
+        self._completion_search = False
+        warm_name_index()
+        warm_query_index()
+        get_oracle_index().warm()
+
         search_button = QPushButton("Suchen")
         search_button.setStyleSheet("font-size: 18px; font-weight: 600; padding: 8px 24px;")
         search_button.clicked.connect(self.search_card)
@@ -94,39 +128,137 @@ class MTGDesktopManager(QWidget):
                 layout.deleteLater()
 
     def clear_all(self):
+        self.tasks.cancel()
         self.search_input.clear()
         self.clear_result_area()
         self.current_card_data = None
         self.language_toggle_button.setVisible(False)
         self.variant_button.setVisible(False)
 
+    def update_completions(self, text):
+        text = text.strip()
+        if len(text) < COMPLETER_MIN_CHARS:
+            self.completer_model.setStringList([])
+            return
+        # Bei deutscher Anzeige deutsche Namen zuerst vorschlagen
+        lang = 'de' if self.current_language == 'de' else None
+        # Nie auf den Indexbau warten: bis er fertig ist, gibt es den alten bzw. keine Vorschläge
+        index = peek_name_index()
+        self.completer_model.setStringList(index.complete(text, COMPLETER_CHOICES, lang) if index else [])
+
+    def on_completion_activated(self, text):
+        # Enter im Popup löst zusätzlich returnPressed aus; die Suche soll nur einmal laufen
+        self.search_input.setText(text)
+        self._completion_search = True
+        QTimer.singleShot(0, self.reset_completion_search)
+        self.search_card()
+
+    def reset_completion_search(self):
+        self._completion_search = False
+
+    def on_search_return(self):
+        if self._completion_search:
+            return
+        self.search_card()
+
+    def show_status(self, text):
+        # Zwischenstand im Ergebnisbereich ("Suche läuft ...", "Nichts gefunden")
+        self.clear_result_area()
+        status = QLabel(text)
+        status.setStyleSheet("font-size: 18px; color: #b0b0b0; padding: 24px;")
+        status.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.result_area.addWidget(status)
+
     def search_card(self):
         card_name = self.search_input.text().strip()
         if not card_name:
             return
-
-        self.clear_result_area()
+        # Netz und lokale Indizes im Hintergrund; eine neue Suche ersetzt eine laufende
+        self.show_status(f"Suche nach „{card_name}“ ...")
+        self.language_toggle_button.setVisible(False)
+        self.variant_button.setVisible(False)
+        self.tasks.cancel("language")
+        self.tasks.cancel("assets")
+        self.tasks.submit(
+            "card", self.resolve_search, card_name,
+            on_done=self.on_search_result,
+            on_error=lambda message: self.show_status(f"Fehler bei der Suche: {message}"),
+        )
+
+    def resolve_search(self, card_name):
+        """Läuft im Hintergrund. Ergebnis: ("card", karte), ("choices", karten) oder ("none", None)."""
+        # Exakter Treffer in der lokalen Kartendatenbank spart den Netzwerkaufruf
+        local_card = get_card_db().named(card_name)
+        if local_card:
+            return "card", local_card
+
+        # Lokaler Fuzzy-Index: eindeutiger Treffer wird direkt angezeigt, sonst Auswahl-Dialog.
+        # Ohne Spiegel kennt der Index nur eigene Karten; nicht besessene Karten wären
+        # sonst per Teilname nicht mehr zu finden.
+        if get_card_db().available():
+            matches = [m for m in get_name_index().search(card_name, FUZZY_CHOICES) if m[0] >= FUZZY_MIN_SCORE]
+            local_cards = self.local_cards_for_matches(matches)
+            if local_cards:
+                clear_lead = len(local_cards) == 1 or matches[0][0] - matches[1][0] >= FUZZY_CLEAR_LEAD
+                if matches[0][0] >= FUZZY_DIRECT_SCORE and clear_lead:
+                    return "card", local_cards[0]
+                return "choices", local_cards
+
+        # Suchsyntax (t:, o:, c:, ...) lokal auswerten, wie /cards/search?unique=cards.
+        # Nur gegen den Spiegel: die eigenen Sammlungen allein sind keine vollständige Antwort.
+        if get_card_db().available():
+            try:
+                local_results = search_cards(card_name, unique=True, owned=False)
+            except QueryError as e:
+                print(f"[DEBUG] Lokale Suche nicht möglich ({e}), frage Scryfall")
+                local_results = []
+            if len(local_results) == 1:
+                return "card", local_results[0]
+            if local_results:
+                return "choices", local_results
 
         direct_url = f"https://api.scryfall.com/cards/named?fuzzy={card_name}"
-        response = requests.get(direct_url)
-
+        response = http_client.get(direct_url)
         if response.status_code == 200:
-            self.current_card_data = response.json()
-            print(f"DEBUG: Direct search result: {self.current_card_data}")  # Debugging
-            self.current_language = self.current_card_data.get('lang', 'en')
-            self.search_input.setText(self.current_card_data.get("name", card_name))
-            self.load_selected_card(self.current_card_data)
-            return
+            card = response.json()
+            print(f"DEBUG: Direct search result: {card}")  # Debugging
+            return "card", card
 
         search_url = f"https://api.scryfall.com/cards/search?q={card_name}&unique=cards"
-        search_response = requests.get(search_url)
+        search_response = http_client.get(search_url)
         if search_response.status_code == 200:
             data = search_response.json()
             print(f"DEBUG: Search results: {data}")  # Debugging
             if data.get("total_cards", 0) > 1:
-                dialog = CardSelectorDialog(data["data"], self.load_selected_card)
-                dialog.exec()
-                return
+                return "choices", data["data"]
+        return "none", None
+
+    def on_search_result(self, result):
+        kind, payload = result
+        if kind == "card":
+            self.load_selected_card(payload)
+        elif kind == "choices":
+            self.clear_result_area()
+            dialog = CardSelectorDialog(payload, self.load_selected_card)
+            dialog.exec()
+        else:
+            self.show_status("Keine Karte gefunden.")
+
+    def local_cards_for_matches(self, matches):
+        # Treffer des Namensindex in Kartenobjekte auflösen (Spiegel, sonst eigene Sammlungen)
+        cards = []
+        seen = set()
+        for score, display, card_name, lang in matches:
+            if lang:
+                card = get_card_db().printed(display, lang)
+            else:
+                card = get_card_db().named(card_name)
+            if not card:
+                card = get_store().find_print_by_name(display)
+            if card and card.get('id') not in seen:
+                seen.add(card.get('id'))
+                cards.append(card)
+        return cards
 
     def load_selected_card(self, card_data):
         self.clear_result_area()
@@ -146,27 +278,83 @@ class MTGDesktopManager(QWidget):
             return
 
         new_lang = "de" if self.current_language == "en" else "en"
-        url = f"https://api.scryfall.com/cards/search?q=oracleid:{oracle_id}+lang:{new_lang}"
-        response = requests.get(url)
+        oracle_index = get_oracle_index()
+        local_prints = oracle_index.prints(oracle_id, new_lang)
+        if local_prints:
+            self.on_language_loaded(local_prints[0])
+            return
+        if oracle_index.has_language(oracle_id, new_lang) is False:
+            return
+        self.language_toggle_button.setEnabled(False)
+        self.language_toggle_button.setText("Lade ...")
+
+        def done(card):
+            self.language_toggle_button.setEnabled(True)
+            if card:
+                self.on_language_loaded(card)
+            else:
+                self.on_language_failed(new_lang)
+
+        def failed(message):
+            self.language_toggle_button.setEnabled(True)
+            self.on_language_failed(new_lang)
+        self.tasks.submit("card", self.fetch_language_print, oracle_id, new_lang, on_done=done, on_error=failed)
+
+    def fetch_language_print(self, oracle_id, lang):
+        # Läuft im Hintergrund; Antwort wird im Oracle-Index gemerkt
+        url = f"https://api.scryfall.com/cards/search?q=oracleid:{oracle_id}+lang:{lang}"
+        response = http_client.get(url)
+        if response.status_code in (200, 404):
+            get_oracle_index().record_search_response(oracle_id, lang, response.json())
         if response.status_code == 200:
             data = response.json()
             if data["total_cards"] > 0:
-                self.load_selected_card(data["data"][0])
-                self.language_toggle_button.setText(
-                    "Karte auf Englisch anzeigen" if new_lang == "de" else "Karte auf Deutsch anzeigen"
-                )
+                return data["data"][0]
+        return None
+
+    def on_language_loaded(self, card):
+        # Sprache und Beschriftung folgen der tatsächlich angezeigten Karte
+        self.load_selected_card(card)
+        self.update_language_label()
+
+    def on_language_failed(self, lang):
+        # Alte Karte bleibt stehen, also auch die bisherige Beschriftung
+        self.update_language_label()
+        language = "Deutsch" if lang == "de" else "Englisch"
+        QMessageBox.warning(self, "Fehler", f"Die Karte konnte nicht auf {language} geladen werden.")
+
+    def update_language_label(self):
+        # Bei deutscher Anzeige führt der Button zurück ins Englische
+        self.language_toggle_button.setText(
+            "Karte auf Englisch anzeigen" if self.current_language == "de" else "Karte auf Deutsch anzeigen"
+        )
 
     def check_for_de_language(self, card_data):
         oracle_id = card_data.get("oracle_id")
+        # Lokal beantwortbar (True/False) oder None, dann entscheidet Scryfall (im Hintergrund)
+        has_de = get_oracle_index().has_language(oracle_id, "de") if oracle_id else None
+        if has_de is not None:
+            self.set_language_available(has_de)
+            return
+        self.language_toggle_button.setVisible(False)
+        self.tasks.submit("language", self.fetch_has_german, oracle_id, on_done=self.set_language_available)
+
+    def fetch_has_german(self, oracle_id):
         url = f"https://api.scryfall.com/cards/search?q=oracleid:{oracle_id}+lang:de"
-        response = requests.get(url)
+        response = http_client.get(url)
+        if response.status_code in (200, 404) and oracle_id:
+            # Antwort merken, beim nächsten Anzeigen der Karte ist es ein Nachschlagen
+            get_oracle_index().record_search_response(oracle_id, "de", response.json())
         if response.status_code == 200:
-            data = response.json()
-            if data["total_cards"] > 0:
-                self.language_toggle_button.setVisible(True)
-                self.language_toggle_button.setText("Karte auf Deutsch anzeigen")
-            else:
-                self.language_toggle_button.setVisible(False)
+            return response.json()["total_cards"] > 0
+        return None
+
+    def set_language_available(self, has_de):
+        if has_de is None:
+            return
+        self.language_toggle_button.setVisible(has_de)
+        if has_de:
+            self.update_language_label()
 
     def show_variants(self):
         if not self.current_card_data:
@@ -179,25 +367,15 @@ class MTGDesktopManager(QWidget):
         selector.exec()
 
     def display_card(self, card):
-        collections_file = "collections.json"
-
-
         def add_to_collection():
             variant_key, variant_price = variant_selector.currentData()
             current = self.current_card_data if hasattr(self, 'current_card_data') and self.current_card_data else card
             print(f"DEBUG: Card being added to collection: {current}")  # Debugging
-            if not os.path.exists(collections_file):
-                with open(collections_file, "w", encoding="utf-8") as f:
-                    json.dump([], f)
-            with open(collections_file, "r", encoding="utf-8") as f:
-                collections = json.load(f)
-
-            selected_index = collection_selector.currentIndex()
-            if selected_index < 0 or selected_index >= len(collections):
+            collection_name = collection_selector.currentText()
+            if collection_selector.currentIndex() < 0 or collection_name not in get_store().collection_names():
                 QMessageBox.warning(self, "Fehler", "Keine gültige Sammlung ausgewählt.")
                 return
 
-            selected_collection = collections[selected_index]
             proxy = proxy_checkbox.isChecked()
             # Sprache aus Dropdown
             lang_selected = language_selector.currentText().lower()
@@ -251,15 +429,7 @@ class MTGDesktopManager(QWidget):
             set_code = current.get("set") or current.get("set_code") or current.get("set_id")
             set_size = current.get("set_size")
             if not set_size and set_code:
-                try:
-                    set_api_url = f"https://api.scryfall.com/sets/{set_code}"
-                    resp = requests.get(set_api_url, timeout=3)
-                    if resp.status_code == 200:
-                        set_data = resp.json()
-                        set_size = set_data.get("card_count")
-                except Exception as e:
-                    print(f"Fehler beim Laden von set_size: {e}")
-                    set_size = None
+                set_size = set_size_for(set_code)
 
             # Bestimme die tatsächlich verwendete Bild-URL für den Eintrag
             best_image_url = None
@@ -302,11 +472,9 @@ class MTGDesktopManager(QWidget):
             new_entry["purchase_price"] = purchase_price
 
             print(f"DEBUG: New entry being added: {new_entry}")  # Debugging
-            selected_collection["cards"].append(new_entry)
-            with open(collections_file, "w", encoding="utf-8") as f:
-                json.dump(collections, f, indent=2, ensure_ascii=False)
+            get_store().add_card(collection_name, new_entry)
 
-            QMessageBox.information(self, "Erfolg", f"Karte wurde zur Sammlung '{selected_collection['name']}' hinzugefügt.")
+            QMessageBox.information(self, "Erfolg", f"Karte wurde zur Sammlung '{collection_name}' hinzugefügt.")
 
         self.clear_result_area()
 
@@ -319,31 +487,15 @@ class MTGDesktopManager(QWidget):
         image_hbox = QHBoxLayout()
         image_hbox.setSpacing(0)
         image_hbox.setContentsMargins(0, 0, 0, 0)
-        if "card_faces" in card:
-            for face in card["card_faces"]:
-                img_url = face.get("image_uris", {}).get("large")
-                img_path = get_cached_image(img_url, face.get('id')) if img_url else None
-                label = QLabel()
-                if img_path and os.path.exists(img_path):
-                    pixmap = QPixmap(img_path)
-                    pixmap = pixmap.scaled(360, 510, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-                    label.setPixmap(pixmap)
-                label.setAlignment(Qt.AlignmentFlag.AlignHCenter)
-                if not (img_path and os.path.exists(img_path)):
-                    label.setText("Kein Bild")
-                image_hbox.addWidget(label)
-        else:
-            img_url = card.get("image_uris", {}).get("large")
-            img_path = get_cached_image(img_url, card.get('id')) if img_url else None
-            label = QLabel()
-            if img_path and os.path.exists(img_path):
-                pixmap = QPixmap(img_path)
-                pixmap = pixmap.scaled(360, 510, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-                label.setPixmap(pixmap)
+        # Bilder werden im Hintergrund geladen, bis dahin Platzhalter
+        image_jobs = []
+        faces = card["card_faces"] if "card_faces" in card else [card]
+        for face in faces:
+            img_url = face.get("image_uris", {}).get("large")
+            label = QLabel("Lade Bild ..." if img_url else "Kein Bild")
             label.setAlignment(Qt.AlignmentFlag.AlignHCenter)
-            if not (img_path and os.path.exists(img_path)):
-                label.setText("Kein Bild")
             image_hbox.addWidget(label)
+            image_jobs.append((label, img_url, face.get('id')))
         image_widget = QWidget()
         image_widget.setLayout(image_hbox)
         image_widget.setSizePolicy(QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Preferred)
@@ -367,40 +519,51 @@ class MTGDesktopManager(QWidget):
         mana_cost = card.get('mana_cost', '')
         set_code = card.get('set_code') or card.get('set') or ''
         collector_number = card.get('collector_number', '')
-        set_size = card.get('set_size')
-        # Falls set_size fehlt, hole sie aus Scryfall
-        if not set_size:
-            set_code = card.get('set_code') or card.get('set') or ''
-            if set_code:
-                try:
-                    set_api_url = f"https://api.scryfall.com/sets/{set_code}"
-                    import requests
-                    resp = requests.get(set_api_url, timeout=3)
-                    if resp.status_code == 200:
-                        set_data = resp.json()
-                        set_size = set_data.get("card_count", "?")
-                    else:
-                        set_size = "?"
-                except Exception as e:
-                    set_size = "?"
-            else:
-                set_size = "?"
         set_code_disp = set_code.upper() if set_code else ''
-        info_parts = []
-        if mana_cost:
-            info_parts.append(f"<span style='color:#b0b0b0;'>Manakosten: {mana_cost}</span>")
-        if set_code_disp:
-            info_parts.append(f"<span style='color:#b0b0b0;'>Set: {set_code_disp}</span>")
-        if collector_number:
-            info_parts.append(f"<span style='color:#b0b0b0;'>Nr: {collector_number}/{set_size}</span>")
-        if info_parts:
-            info_label = QLabel(" | ".join(info_parts))
+
+        def info_text(set_size):
+            info_parts = []
+            if mana_cost:
+                info_parts.append(f"<span style='color:#b0b0b0;'>Manakosten: {mana_cost}</span>")
+            if set_code_disp:
+                info_parts.append(f"<span style='color:#b0b0b0;'>Set: {set_code_disp}</span>")
+            if collector_number:
+                info_parts.append(f"<span style='color:#b0b0b0;'>Nr: {collector_number}/{set_size}</span>")
+            return " | ".join(info_parts)
+
+        # Falls set_size fehlt, kommt es mit den Bildern aus dem Set-Katalog
+        known_set_size = card.get('set_size')
+        info_label = None
+        if info_text("?"):
+            info_label = QLabel(info_text(known_set_size or "…"))
             info_label.setStyleSheet("font-size: 15px; margin: 0 !important; line-height: 1 !important; padding: 0 !important;")
             info_label.setTextFormat(Qt.TextFormat.RichText)
             info_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
             info_label.setWordWrap(True)
             info_label.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Preferred)
             info_col.addWidget(info_label)
+
+        def load_assets():
+            # Läuft im Hintergrund: Bilder in den Cache, Setgröße aus dem Katalog
+            paths = [get_cached_image(url, card_id) if url else None for _, url, card_id in image_jobs]
+            return paths, known_set_size or set_size_for(set_code, "?")
+
+        def show_assets(result):
+            paths, set_size = result
+            for (label, img_url, _), img_path in zip(image_jobs, paths):
+                if img_path and os.path.exists(img_path):
+                    pixmap = QPixmap(img_path)
+                    pixmap = pixmap.scaled(360, 510, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+                    label.setPixmap(pixmap)
+                else:
+                    label.setText("Kein Bild")
+            if info_label is not None:
+                info_label.setText(info_text(set_size))
+
+        def assets_failed(message):
+            for label, _, _ in image_jobs:
+                label.setText("Kein Bild")
+        self.tasks.submit("assets", load_assets, on_done=show_assets, on_error=assets_failed)
         # Set-Name ausgeschrieben immer anzeigen
         set_name = card.get('set_name', '')
         if set_name:
@@ -677,11 +840,8 @@ class MTGDesktopManager(QWidget):
         add_button.clicked.connect(add_to_collection)
 
         # Sammlungen laden
-        if os.path.exists("collections.json"):
-            with open("collections.json", "r", encoding="utf-8") as f:
-                collections = json.load(f)
-                for c in collections:
-                    collection_selector.addItem(c["name"])
+        for collection_name in get_store().collection_names():
+            collection_selector.addItem(collection_name)
 
         control_row.addWidget(collection_selector)
         control_row.addWidget(language_selector)
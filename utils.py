@@ -2,7 +2,78 @@
 # Hilfsfunktionen für das Projekt
 import os
 import hashlib
-import requests
+import tempfile
+import http_client
+from single_flight import get_group
+
+def safe_float(val):
+    # Preise liegen als Zahl oder String (auch mit Komma) vor; alles andere zählt als 0
+    if val is None:
+        return 0.0
+    if isinstance(val, (int, float)):
+        return float(val)
+    if isinstance(val, str):
+        val = val.replace(',', '.')
+        try:
+            return float(val)
+        except Exception:
+            return 0.0
+    return 0.0
+
+def atomic_write(path, data):
+    # Schreibt erst in eine temporäre Datei im selben Ordner und ersetzt dann atomar.
+    # Nach einem Absturz liegt so entweder die alte oder die komplette neue Datei vor.
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    if hasattr(os, 'O_DIRECTORY'):
+        # Auch den Verzeichniseintrag sichern (nur POSIX)
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+def _local_image_url(name, set_code):
+    # Bild-URL aus der lokalen Kartendatenbank (spart den /cards/named-Aufruf)
+    from card_db import get_card_db
+    card = get_card_db().named(name.split('//')[0].strip(), set_code)
+    if not card:
+        return None
+    image_uris = card.get("image_uris")
+    if not image_uris and card.get("card_faces"):
+        image_uris = card["card_faces"][0].get("image_uris")
+    for key in ["large", "normal", "small"]:
+        if image_uris and image_uris.get(key):
+            return image_uris[key]
+    return None
+
+_image_flight = get_group("images")
+
+def _download_image(image_url, path):
+    if os.path.exists(path):
+        return path
+    try:
+        img_data = http_client.get(image_url, timeout=5, cache=False).content
+        # Atomar, damit ein abgebrochener Download nicht als fertiges Bild im Cache liegt
+        atomic_write(path, img_data)
+        return path
+    except Exception as e:
+        print(f"Bild-Download-Fehler: {e}")
+        return None
 
 def get_cached_image(image_uris_or_url, card_id=None, fallback_name=None, fallback_set=None):
     image_url = None
@@ -13,13 +84,15 @@ def get_cached_image(image_uris_or_url, card_id=None, fallback_name=None, fallba
                 break
     elif isinstance(image_uris_or_url, str):
         image_url = image_uris_or_url
+    if (not image_url or image_url == "null") and fallback_name and fallback_set:
+        image_url = _local_image_url(fallback_name, fallback_set)
     if (not image_url or image_url == "null") and fallback_name and fallback_set:
         from urllib.parse import quote
         api_name = quote(fallback_name.split('//')[0].strip())
         api_set = quote(fallback_set)
         scryfall_url = f"https://api.scryfall.com/cards/named?exact={api_name}&set={api_set}"
         try:
-            resp = requests.get(scryfall_url, timeout=3)
+            resp = http_client.get(scryfall_url, timeout=3)
             if resp.status_code == 200:
                 data = resp.json()
                 image_uris = data.get("image_uris")
@@ -50,14 +123,8 @@ def get_cached_image(image_uris_or_url, card_id=None, fallback_name=None, fallba
     path = os.path.join('images', filename)
     if os.path.exists(path):
         return path
-    try:
-        img_data = requests.get(image_url, timeout=5).content
-        with open(path, 'wb') as f:
-            f.write(img_data)
-        return path
-    except Exception as e:
-        print(f"Bild-Download-Fehler: {e}")
-        return None
+    # Gleichzeitige Downloads desselben Bildes (z. B. Anzeige und Hinzufügen) zusammenfassen
+    return _image_flight.do(path, _download_image, image_url, path)
 
 ###############################################################
 # --- MOVE TO utils.py ---
@@ -75,13 +142,15 @@ def get_cached_image(image_uris_or_url, card_id=None, fallback_name=None, fallba
         image_url = image_uris_or_url
 
     # 2. Fallback: Scryfall-API
+    if (not image_url or image_url == "null") and fallback_name and fallback_set:
+        image_url = _local_image_url(fallback_name, fallback_set)
     if (not image_url or image_url == "null") and fallback_name and fallback_set:
         from urllib.parse import quote
         api_name = quote(fallback_name.split('//')[0].strip())
         api_set = quote(fallback_set)
         scryfall_url = f"https://api.scryfall.com/cards/named?exact={api_name}&set={api_set}"
         try:
-            resp = requests.get(scryfall_url, timeout=3)
+            resp = http_client.get(scryfall_url, timeout=3)
             if resp.status_code == 200:
                 data = resp.json()
                 image_uris = data.get("image_uris")
@@ -113,11 +182,5 @@ def get_cached_image(image_uris_or_url, card_id=None, fallback_name=None, fallba
     path = os.path.join('images', filename)
     if os.path.exists(path):
         return path
-    try:
-        img_data = requests.get(image_url, timeout=5).content
-        with open(path, 'wb') as f:
-            f.write(img_data)
-        return path
-    except Exception as e:
-        print(f"Bild-Download-Fehler: {e}")
-        return None
\ No newline at end of file
+    # Gleichzeitige Downloads desselben Bildes (z. B. Anzeige und Hinzufügen) zusammenfassen
+    return _image_flight.do(path, _download_image, image_url, path)
\ No newline at end of file